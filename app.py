@@ -1,10 +1,24 @@
 # app.py
 import os
 import json
+import atexit
 import logging
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask import Flask, render_template, request, jsonify, send_from_directory, Response, stream_with_context
 # Import config
 from config import QUESTION_FOLDER, METADATA_FILE, DB_FILE, LLM_API_TYPE, DEBUG, ANTHROPIC_API_KEY
+from config import TESSERACT_CMD, OCR_PSM, OCR_LANGUAGE, OCR_CACHE_DIR, OCR_MAX_WORKERS, OCR_MAX_IN_FLIGHT
+from config import IMAGE_INDEX_POLL_INTERVAL, IMAGE_INDEX_WATCH
+from config import OCR_WATCH_ENABLED, OCR_WATCH_DEBOUNCE, OCR_WATCH_MAX_WORKERS, OCR_WATCH_BATCH_SIZE
+from config import JOB_MAX_CONCURRENT, JOB_HISTORY_LIMIT
+from config import METADATA_JOURNAL_ENABLED, METADATA_JOURNAL_MAX_BYTES, METADATA_COMPACT_INTERVAL
+from config import BACKUP_MIN_INTERVAL, BACKUP_KEEP_LAST, BACKUP_KEEP_DAILY
+from config import DB_POOL_SIZE, DB_BUSY_TIMEOUT, DB_CACHE_SIZE_KB, DB_MMAP_SIZE, DB_CACHED_STATEMENTS, DB_BATCH_CHUNK_SIZE
+from config import DB_PAGE_SIZE, DB_MAX_PAGE_SIZE
+from config import LLM_POOL_SIZE, LLM_CONNECT_TIMEOUT, LLM_READ_TIMEOUT, LLM_MAX_CONCURRENCY
+from config import LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE, LLM_MAX_RETRIES, LLM_BACKOFF_BASE, LLM_BACKOFF_MAX
+from config import LLM_CACHE_ENABLED, LLM_CACHE_FILE, LLM_CACHE_TTL_DAYS, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_NEAR_DUPLICATES
+from config import SYLLABUS_DIR, LLM_SYLLABUS_TOP_K, LLM_PROMPT_CACHING, LLM_BATCH_MAX_ITEMS, LLM_BATCH_MAX_TOKENS
+from config import LLM_BATCH_DIR, LLM_BATCH_BASE_URL, LLM_BATCH_POLL_INTERVAL
 
 
 # Import modules
@@ -12,6 +26,12 @@ from modules.ocr_processor import OCRProcessor
 from modules.llm_processor import LLMProcessor
 from modules.metadata_manager import MetadataManager
 from modules.database_manager import DatabaseManager
+from modules.job_manager import JobManager
+from modules.enhancement_pipeline import EnhancementPipeline
+from modules.rate_limiter import RateLimiter
+from modules.llm_cache import LLMResponseCache
+from modules.llm_batch import LLMBatchManager
+from modules.ocr_watcher import OCRWatcher
 
 # Add this near the top of your app.py after loading configuration
 print(f"[DEBUG] QUESTION_FOLDER value: '{QUESTION_FOLDER}'")
@@ -41,28 +61,108 @@ if not os.path.exists(QUESTION_FOLDER):
 
 
 # Initialize components
-ocr_processor = OCRProcessor(QUESTION_FOLDER)
-llm_processor = LLMProcessor(LLM_API_TYPE)
-metadata_manager = MetadataManager(METADATA_FILE)
-database_manager = DatabaseManager(DB_FILE)
+ocr_processor = OCRProcessor(
+    QUESTION_FOLDER,
+    cache_dir=OCR_CACHE_DIR,
+    psm=OCR_PSM,
+    language=OCR_LANGUAGE,
+    tesseract_cmd=TESSERACT_CMD,
+    max_workers=OCR_MAX_WORKERS,
+    max_in_flight=OCR_MAX_IN_FLIGHT,
+    index_poll_interval=IMAGE_INDEX_POLL_INTERVAL,
+    index_watch=IMAGE_INDEX_WATCH
+)
+llm_processor = LLMProcessor(
+    LLM_API_TYPE,
+    pool_size=LLM_POOL_SIZE,
+    connect_timeout=LLM_CONNECT_TIMEOUT,
+    read_timeout=LLM_READ_TIMEOUT,
+    rate_limiter=RateLimiter(
+        requests_per_minute=LLM_REQUESTS_PER_MINUTE,
+        tokens_per_minute=LLM_TOKENS_PER_MINUTE,
+        max_retries=LLM_MAX_RETRIES,
+        backoff_base=LLM_BACKOFF_BASE,
+        backoff_max=LLM_BACKOFF_MAX
+    ),
+    response_cache=LLMResponseCache(
+        LLM_CACHE_FILE,
+        ttl_seconds=LLM_CACHE_TTL_DAYS * 24 * 3600,
+        max_entries=LLM_CACHE_MAX_ENTRIES,
+        near_duplicates=LLM_CACHE_NEAR_DUPLICATES
+    ) if LLM_CACHE_ENABLED else None,
+    syllabus_top_k=LLM_SYLLABUS_TOP_K,
+    prompt_caching=LLM_PROMPT_CACHING,
+    batch_max_items=LLM_BATCH_MAX_ITEMS,
+    batch_max_tokens=LLM_BATCH_MAX_TOKENS
+)
+if SYLLABUS_DIR:
+    llm_processor.syllabus_registry.load_directory(SYLLABUS_DIR)
+metadata_manager = MetadataManager(
+    METADATA_FILE,
+    journal_enabled=METADATA_JOURNAL_ENABLED,
+    journal_max_bytes=METADATA_JOURNAL_MAX_BYTES,
+    compact_interval=METADATA_COMPACT_INTERVAL,
+    backup_min_interval=BACKUP_MIN_INTERVAL,
+    backup_keep_last=BACKUP_KEEP_LAST,
+    backup_keep_daily=BACKUP_KEEP_DAILY
+)
+database_manager = DatabaseManager(
+    DB_FILE,
+    pool_size=DB_POOL_SIZE,
+    busy_timeout=DB_BUSY_TIMEOUT,
+    cache_size_kb=DB_CACHE_SIZE_KB,
+    mmap_size=DB_MMAP_SIZE,
+    cached_statements=DB_CACHED_STATEMENTS
+)
+job_manager = JobManager(max_workers=JOB_MAX_CONCURRENT, history_limit=JOB_HISTORY_LIMIT)
+enhancement_pipeline = EnhancementPipeline(
+    ocr_processor,
+    llm_processor,
+    metadata_manager,
+    max_concurrency=LLM_MAX_CONCURRENCY
+)
+llm_batch_manager = LLMBatchManager(
+    llm_processor,
+    metadata_manager,
+    ocr_processor,
+    LLM_BATCH_DIR,
+    base_url=LLM_BATCH_BASE_URL,
+    poll_interval=LLM_BATCH_POLL_INTERVAL
+)
+ocr_watcher = OCRWatcher(
+    ocr_processor,
+    job_manager,
+    debounce=OCR_WATCH_DEBOUNCE,
+    max_workers=OCR_WATCH_MAX_WORKERS,
+    batch_size=OCR_WATCH_BATCH_SIZE
+)
+
+# With the debug reloader the app is imported twice; only watch and poll from the process that serves requests
+if not DEBUG or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+    llm_batch_manager.start_poller()
+    if OCR_WATCH_ENABLED:
+        ocr_watcher.start()
+
+# On shutdown, fold pending metadata journal records into the metadata file,
+# close pooled LLM and database connections and stop watching the image folder
+atexit.register(metadata_manager.close)
+atexit.register(llm_processor.close)
+atexit.register(llm_batch_manager.stop_poller)
+atexit.register(database_manager.close)
+atexit.register(ocr_watcher.stop)
+atexit.register(ocr_processor.close)
 
 # Routes
 @app.route('/')
 def index():
     """Main dashboard page"""
-    # Get all available images from the OCR processor
-    all_images = ocr_processor.get_image_list()
-    
     # Get images explicitly marked as completed
     completed_review = metadata_manager.get_completed_review_list()
     
-    # Filter to only include completed images that actually exist in the image folder
-    completed_images = [img for img in completed_review if img in all_images]
-    
-    # All images not in the completed list are considered pending
-    pending_images = [img for img in all_images if img not in completed_images]
+    # Completed images that actually exist in the image folder; all other images are pending
+    pending_images, completed_images = ocr_processor.image_index.partition(completed_review)
     
-    print(f"[DEBUG] All images: {len(all_images)}, Pending: {len(pending_images)}, Completed: {len(completed_images)}")
+    print(f"[DEBUG] All images: {len(pending_images) + len(completed_images)}, Pending: {len(pending_images)}, Completed: {len(completed_images)}")
     
     return render_template(
         'dashboard.html', 
@@ -99,6 +199,35 @@ def list_images():
     image_list = ocr_processor.get_image_list()
     return jsonify(image_list)
 
+@app.route('/images/status')
+def list_image_status():
+    """API endpoint to get the processing, review and database status of every image"""
+    image_list = ocr_processor.get_image_list()
+    
+    # One metadata read and one DB query for the whole folder; OCR is never run here
+    metadata_map = metadata_manager.get_metadata_map()
+    saved_filenames = database_manager.get_saved_filenames()
+    
+    images = []
+    for filename in image_list:
+        metadata = metadata_map.get(filename) or {}
+        images.append({
+            'filename': filename,
+            'processed': ocr_processor.has_cached_result(filename),
+            'review_completed': metadata.get('review_completed', False),
+            'review_completed_at': metadata.get('review_completed_at'),
+            'saved_to_db': filename in saved_filenames
+        })
+    
+    return jsonify({
+        'success': True,
+        'count': len(images),
+        'processed_count': sum(1 for image in images if image['processed']),
+        'review_completed_count': sum(1 for image in images if image['review_completed']),
+        'saved_to_db_count': sum(1 for image in images if image['saved_to_db']),
+        'images': images
+    })
+
 @app.route('/images/<filename>')
 def serve_image(filename):
     """Serve a question image"""
@@ -118,22 +247,115 @@ def serve_image(filename):
 
 @app.route('/ocr/process', methods=['POST'])
 def process_ocr():
-    """Process images with OCR"""
+    """Submit images for OCR as a background job (or process them inline with wait=true)"""
     data = request.get_json()
     filenames = data.get('filenames', [])
     force_reprocess = data.get('force_reprocess', False)
+    wait = data.get('wait', False)
     
     if not filenames:
         # Process all images if none specified
         filenames = ocr_processor.get_image_list()
     
-    # Process the images
-    results = ocr_processor.process_batch(filenames, force_reprocess=force_reprocess)
+    if wait:
+        # Process the images in this request (fine for one or two images)
+        results = ocr_processor.process_batch(filenames, force_reprocess=force_reprocess)
+        
+        return jsonify({
+            'success': True,
+            'processed': len(results),
+            'results': results
+        })
+    
+    def run_ocr_job(job):
+        ocr_processor.process_batch(
+            filenames,
+            force_reprocess=force_reprocess,
+            progress_callback=lambda index, result: job.add_result(result),
+            cancel_event=job.cancel_event
+        )
+        return {'processed': job.processed, 'failed': job.failed}
+    
+    job = job_manager.submit('ocr', len(filenames), run_ocr_job)
+    
+    return jsonify({
+        'success': True,
+        'job_id': job.id,
+        'total': len(filenames),
+        'status_url': f"/jobs/{job.id}"
+    }), 202
+
+@app.route('/jobs')
+def list_jobs():
+    """List recent background jobs"""
+    return jsonify({
+        'success': True,
+        'jobs': job_manager.list_jobs()
+    })
+
+@app.route('/jobs/<job_id>')
+def get_job_status(job_id):
+    """Get progress and partial results of a background job"""
+    job = job_manager.get(job_id)
+    if not job:
+        return jsonify({
+            'success': False,
+            'error': 'Job not found'
+        }), 404
+    
+    # Results are returned from this offset on, so pollers only fetch new ones
+    offset = request.args.get('offset', 0, type=int)
+    
+    status = job.to_dict(offset=offset)
+    status['success'] = True
+    return jsonify(status)
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancel a queued or running background job"""
+    job = job_manager.get(job_id)
+    if not job:
+        return jsonify({
+            'success': False,
+            'error': 'Job not found'
+        }), 404
+    
+    cancelled = job_manager.cancel(job_id)
+    
+    return jsonify({
+        'success': cancelled,
+        'job_id': job_id,
+        'status': job.status
+    })
+
+@app.route('/ocr/watch')
+def ocr_watch_status():
+    """Get the state of background OCR for new or changed images"""
+    return jsonify({
+        'success': True,
+        **ocr_watcher.status()
+    })
+
+@app.route('/ocr/watch/start', methods=['POST'])
+def start_ocr_watch():
+    """Start running OCR on new or changed images in the background"""
+    started = ocr_watcher.start()
+    
+    return jsonify({
+        'success': True,
+        'started': started,
+        **ocr_watcher.status()
+    })
+
+@app.route('/ocr/watch/stop', methods=['POST'])
+def stop_ocr_watch():
+    """Stop watching the image folder for new or changed images"""
+    stopped = ocr_watcher.stop()
     
     return jsonify({
         'success': True,
-        'processed': len(results),
-        'results': results
+        'stopped': stopped,
+        **ocr_watcher.status()
     })
 
 @app.route('/ocr/result/<filename>')
@@ -182,6 +404,7 @@ def analyze_with_llm():
     filename = data.get('filename')
     ocr_text = data.get('ocr_text', '')
     custom_prompt = data.get('custom_prompt', None)
+    use_cache = not data.get('refresh', False)
     
     if not filename or not ocr_text:
         return jsonify({
@@ -195,11 +418,11 @@ def analyze_with_llm():
     # Call LLM for analysis with optional custom prompt
     if custom_prompt:
         # Use custom prompt directly
-        response = llm_processor._call_anthropic(custom_prompt) if llm_processor.api_type == 'anthropic' else llm_processor._call_openai(custom_prompt)
+        response = llm_processor._call_llm(custom_prompt)
         enhanced_metadata = llm_processor._parse_response(response)
     else:
         # Use the standard analyze_question flow
-        enhanced_metadata = llm_processor.analyze_question(ocr_text, existing_metadata)
+        enhanced_metadata = llm_processor.analyze_question(ocr_text, existing_metadata, use_cache=use_cache)
     
     # Improved error handling
     success = True
@@ -217,7 +440,213 @@ def analyze_with_llm():
         'success': success,
         'error': error_message,
         'metadata': enhanced_metadata,
-        'filename': filename
+        'filename': filename,
+        'prompt_stats': None if custom_prompt else llm_processor.last_prompt_stats()
+    })
+
+@app.route('/llm/analyze/stream', methods=['POST'])
+def analyze_with_llm_stream():
+    """Analyze OCR text with LLM, streaming fields as server-sent events as they arrive"""
+    data = request.get_json()
+    filename = data.get('filename')
+    ocr_text = data.get('ocr_text', '')
+    custom_prompt = data.get('custom_prompt', None)
+    use_cache = not data.get('refresh', False)
+    
+    if not filename or not ocr_text:
+        return jsonify({
+            'success': False,
+            'error': 'Filename and OCR text required'
+        }), 400
+    
+    # Get existing metadata
+    existing_metadata = metadata_manager.get_metadata_for_image(filename)
+    
+    def generate():
+        for event, payload in llm_processor.stream_analysis(ocr_text, existing_metadata,
+                                                            custom_prompt=custom_prompt, use_cache=use_cache):
+            if event == 'error':
+                app.logger.error(f"LLM analysis error for {filename}: {payload.get('error')}")
+            payload['filename'] = filename
+            yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/llm/prompt-stats')
+def get_llm_prompt_stats():
+    """Report input tokens saved by syllabus trimming and provider prompt caching"""
+    return jsonify({
+        'success': True,
+        'stats': llm_processor.prompt_stats(),
+        'usage': llm_processor.usage_stats()
+    })
+
+@app.route('/llm/throttle')
+def get_llm_throttle_state():
+    """Report the LLM rate limiter's current budgets and throttling counters"""
+    return jsonify({
+        'success': True,
+        'throttle': llm_processor.rate_limiter.state()
+    })
+
+@app.route('/llm/cache/stats')
+def get_llm_cache_stats():
+    """Report LLM response cache size and hit/miss counters"""
+    if not llm_processor.response_cache:
+        return jsonify({
+            'success': False,
+            'error': 'LLM response cache is disabled'
+        }), 404
+    
+    return jsonify({
+        'success': True,
+        'cache': llm_processor.response_cache.stats()
+    })
+
+@app.route('/llm/cache/clear', methods=['POST'])
+def clear_llm_cache():
+    """Remove all cached LLM responses"""
+    if not llm_processor.response_cache:
+        return jsonify({
+            'success': False,
+            'error': 'LLM response cache is disabled'
+        }), 404
+    
+    llm_processor.response_cache.clear()
+    return jsonify({'success': True})
+
+@app.route('/llm/enhance-batch', methods=['POST'])
+def enhance_batch():
+    """Start a background job that OCRs and LLM-enhances many questions"""
+    data = request.get_json() or {}
+    filenames = data.get('filenames', [])
+    
+    if data.get('all_unenhanced'):
+        filenames = enhancement_pipeline.find_unenhanced()
+    
+    if not filenames:
+        return jsonify({
+            'success': False,
+            'error': 'No questions to enhance'
+        }), 400
+    
+    job = job_manager.submit('enhance', len(filenames), lambda job: enhancement_pipeline.run(filenames, job))
+    
+    return jsonify({
+        'success': True,
+        'job_id': job.id,
+        'total': len(filenames),
+        'status_url': f"/jobs/{job.id}"
+    }), 202
+
+@app.route('/llm/batches', methods=['POST'])
+def create_llm_batch():
+    """Start a background job that enhances questions through the provider's offline batch API"""
+    data = request.get_json() or {}
+    filenames = data.get('filenames', [])
+    # Provider batches take up to a day; a finished batch is ingested by the poller, not a job worker
+    wait = data.get('wait', False)
+    auto_ingest = data.get('auto_ingest', True)
+    
+    if data.get('all_unenhanced'):
+        filenames = enhancement_pipeline.find_unenhanced()
+    
+    if not filenames:
+        return jsonify({
+            'success': False,
+            'error': 'No questions to enhance'
+        }), 400
+    
+    job = job_manager.submit('llm_batch', len(filenames),
+                             lambda job: llm_batch_manager.run(filenames, job, wait=wait, auto_ingest=auto_ingest))
+    
+    return jsonify({
+        'success': True,
+        'job_id': job.id,
+        'total': len(filenames),
+        'status_url': f"/jobs/{job.id}"
+    }), 202
+
+@app.route('/llm/batches')
+def list_llm_batches():
+    """List offline LLM batches, newest first"""
+    return jsonify({
+        'success': True,
+        'batches': llm_batch_manager.list_batches()
+    })
+
+@app.route('/llm/batches/<batch_id>')
+def get_llm_batch(batch_id):
+    """Check the provider status of an offline LLM batch"""
+    if llm_batch_manager.get(batch_id) is None:
+        return jsonify({
+            'success': False,
+            'error': f'Batch not found: {batch_id}'
+        }), 404
+    
+    try:
+        batch = llm_batch_manager.get(batch_id, refresh=True)
+    except Exception as e:
+        app.logger.error(f"Failed to refresh LLM batch {batch_id}: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 502
+    
+    return jsonify({
+        'success': True,
+        'batch': batch
+    })
+
+@app.route('/llm/batches/<batch_id>/ingest', methods=['POST'])
+def ingest_llm_batch(batch_id):
+    """Write the results of a finished offline LLM batch to the metadata"""
+    if llm_batch_manager.get(batch_id) is None:
+        return jsonify({
+            'success': False,
+            'error': f'Batch not found: {batch_id}'
+        }), 404
+    
+    try:
+        batch = llm_batch_manager.ingest(batch_id)
+    except Exception as e:
+        app.logger.error(f"Failed to ingest LLM batch {batch_id}: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 409
+    
+    return jsonify({
+        'success': True,
+        'batch': batch
+    })
+
+@app.route('/llm/batches/<batch_id>/cancel', methods=['POST'])
+def cancel_llm_batch(batch_id):
+    """Ask the provider to cancel an offline LLM batch"""
+    if llm_batch_manager.get(batch_id) is None:
+        return jsonify({
+            'success': False,
+            'error': f'Batch not found: {batch_id}'
+        }), 404
+    
+    try:
+        llm_batch_manager.cancel(batch_id)
+        batch = llm_batch_manager.get(batch_id)
+    except Exception as e:
+        app.logger.error(f"Failed to cancel LLM batch {batch_id}: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 502
+    
+    return jsonify({
+        'success': True,
+        'batch': batch
     })
 
 @app.route('/metadata/update', methods=['POST'])
@@ -355,21 +784,117 @@ def save_to_database():
         'filename': filename
     })
 
+@app.route('/database/save-batch', methods=['POST'])
+def save_batch_to_database():
+    """Save review-completed questions to the SQLite database in bulk"""
+    data = request.get_json(silent=True) or {}
+    filenames = data.get('filenames')
+    
+    # Without filenames every question whose review is completed is synced
+    questions, skipped = metadata_manager.get_completed_entries(filenames)
+    
+    success_count, failure_count = database_manager.save_questions(questions, chunk_size=DB_BATCH_CHUNK_SIZE)
+    
+    return jsonify({
+        'success': failure_count == 0,
+        'success_count': success_count,
+        'failure_count': failure_count,
+        'skipped': skipped
+    })
+
 @app.route('/database/questions', methods=['GET'])
 def list_database_questions():
-    """List all questions stored in the database"""
+    """List one page of questions stored in the database, optionally filtered by metadata"""
     # Option to filter by review status
     review_completed = request.args.get('review_completed')
     if review_completed is not None:
         review_completed = review_completed.lower() == 'true'
     
-    # Get questions from database
-    questions = database_manager.get_all_questions(review_completed)
+    # Filters on indexed columns and keyword/cognitive skill tables
+    filter_names = ('subject', 'chapter', 'topic', 'question_type', 'difficulty_level', 'keyword', 'cognitive_skill')
+    filters = {name: request.args.get(name) for name in filter_names if request.args.get(name)}
+    
+    # Without 'fields' only filenames are listed; otherwise each question holds the requested fields
+    fields_param = request.args.get('fields')
+    fields = [field.strip() for field in fields_param.split(',') if field.strip()] if fields_param else None
+    
+    try:
+        limit = min(max(int(request.args.get('limit', DB_PAGE_SIZE)), 0), DB_MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'error': 'limit must be an integer'
+        }), 400
+    
+    response = {'success': True}
+    try:
+        # limit=0 skips the rows entirely, for a count-only request
+        if limit > 0:
+            page = database_manager.query_questions(filters, review_completed, fields=fields, limit=limit,
+                                                    cursor=request.args.get('cursor'))
+            questions = page['questions'] if fields else [q['filename'] for q in page['questions']]
+            response.update({
+                'questions': questions,
+                'count': len(questions),
+                'next_cursor': page['next_cursor']
+            })
+        
+        if limit == 0 or request.args.get('count', '').lower() == 'true':
+            response['total'] = database_manager.count_questions(filters, review_completed)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    
+    return jsonify(response)
+
+@app.route('/database/search', methods=['GET'])
+def search_database_questions():
+    """Full-text search over stored questions, best matches first"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({
+            'success': False,
+            'error': 'Search query (q) is required'
+        }), 400
+    
+    review_completed = request.args.get('review_completed')
+    if review_completed is not None:
+        review_completed = review_completed.lower() == 'true'
+    
+    filter_names = ('subject', 'chapter', 'topic', 'question_type', 'difficulty_level', 'keyword', 'cognitive_skill')
+    filters = {name: request.args.get(name) for name in filter_names if request.args.get(name)}
+    
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), DB_MAX_PAGE_SIZE)
+        offset = max(int(request.args.get('offset', 0)), 0)
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'error': 'limit and offset must be integers'
+        }), 400
+    
+    try:
+        results = database_manager.search_questions(
+            query,
+            filters,
+            review_completed,
+            limit=limit,
+            offset=offset,
+            raw=request.args.get('raw', '').lower() == 'true'
+        )
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     
     return jsonify({
         'success': True,
-        'questions': [q.get('filename') for q in questions],
-        'count': len(questions)
+        'query': query,
+        'results': results,
+        'count': len(results)
     })
 
 @app.route('/test-css')
@@ -13,17 +13,90 @@ DEBUG = True
 QUESTION_FOLDER = os.getenv('QUESTION_FOLDER')  # Path to snipped question images
 METADATA_FILE = os.getenv('METADATA_FILE')  # Path to metadata file
 
+# Metadata journal: append small change records instead of rewriting METADATA_FILE on every update
+METADATA_JOURNAL_ENABLED = True
+METADATA_JOURNAL_MAX_BYTES = 1024 * 1024  # Compact into METADATA_FILE once the journal reaches this size
+METADATA_COMPACT_INTERVAL = 30  # Seconds after a change before the journal is compacted in the background
+
+# Metadata backups (compressed, deduplicated snapshots in metadata_backups/)
+BACKUP_MIN_INTERVAL = 300  # Minimum seconds between two snapshots; changes in between are coalesced
+BACKUP_KEEP_LAST = 20  # Most recent snapshots that are always kept
+BACKUP_KEEP_DAILY = 14  # Days for which the newest snapshot of each day is also kept
+
 # Database configuration
 DB_FILE = os.getenv('DB_FILE', os.path.join(os.path.dirname(METADATA_FILE), 'questions.db'))
+DB_POOL_SIZE = 8  # Pooled SQLite connections shared by request and job threads
+DB_BUSY_TIMEOUT = 5.0  # Seconds to wait for a database lock (or a free pooled connection)
+DB_CACHE_SIZE_KB = 20000  # SQLite page cache per connection, in KiB
+DB_MMAP_SIZE = 256 * 1024 * 1024  # Bytes of the database file to memory-map (0 = disabled)
+DB_CACHED_STATEMENTS = 128  # Prepared statements kept per pooled connection
+DB_BATCH_CHUNK_SIZE = 500  # Questions written per transaction when saving in bulk
+DB_PAGE_SIZE = 100  # Default page size of /database/questions
+DB_MAX_PAGE_SIZE = 1000  # Largest page /database/questions will return
 
 # LLM API Configuration
 LLM_API_TYPE = 'anthropic'  # or 'openai'
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 ANTHROPIC_API_KEY = os.getenv('ANTHROPIC_API_KEY')
+LLM_POOL_SIZE = 10  # Keep-alive connections held open per LLM provider
+LLM_CONNECT_TIMEOUT = 10  # Seconds to wait when opening a connection to the LLM API
+LLM_READ_TIMEOUT = 60  # Seconds to wait for an LLM response
+LLM_MAX_CONCURRENCY = 4  # Concurrent LLM calls during bulk enhancement runs
+LLM_REQUESTS_PER_MINUTE = 50  # Client-side request budget (0 = unlimited)
+LLM_TOKENS_PER_MINUTE = 50000  # Client-side token budget, input plus max output (0 = unlimited)
+LLM_MAX_RETRIES = 4  # Retries for rate-limited (429), overloaded and transient 5xx/network failures
+LLM_BACKOFF_BASE = 1.0  # Seconds before the first retry; doubles per attempt, with jitter
+LLM_BACKOFF_MAX = 60.0  # Upper bound on a single retry delay
+
+# LLM response cache (keyed by model, temperature and prompt)
+LLM_CACHE_ENABLED = True
+LLM_CACHE_FILE = os.getenv('LLM_CACHE_FILE', os.path.join(os.path.dirname(METADATA_FILE), 'llm_cache.db'))
+LLM_CACHE_TTL_DAYS = 30  # Cached responses older than this are discarded
+LLM_CACHE_MAX_ENTRIES = 20000  # Least recently used responses are evicted beyond this
+LLM_CACHE_NEAR_DUPLICATES = True  # Also match questions whose normalized OCR text is identical
+
+# Optional directory of syllabus JSON files that add to or replace the built-in syllabi
+SYLLABUS_DIR = os.getenv('SYLLABUS_DIR')
+# Put only the top-k syllabus chapters most similar to the question in the prompt (0 = whole syllabus).
+# A trimmed syllabus differs per question, so it is sent after the cacheable prefix.
+LLM_SYLLABUS_TOP_K = int(os.getenv('LLM_SYLLABUS_TOP_K', '0'))
+# Mark the static prompt prefix (instructions and full syllabus) for Anthropic prompt caching.
+# Anthropic only caches prefixes of at least 1024 tokens (2048 for Haiku models). The built-in
+# prefixes are shorter than that (~500-1500 tokens), so with the default model they are sent
+# unmarked; caching takes effect with longer custom syllabi (SYLLABUS_DIR) or larger models.
+LLM_PROMPT_CACHING = True
+
+# Multi-question batching: questions of the same subject analyzed in one request (1 = off)
+LLM_BATCH_MAX_ITEMS = int(os.getenv('LLM_BATCH_MAX_ITEMS', '1'))
+LLM_BATCH_MAX_TOKENS = 4000  # Output token budget of a batched request; sets how many questions fit
+
+# Offline provider batch API (cheaper, higher limits, results within 24h)
+LLM_BATCH_DIR = os.getenv('LLM_BATCH_DIR', os.path.join(os.path.dirname(METADATA_FILE), 'llm_batches'))
+LLM_BATCH_BASE_URL = os.getenv('LLM_BATCH_BASE_URL')  # e.g. a local stand-in server; provider API if unset
+LLM_BATCH_POLL_INTERVAL = 60  # Seconds between batch status checks
 
 # OCR Configuration
 TESSERACT_CMD = None  # Path to Tesseract executable, None for default location
 # e.g. r'C:\Program Files\Tesseract-OCR\tesseract.exe' on Windows
+OCR_PSM = 6  # Tesseract page segmentation mode (6 = assume a single block of text)
+OCR_LANGUAGE = 'eng'  # Tesseract language pack(s), e.g. 'eng' or 'eng+equ'
+OCR_MAX_WORKERS = int(os.getenv('OCR_MAX_WORKERS', os.cpu_count() or 1))  # Worker processes for batch OCR
+OCR_MAX_IN_FLIGHT = int(os.getenv('OCR_MAX_IN_FLIGHT', OCR_MAX_WORKERS * 2))  # Images queued in the pool at once
+IMAGE_INDEX_POLL_INTERVAL = 2.0  # Minimum seconds between image folder re-scans when not watching for events
+IMAGE_INDEX_WATCH = True  # Watch the image folder for file system events (needs the optional watchdog package)
+
+# Background OCR of new or changed images (watch mode)
+OCR_WATCH_ENABLED = os.getenv('OCR_WATCH_ENABLED', 'false').lower() == 'true'  # Start watching at app start
+OCR_WATCH_DEBOUNCE = 2.0  # Seconds an image must stay unchanged before it is queued
+OCR_WATCH_MAX_WORKERS = 2  # OCR worker processes used by watch jobs
+OCR_WATCH_BATCH_SIZE = 50  # Maximum images per watch job; only one watch job runs at a time
+
+# OCR result cache (keyed by image content hash + OCR settings + Tesseract version)
+OCR_CACHE_DIR = os.getenv('OCR_CACHE_DIR', os.path.join(os.path.dirname(METADATA_FILE), 'ocr_cache'))
+
+# Background job settings
+JOB_MAX_CONCURRENT = 2  # Number of background jobs (e.g. batch OCR) that may run at once
+JOB_HISTORY_LIMIT = 50  # Number of finished jobs kept available for status polling
 
 # Logging settings
 LOG_LEVEL = 'INFO'  # DEBUG, INFO, WARNING, ERROR, CRITICAL
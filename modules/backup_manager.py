@@ -0,0 +1,304 @@
+# modules/backup_manager.py
+import os
+import gzip
+import json
+import hashlib
+import logging
+import datetime
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+class BackupManager:
+    """
+    Keeps compressed, deduplicated snapshots of the metadata list.
+
+    Each distinct metadata entry is stored once as a gzipped object named by
+    its content hash; a snapshot is a small manifest listing the hashes of the
+    entries it contains. Consecutive snapshots therefore only add the entries
+    that changed in between. Snapshots taken within min_interval seconds of
+    the previous one are coalesced, identical snapshots are skipped, and old
+    snapshots are pruned according to the retention policy.
+    """
+
+    def __init__(self, backup_dir, min_interval=300, keep_last=20, keep_daily=14):
+        """
+        Initialize the backup manager.
+
+        Args:
+            backup_dir (str): Directory where snapshots are stored
+            min_interval (float): Minimum seconds between two snapshots
+            keep_last (int): Number of most recent snapshots always kept
+            keep_daily (int): Number of days for which the newest snapshot of
+                each day is kept in addition to keep_last
+        """
+        self.backup_dir = backup_dir
+        self.objects_dir = os.path.join(backup_dir, 'objects')
+        self.snapshots_dir = os.path.join(backup_dir, 'snapshots')
+        self.min_interval = min_interval
+        self.keep_last = keep_last
+        self.keep_daily = keep_daily
+        self._lock = threading.Lock()
+
+        # Ensure backup directories exist
+        for directory in (self.objects_dir, self.snapshots_dir):
+            if not os.path.exists(directory):
+                os.makedirs(directory)
+
+    def due(self):
+        """
+        Check whether a snapshot would be taken now, i.e. there is none yet
+        or the previous one is at least min_interval old. Lets callers skip
+        collecting the entries when the snapshot would be coalesced anyway.
+
+        Returns:
+            bool: True if the min_interval window has passed
+        """
+        with self._lock:
+            latest = self._latest_snapshot_id()
+        if not latest:
+            return True
+        return (datetime.datetime.now() - self._snapshot_time(latest)).total_seconds() >= self.min_interval
+
+    def snapshot(self, entries, force=False):
+        """
+        Take a snapshot of the metadata list, unless it is unchanged or the
+        previous snapshot is more recent than min_interval.
+
+        Args:
+            entries (list): List of metadata entries
+            force (bool): Whether to ignore the min_interval window
+
+        Returns:
+            str: ID of the new snapshot, or None if the snapshot was skipped
+        """
+        with self._lock:
+            latest = self._latest_snapshot_id()
+            now = datetime.datetime.now()
+
+            if latest and not force:
+                age = (now - self._snapshot_time(latest)).total_seconds()
+                if age < self.min_interval:
+                    logger.debug(f"Skipping backup: last snapshot taken {age:.0f}s ago")
+                    return None
+
+            # Store each entry under its content hash; unchanged entries already exist
+            hashes = []
+            for entry in entries:
+                # Hash the canonical form but store the entry with its key order intact
+                canonical = json.dumps(entry, sort_keys=True).encode('utf-8')
+                entry_hash = hashlib.sha256(canonical).hexdigest()
+                self._write_object(entry_hash, json.dumps(entry).encode('utf-8'))
+                hashes.append(entry_hash)
+
+            digest = hashlib.sha256('\n'.join(hashes).encode('utf-8')).hexdigest()
+            if latest and self._read_manifest(latest).get('digest') == digest:
+                logger.debug("Skipping backup: metadata unchanged since last snapshot")
+                return None
+
+            snapshot_id = now.strftime("%Y%m%d_%H%M%S_%f")
+            manifest = {
+                'id': snapshot_id,
+                'created': now.isoformat(),
+                'entry_count': len(hashes),
+                'digest': digest,
+                'entries': hashes
+            }
+            self._write_gzip(self._manifest_path(snapshot_id), json.dumps(manifest).encode('utf-8'))
+            logger.info(f"Created metadata snapshot {snapshot_id} ({len(hashes)} entries)")
+
+            self._apply_retention()
+            return snapshot_id
+
+    def list_snapshots(self):
+        """
+        List available snapshots, newest first.
+
+        Returns:
+            list: List of dictionaries with 'id', 'created' and 'entry_count'
+        """
+        snapshots = []
+        for snapshot_id in reversed(self._snapshot_ids()):
+            manifest = self._read_manifest(snapshot_id)
+            snapshots.append({
+                'id': snapshot_id,
+                'created': manifest.get('created'),
+                'entry_count': manifest.get('entry_count')
+            })
+        return snapshots
+
+    def restore(self, snapshot_id):
+        """
+        Rebuild the metadata list stored in a snapshot.
+
+        Args:
+            snapshot_id (str): Snapshot ID from list_snapshots()
+
+        Returns:
+            list: List of metadata entries, or None if the snapshot doesn't exist
+        """
+        if not os.path.exists(self._manifest_path(snapshot_id)):
+            logger.error(f"Snapshot not found: {snapshot_id}")
+            return None
+
+        manifest = self._read_manifest(snapshot_id)
+        return [json.loads(self._read_gzip(self._object_path(entry_hash)))
+                for entry_hash in manifest.get('entries', [])]
+
+    def _apply_retention(self):
+        """
+        Delete snapshots outside the retention policy and any objects no
+        remaining snapshot refers to. Caller holds the lock.
+        """
+        snapshot_ids = self._snapshot_ids()
+        keep = set(snapshot_ids[-self.keep_last:]) if self.keep_last > 0 else set()
+
+        # Keep the newest snapshot of each of the last keep_daily days
+        cutoff = (datetime.datetime.now() - datetime.timedelta(days=self.keep_daily)).strftime("%Y%m%d")
+        newest_per_day = {}
+        for snapshot_id in snapshot_ids:
+            day = snapshot_id[:8]
+            if day >= cutoff:
+                newest_per_day[day] = snapshot_id
+        keep.update(newest_per_day.values())
+
+        expired = [snapshot_id for snapshot_id in snapshot_ids if snapshot_id not in keep]
+        if not expired:
+            return
+
+        for snapshot_id in expired:
+            try:
+                os.remove(self._manifest_path(snapshot_id))
+            except OSError as e:
+                logger.error(f"Failed to remove snapshot {snapshot_id}: {str(e)}")
+
+        # Collect objects no longer referenced by any snapshot
+        referenced = set()
+        for snapshot_id in self._snapshot_ids():
+            referenced.update(self._read_manifest(snapshot_id).get('entries', []))
+
+        removed_objects = 0
+        for shard in os.listdir(self.objects_dir):
+            shard_dir = os.path.join(self.objects_dir, shard)
+            for name in os.listdir(shard_dir):
+                if name.split('.')[0] not in referenced:
+                    os.remove(os.path.join(shard_dir, name))
+                    removed_objects += 1
+
+        logger.info(f"Pruned {len(expired)} old snapshots and {removed_objects} unreferenced objects")
+
+    def _snapshot_ids(self):
+        """
+        Get all snapshot IDs, oldest first.
+
+        Returns:
+            list: Sorted list of snapshot IDs
+        """
+        return sorted(name[:-len('.json.gz')] for name in os.listdir(self.snapshots_dir)
+                      if name.endswith('.json.gz'))
+
+    def _latest_snapshot_id(self):
+        """
+        Get the most recent snapshot ID.
+
+        Returns:
+            str: Snapshot ID, or None if there are no snapshots
+        """
+        snapshot_ids = self._snapshot_ids()
+        return snapshot_ids[-1] if snapshot_ids else None
+
+    def _snapshot_time(self, snapshot_id):
+        """
+        Get the time a snapshot was taken from its ID.
+
+        Args:
+            snapshot_id (str): Snapshot ID
+
+        Returns:
+            datetime.datetime: Snapshot time
+        """
+        return datetime.datetime.strptime(snapshot_id, "%Y%m%d_%H%M%S_%f")
+
+    def _read_manifest(self, snapshot_id):
+        """
+        Read a snapshot manifest.
+
+        Args:
+            snapshot_id (str): Snapshot ID
+
+        Returns:
+            dict: Manifest, or an empty dict if it can't be read
+        """
+        try:
+            return json.loads(self._read_gzip(self._manifest_path(snapshot_id)))
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to read snapshot {snapshot_id}: {str(e)}")
+            return {}
+
+    def _write_object(self, entry_hash, data):
+        """
+        Store an entry object if it isn't stored already.
+
+        Args:
+            entry_hash (str): Content hash of the entry
+            data (bytes): Serialized entry
+        """
+        path = self._object_path(entry_hash)
+        if os.path.exists(path):
+            return
+
+        object_dir = os.path.dirname(path)
+        if not os.path.exists(object_dir):
+            os.makedirs(object_dir, exist_ok=True)
+        self._write_gzip(path, data)
+
+    def _write_gzip(self, path, data):
+        """
+        Write compressed data atomically.
+
+        Args:
+            path (str): Destination path
+            data (bytes): Uncompressed data
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(gzip.compress(data))
+        os.replace(tmp_path, path)
+
+    def _read_gzip(self, path):
+        """
+        Read and decompress a stored file.
+
+        Args:
+            path (str): Path of the compressed file
+
+        Returns:
+            bytes: Uncompressed data
+        """
+        with open(path, 'rb') as f:
+            return gzip.decompress(f.read())
+
+    def _manifest_path(self, snapshot_id):
+        """
+        Get the manifest path for a snapshot ID.
+
+        Args:
+            snapshot_id (str): Snapshot ID
+
+        Returns:
+            str: Path of the manifest file
+        """
+        return os.path.join(self.snapshots_dir, f"{snapshot_id}.json.gz")
+
+    def _object_path(self, entry_hash):
+        """
+        Get the object path for an entry hash, sharded by the first two hex digits.
+
+        Args:
+            entry_hash (str): Content hash of the entry
+
+        Returns:
+            str: Path of the object file
+        """
+        return os.path.join(self.objects_dir, entry_hash[:2], f"{entry_hash}.json.gz")
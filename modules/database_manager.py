@@ -1,26 +1,98 @@
 # modules/database_manager.py
 import os
 import json
+import base64
 import sqlite3
 import logging
+import re
 import datetime
+import threading
+import contextlib
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
+# Metadata fields stored in their own indexed columns, besides metadata_json
+INDEXED_FIELDS = ('subject', 'chapter', 'topic', 'question_type', 'difficulty_level')
+
+# List fields stored in join tables: metadata field -> (table, value column)
+TAG_TABLES = {
+    'keywords': ('question_keywords', 'keyword'),
+    'cognitive_skills': ('question_cognitive_skills', 'skill')
+}
+
+# Metadata fields indexed for full-text search, in questions_fts column order
+SEARCH_FIELDS = ('cleaned_text', 'keywords', 'answer')
+
+# bm25 weight of each SEARCH_FIELDS column; a keyword hit counts more than a hit in the text
+SEARCH_WEIGHTS = (1.0, 2.0, 0.5)
+
+# Words as the unicode61 tokenizer splits them, kept unstemmed in search_terms for prefix completion
+SEARCH_TERM_PATTERN = re.compile(r'[^\W_]+')
+
+# Maximum number of indexed words a typed prefix is expanded to
+SEARCH_PREFIX_COMPLETIONS = 50
+
+# OperationalError messages caused by the text of a raw FTS5 query rather than the database
+SEARCH_QUERY_ERRORS = ('fts5:', 'syntax error', 'unterminated string', 'no such column', 'unknown special query')
+
+# Fields that can be returned straight from a column of the questions table
+COLUMN_FIELDS = ('id', 'filename', 'created', 'last_updated', 'review_completed', 'review_completed_at') + INDEXED_FIELDS
+
 class DatabaseManager:
     """
     Handles SQLite database operations for storing question metadata.
+    
+    Connections are kept in a thread-safe pool instead of being opened per
+    call. The database runs in WAL mode so readers don't block the writer,
+    and each connection waits on locks (busy_timeout) rather than failing
+    with a "database is locked" error. Long-lived connections also keep their
+    prepared statement cache between calls.
+    
+    Besides the full metadata JSON, the fields used for filtering are kept
+    in indexed columns and keywords/cognitive skills in join tables, so
+    questions can be found without decoding any JSON. The schema version is
+    tracked in PRAGMA user_version and older databases are migrated on start.
+    
+    Question text, keywords and answers are also indexed in an FTS5 table
+    (questions_fts, keyed by question id) when the SQLite build supports it.
+    That index is stemmed, so a partly typed word can't be matched against
+    it as a prefix; the unstemmed words are kept in search_terms so the
+    last word of a search can be completed first.
     """
     
-    def __init__(self, db_file):
+    # Current schema version (PRAGMA user_version)
+    SCHEMA_VERSION = 2
+    
+    def __init__(self, db_file, pool_size=8, busy_timeout=5.0, cache_size_kb=20000,
+                 mmap_size=256 * 1024 * 1024, cached_statements=128):
         """
         Initialize database manager with the path to the SQLite database file.
         
         Args:
             db_file (str): Path to the SQLite database file
+            pool_size (int): Maximum number of open connections
+            busy_timeout (float): Seconds to wait for a lock before giving up
+            cache_size_kb (int): Page cache size per connection, in KiB
+            mmap_size (int): Bytes of the database file to memory-map (0 disables)
+            cached_statements (int): Prepared statements cached per connection
         """
         self.db_file = db_file
+        self.pool_size = pool_size
+        self.busy_timeout = busy_timeout
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size
+        self.cached_statements = cached_statements
+        
+        # Idle connections (most recently used last) and a limit on connections in use
+        self._idle = []
+        self._pool_lock = threading.Lock()
+        self._pool_slots = threading.BoundedSemaphore(pool_size)
+        self._in_use = 0
+        self._closed = False
+        
+        # Set once the full-text index exists
+        self.search_enabled = False
         
         # Ensure parent directory exists
         db_dir = os.path.dirname(db_file)
@@ -34,55 +106,380 @@ class DatabaseManager:
         """
         Initialize the database schema if it doesn't exist.
         """
-        conn = None
         try:
-            # Connect to the database (creates file if it doesn't exist)
-            conn = sqlite3.connect(self.db_file)
-            cursor = conn.cursor()
-            
-            # Create metadata table if it doesn't exist
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS questions (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    filename TEXT UNIQUE NOT NULL,
-                    created TEXT NOT NULL,
-                    last_updated TEXT NOT NULL,
-                    review_completed INTEGER NOT NULL DEFAULT 0,
-                    review_completed_at TEXT,
-                    metadata_json TEXT NOT NULL
-                )
-            ''')
-            
-            # Create indices
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_filename ON questions (filename)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_review_completed ON questions (review_completed)')
-            
-            conn.commit()
-            logger.info(f"Database initialized: {self.db_file}")
+            with self._connection() as conn:
+                # WAL is persistent in the database file, so it only needs setting once
+                journal_mode = conn.execute('PRAGMA journal_mode = WAL').fetchone()[0]
+                if journal_mode.lower() != 'wal':
+                    logger.warning(f"Could not enable WAL mode, using {journal_mode} journal")
+                
+                cursor = conn.cursor()
+                
+                # Create metadata table if it doesn't exist
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS questions (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        filename TEXT UNIQUE NOT NULL,
+                        created TEXT NOT NULL,
+                        last_updated TEXT NOT NULL,
+                        review_completed INTEGER NOT NULL DEFAULT 0,
+                        review_completed_at TEXT,
+                        metadata_json TEXT NOT NULL
+                    )
+                ''')
+                
+                # Create indices
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_filename ON questions (filename)')
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_review_completed ON questions (review_completed)')
+                
+                conn.commit()
+                
+                self._migrate(conn)
+                self._initialize_search(conn)
+                logger.info(f"Database initialized: {self.db_file}")
             
         except sqlite3.Error as e:
             logger.error(f"Error initializing database: {str(e)}")
-        finally:
-            if conn:
-                conn.close()
+    
+    def _migrate(self, conn):
+        """
+        Bring the schema up to SCHEMA_VERSION. Each migration runs in its own
+        transaction together with the user_version bump.
+        
+        Args:
+            conn (sqlite3.Connection): Database connection
+        """
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        migrations = {1: self._migrate_v1, 2: self._migrate_v2}
+        
+        for target in range(version + 1, self.SCHEMA_VERSION + 1):
+            logger.info(f"Migrating database schema to version {target}")
+            conn.execute('BEGIN')
+            try:
+                migrations[target](conn)
+                conn.execute(f'PRAGMA user_version = {target}')
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+    
+    def _migrate_v1(self, conn):
+        """
+        Add indexed metadata columns and keyword/cognitive skill tables, and
+        fill them from the metadata JSON of existing rows.
+        
+        Args:
+            conn (sqlite3.Connection): Database connection
+        """
+        for field in INDEXED_FIELDS:
+            # NOCASE so filters match however the LLM or reviewer capitalized the value
+            conn.execute(f'ALTER TABLE questions ADD COLUMN {field} TEXT COLLATE NOCASE')
+        
+        conn.execute('CREATE INDEX idx_subject_chapter ON questions (subject, chapter)')
+        conn.execute('CREATE INDEX idx_chapter_difficulty ON questions (chapter, difficulty_level)')
+        conn.execute('CREATE INDEX idx_topic ON questions (topic)')
+        conn.execute('CREATE INDEX idx_question_type ON questions (question_type)')
+        conn.execute('CREATE INDEX idx_difficulty_level ON questions (difficulty_level)')
+        
+        for table, column in TAG_TABLES.values():
+            conn.execute(f'''
+                CREATE TABLE {table} (
+                    question_id INTEGER NOT NULL REFERENCES questions (id) ON DELETE CASCADE,
+                    {column} TEXT NOT NULL COLLATE NOCASE,
+                    PRIMARY KEY (question_id, {column})
+                ) WITHOUT ROWID
+            ''')
+            conn.execute(f'CREATE INDEX idx_{table}_{column} ON {table} ({column}, question_id)')
+        
+        # Backfill from the stored JSON
+        rows = conn.execute('SELECT filename, metadata_json FROM questions').fetchall()
+        metadata_list = []
+        for row in rows:
+            try:
+                metadata = json.loads(row['metadata_json'])
+            except ValueError:
+                logger.warning(f"Skipping unreadable metadata for {row['filename']} during migration")
+                continue
+            metadata['filename'] = row['filename']
+            metadata_list.append(metadata)
+        
+        conn.executemany(
+            f"UPDATE questions SET {', '.join(f'{field} = ?' for field in INDEXED_FIELDS)} WHERE filename = ?",
+            [self._indexed_values(metadata) + (metadata['filename'],) for metadata in metadata_list]
+        )
+        self._save_tags(conn, metadata_list)
+        logger.info(f"Filled indexed columns for {len(metadata_list)} existing questions")
+    
+    def _migrate_v2(self, conn):
+        """
+        Index the keyset pagination order used by query_questions().
+        
+        Args:
+            conn (sqlite3.Connection): Database connection
+        """
+        conn.execute('CREATE INDEX idx_last_updated_id ON questions (last_updated, id)')
+    
+    def _initialize_search(self, conn):
+        """
+        Create the FTS5 search index and the search_terms word list if they
+        don't exist, filling them from the stored questions. The index is
+        optional: without FTS5 support in the SQLite build, searching is
+        disabled and everything else still works.
+        
+        Args:
+            conn (sqlite3.Connection): Database connection
+        """
+        existing = {row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ('questions_fts', 'search_terms')"
+        )}
+        
+        if len(existing) < 2:
+            conn.execute('BEGIN')
+            try:
+                rows = conn.execute('SELECT id, metadata_json FROM questions').fetchall()
+                values = [(row['id'],) + self._search_values(json.loads(row['metadata_json'])) for row in rows]
+                
+                if 'questions_fts' not in existing:
+                    conn.execute(f'''
+                        CREATE VIRTUAL TABLE questions_fts USING fts5(
+                            {', '.join(SEARCH_FIELDS)},
+                            tokenize = 'porter unicode61'
+                        )
+                    ''')
+                    conn.executemany(
+                        f"INSERT INTO questions_fts (rowid, {', '.join(SEARCH_FIELDS)}) VALUES (?, ?, ?, ?)",
+                        values
+                    )
+                    logger.info(f"Built full-text search index for {len(rows)} questions")
+                
+                if 'search_terms' not in existing:
+                    conn.execute('CREATE TABLE search_terms (term TEXT PRIMARY KEY) WITHOUT ROWID')
+                    self._save_search_terms(conn, [value[1:] for value in values])
                 
-    def _get_connection(self):
+                conn.commit()
+            except (sqlite3.Error, ValueError) as e:
+                conn.rollback()
+                logger.warning(f"Full-text search is disabled: {str(e)}")
+                return
+        
+        self.search_enabled = True
+    
+    def _connect(self):
         """
-        Get a fresh database connection.
+        Open and configure a new database connection.
         
         Returns:
             sqlite3.Connection: Database connection
         """
+        conn = sqlite3.connect(
+            self.db_file,
+            timeout=self.busy_timeout,
+            check_same_thread=False,  # Pooled connections move between request threads
+            cached_statements=self.cached_statements
+        )
+        # Enable foreign keys
+        conn.execute("PRAGMA foreign_keys = ON")
+        # WAL only needs fsync at checkpoints to stay consistent
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute(f"PRAGMA cache_size = {-int(self.cache_size_kb)}")
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        # Return dictionary-like rows
+        conn.row_factory = sqlite3.Row
+        return conn
+    
+    @contextlib.contextmanager
+    def _connection(self):
+        """
+        Borrow a connection from the pool, opening one if none is idle. Any
+        transaction left open (e.g. after an error) is rolled back before the
+        connection goes back to the pool.
+        
+        Yields:
+            sqlite3.Connection: Database connection
+        """
+        if not self._pool_slots.acquire(timeout=self.busy_timeout):
+            raise sqlite3.OperationalError("Timed out waiting for a database connection")
+        
+        conn = None
         try:
-            conn = sqlite3.connect(self.db_file)
-            # Enable foreign keys
-            conn.execute("PRAGMA foreign_keys = ON")
-            # Return dictionary-like rows
-            conn.row_factory = sqlite3.Row
-            return conn
-        except sqlite3.Error as e:
-            logger.error(f"Error connecting to database: {str(e)}")
-            return None
+            with self._pool_lock:
+                self._in_use += 1
+                if self._idle:
+                    conn = self._idle.pop()
+            if conn is None:
+                conn = self._connect()
+            yield conn
+        finally:
+            if conn is not None and conn.in_transaction:
+                conn.rollback()
+            with self._pool_lock:
+                self._in_use -= 1
+                if conn is not None:
+                    if self._closed:
+                        conn.close()
+                    else:
+                        self._idle.append(conn)
+            self._pool_slots.release()
+    
+    # Insert a question or update the stored one in place; 'created' keeps its original value
+    UPSERT_SQL = '''
+        INSERT INTO questions
+        (filename, created, last_updated, review_completed, review_completed_at, metadata_json,
+         subject, chapter, topic, question_type, difficulty_level)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(filename) DO UPDATE SET
+            last_updated = excluded.last_updated,
+            review_completed = excluded.review_completed,
+            review_completed_at = excluded.review_completed_at,
+            metadata_json = excluded.metadata_json,
+            subject = excluded.subject,
+            chapter = excluded.chapter,
+            topic = excluded.topic,
+            question_type = excluded.question_type,
+            difficulty_level = excluded.difficulty_level
+    '''
+    
+    @staticmethod
+    def _indexed_values(metadata):
+        """
+        Get the values of the indexed metadata columns.
+        
+        Args:
+            metadata (dict): Question metadata
+            
+        Returns:
+            tuple: Values in INDEXED_FIELDS order; missing or non-text values are None
+        """
+        values = []
+        for field in INDEXED_FIELDS:
+            value = metadata.get(field)
+            values.append((value.strip() or None) if isinstance(value, str) else None)
+        return tuple(values)
+    
+    @staticmethod
+    def _tag_values(metadata, field):
+        """
+        Get the distinct, non-empty values of a list field such as keywords.
+        
+        Args:
+            metadata (dict): Question metadata
+            field (str): Name of the list field
+            
+        Returns:
+            list: Stripped values, in order, without case-insensitive duplicates
+        """
+        values = metadata.get(field)
+        if isinstance(values, str):
+            values = [values]
+        if not isinstance(values, list):
+            return []
+        
+        seen = set()
+        tags = []
+        for value in values:
+            if not isinstance(value, str) or not value.strip():
+                continue
+            if value.strip().lower() not in seen:
+                seen.add(value.strip().lower())
+                tags.append(value.strip())
+        return tags
+    
+    @staticmethod
+    def _search_values(metadata):
+        """
+        Get the text indexed for full-text search.
+        
+        Args:
+            metadata (dict): Question metadata
+            
+        Returns:
+            tuple: Text for each SEARCH_FIELDS column
+        """
+        values = []
+        for field in SEARCH_FIELDS:
+            value = metadata.get(field)
+            if isinstance(value, list):
+                value = ' '.join(str(item) for item in value)
+            values.append(str(value) if value is not None else '')
+        return tuple(values)
+    
+    def _save_search_text(self, conn, metadata_list):
+        """
+        Replace the full-text index rows of saved questions.
+        Must run in the same transaction as the question upsert.
+        
+        Args:
+            conn (sqlite3.Connection): Database connection
+            metadata_list (list): Metadata of questions already written to the questions table
+        """
+        if not self.search_enabled:
+            return
+        
+        conn.executemany('DELETE FROM questions_fts WHERE rowid = (SELECT id FROM questions WHERE filename = ?)',
+                         [(metadata['filename'],) for metadata in metadata_list])
+        conn.executemany(
+            f"INSERT INTO questions_fts (rowid, {', '.join(SEARCH_FIELDS)}) "
+            f"SELECT id, ?, ?, ? FROM questions WHERE filename = ?",
+            [self._search_values(metadata) + (metadata['filename'],) for metadata in metadata_list]
+        )
+        self._save_search_terms(conn, [self._search_values(metadata) for metadata in metadata_list])
+    
+    @staticmethod
+    def _save_search_terms(conn, values_list):
+        """
+        Add the words of indexed text to search_terms. Words are never
+        removed; a stale word only adds a completion that matches nothing.
+        
+        Args:
+            conn (sqlite3.Connection): Database connection
+            values_list (list): Tuples of text for each SEARCH_FIELDS column
+        """
+        terms = set()
+        for values in values_list:
+            for value in values:
+                terms.update(word.lower() for word in SEARCH_TERM_PATTERN.findall(value))
+        conn.executemany('INSERT OR IGNORE INTO search_terms (term) VALUES (?)', [(term,) for term in terms])
+    
+    def _save_tags(self, conn, metadata_list):
+        """
+        Replace the keyword and cognitive skill rows of saved questions.
+        Must run in the same transaction as the question upsert.
+        
+        Args:
+            conn (sqlite3.Connection): Database connection
+            metadata_list (list): Metadata of questions already written to the questions table
+        """
+        filenames = [(metadata['filename'],) for metadata in metadata_list]
+        for field, (table, column) in TAG_TABLES.items():
+            conn.executemany(f'DELETE FROM {table} WHERE question_id = (SELECT id FROM questions WHERE filename = ?)',
+                             filenames)
+            conn.executemany(
+                f'INSERT OR IGNORE INTO {table} (question_id, {column}) SELECT id, ? FROM questions WHERE filename = ?',
+                [(tag, metadata['filename']) for metadata in metadata_list for tag in self._tag_values(metadata, field)]
+            )
+    
+    @staticmethod
+    def _question_row(metadata):
+        """
+        Build the row parameters for UPSERT_SQL from question metadata.
+        
+        Args:
+            metadata (dict): Question metadata including filename
+            
+        Returns:
+            tuple: Row parameters, in UPSERT_SQL column order
+        """
+        created = metadata.get('created', datetime.datetime.now().isoformat())
+        last_updated = metadata.get('last_updated', created)
+        review_completed = 1 if metadata.get('review_completed', False) else 0
+        review_completed_at = metadata.get('review_completed_at') if review_completed else None
+        
+        # Convert full metadata to JSON for storage
+        metadata_json = json.dumps(metadata)
+        
+        return ((metadata['filename'], created, last_updated, review_completed, review_completed_at, metadata_json)
+                + DatabaseManager._indexed_values(metadata))
     
     def save_question(self, metadata):
         """
@@ -98,56 +495,69 @@ class DatabaseManager:
             logger.error("Invalid metadata: missing filename")
             return False
             
-        conn = self._get_connection()
-        if not conn:
-            return False
-            
         try:
-            cursor = conn.cursor()
-            
-            filename = metadata['filename']
-            created = metadata.get('created', datetime.datetime.now().isoformat())
-            last_updated = metadata.get('last_updated', created)
-            review_completed = 1 if metadata.get('review_completed', False) else 0
-            review_completed_at = metadata.get('review_completed_at') if review_completed else None
-            
-            # Convert full metadata to JSON for storage
-            metadata_json = json.dumps(metadata)
-            
-            # Check if record already exists
-            cursor.execute('SELECT id FROM questions WHERE filename = ?', (filename,))
-            existing = cursor.fetchone()
-            
-            if existing:
-                # Update existing record
-                cursor.execute('''
-                    UPDATE questions
-                    SET last_updated = ?,
-                        review_completed = ?,
-                        review_completed_at = ?,
-                        metadata_json = ?
-                    WHERE filename = ?
-                ''', (last_updated, review_completed, review_completed_at, metadata_json, filename))
-            else:
-                # Insert new record
-                cursor.execute('''
-                    INSERT INTO questions
-                    (filename, created, last_updated, review_completed, review_completed_at, metadata_json)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (filename, created, last_updated, review_completed, review_completed_at, metadata_json))
-            
-            conn.commit()
-            logger.info(f"Question metadata saved to database: {filename}")
-            return True
+            with self._connection() as conn:
+                conn.execute(self.UPSERT_SQL, self._question_row(metadata))
+                self._save_tags(conn, [metadata])
+                self._save_search_text(conn, [metadata])
+                conn.commit()
+                logger.info(f"Question metadata saved to database: {metadata['filename']}")
+                return True
             
         except sqlite3.Error as e:
-            if conn:
-                conn.rollback()
             logger.error(f"Error saving question to database: {str(e)}")
             return False
-        finally:
-            if conn:
-                conn.close()
+    
+    def save_questions(self, metadata_list, chunk_size=500):
+        """
+        Save metadata for many questions, committing one transaction per chunk.
+        
+        A chunk that fails is rolled back and counted as failed; the other
+        chunks are still saved.
+        
+        Args:
+            metadata_list (list): List of question metadata dictionaries
+            chunk_size (int): Number of questions written per transaction
+            
+        Returns:
+            tuple: (success_count, failure_count)
+        """
+        valid = []
+        failure_count = 0
+        for metadata in metadata_list or []:
+            if not metadata or 'filename' not in metadata:
+                logger.error("Invalid metadata: missing filename")
+                failure_count += 1
+                continue
+            valid.append(metadata)
+        
+        if not valid:
+            return (0, failure_count)
+        
+        success_count = 0
+        chunk_size = max(1, chunk_size)
+        try:
+            with self._connection() as conn:
+                for offset in range(0, len(valid), chunk_size):
+                    chunk = valid[offset:offset + chunk_size]
+                    try:
+                        conn.executemany(self.UPSERT_SQL, [self._question_row(metadata) for metadata in chunk])
+                        self._save_tags(conn, chunk)
+                        self._save_search_text(conn, chunk)
+                        conn.commit()
+                        success_count += len(chunk)
+                    except sqlite3.Error as e:
+                        conn.rollback()
+                        failure_count += len(chunk)
+                        logger.error(f"Error saving {len(chunk)} questions to database: {str(e)}")
+            
+        except sqlite3.Error as e:
+            # No connection could be obtained; nothing after the saved chunks was written
+            logger.error(f"Error saving questions to database: {str(e)}")
+            failure_count += len(valid) - success_count
+        
+        logger.info(f"Saved {success_count} questions to database ({failure_count} failed)")
+        return (success_count, failure_count)
     
     def get_question(self, filename):
         """
@@ -159,14 +569,9 @@ class DatabaseManager:
         Returns:
             dict: Question metadata or None if not found
         """
-        conn = self._get_connection()
-        if not conn:
-            return None
-            
         try:
-            cursor = conn.cursor()
-            cursor.execute('SELECT metadata_json FROM questions WHERE filename = ?', (filename,))
-            row = cursor.fetchone()
+            with self._connection() as conn:
+                row = conn.execute('SELECT metadata_json FROM questions WHERE filename = ?', (filename,)).fetchone()
             
             if not row:
                 return None
@@ -176,9 +581,6 @@ class DatabaseManager:
         except sqlite3.Error as e:
             logger.error(f"Error retrieving question from database: {str(e)}")
             return None
-        finally:
-            if conn:
-                conn.close()
     
     def get_all_questions(self, review_completed=None):
         """
@@ -190,30 +592,321 @@ class DatabaseManager:
         Returns:
             list: List of question metadata dictionaries
         """
-        conn = self._get_connection()
-        if not conn:
+        try:
+            with self._connection() as conn:
+                if review_completed is None:
+                    rows = conn.execute('SELECT metadata_json FROM questions ORDER BY last_updated DESC').fetchall()
+                else:
+                    review_val = 1 if review_completed else 0
+                    rows = conn.execute('SELECT metadata_json FROM questions WHERE review_completed = ? ORDER BY last_updated DESC',
+                                        (review_val,)).fetchall()
+            
+            return [json.loads(row['metadata_json']) for row in rows]
+            
+        except sqlite3.Error as e:
+            logger.error(f"Error retrieving questions from database: {str(e)}")
             return []
+    
+    def _filter_clause(self, filters, review_completed=None):
+        """
+        Build a WHERE clause over the indexed columns and tag tables.
+        
+        Args:
+            filters (dict): Values to match, keyed by an INDEXED_FIELDS name,
+                'keyword' or 'cognitive_skill' (case-insensitive equality)
+            review_completed (bool, optional): Filter by review status
+            
+        Returns:
+            tuple: (where_sql, params), where_sql being '' if nothing is filtered
+        """
+        conditions = []
+        params = []
+        
+        if review_completed is not None:
+            conditions.append('review_completed = ?')
+            params.append(1 if review_completed else 0)
+        
+        tag_filters = {'keyword': TAG_TABLES['keywords'], 'cognitive_skill': TAG_TABLES['cognitive_skills']}
+        for name, value in (filters or {}).items():
+            if value is None:
+                continue
+            if name in INDEXED_FIELDS:
+                conditions.append(f'{name} = ?')
+            elif name in tag_filters:
+                table, column = tag_filters[name]
+                conditions.append(f'id IN (SELECT question_id FROM {table} WHERE {column} = ?)')
+            else:
+                raise ValueError(f"Unknown filter: {name}")
+            params.append(value)
+        
+        where_sql = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        return where_sql, params
+    
+    @staticmethod
+    def encode_cursor(last_updated, question_id):
+        """
+        Build the opaque pagination cursor for the last row of a page.
+        
+        Args:
+            last_updated (str): last_updated value of the row
+            question_id (int): id of the row
             
+        Returns:
+            str: URL-safe cursor
+        """
+        raw = json.dumps([last_updated, question_id], separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii')
+    
+    @staticmethod
+    def decode_cursor(cursor):
+        """
+        Read a pagination cursor built by encode_cursor().
+        
+        Args:
+            cursor (str): Cursor from a previous page
+            
+        Returns:
+            tuple: (last_updated, question_id)
+            
+        Raises:
+            ValueError: If the cursor is malformed
+        """
         try:
-            cursor = conn.cursor()
+            last_updated, question_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        except (TypeError, ValueError, UnicodeError) as e:
+            raise ValueError(f"Invalid cursor: {str(e)}")
+        if not isinstance(last_updated, str) or not isinstance(question_id, int):
+            raise ValueError("Invalid cursor")
+        return last_updated, question_id
+    
+    def query_questions(self, filters=None, review_completed=None, fields=None, limit=100, cursor=None):
+        """
+        Get one page of questions, newest first, with only the requested fields.
+        
+        Pages are read with keyset pagination on (last_updated, id), so each
+        page costs an index range scan no matter how deep it is. Column and
+        keyword/cognitive skill fields are read from the indexed columns and
+        tag tables; metadata JSON is only decoded when another field is
+        requested.
+        
+        Args:
+            filters (dict, optional): Filters as accepted by _filter_clause()
+            review_completed (bool, optional): Filter by review status
+            fields (list, optional): Fields to return (default: filename only)
+            limit (int): Maximum number of questions in the page
+            cursor (str, optional): next_cursor of the previous page
             
-            if review_completed is None:
-                cursor.execute('SELECT metadata_json FROM questions ORDER BY last_updated DESC')
-            else:
-                review_val = 1 if review_completed else 0
-                cursor.execute('SELECT metadata_json FROM questions WHERE review_completed = ? ORDER BY last_updated DESC', 
-                              (review_val,))
+        Returns:
+            dict: 'questions' (list of dicts) and 'next_cursor' (None on the last page)
             
-            rows = cursor.fetchall()
+        Raises:
+            ValueError: If a filter or the cursor is invalid
+        """
+        fields = list(fields or ['filename'])
+        where_sql, params = self._filter_clause(filters, review_completed)
+        
+        if cursor:
+            last_updated, question_id = self.decode_cursor(cursor)
+            # Row-value comparison, so SQLite seeks into idx_last_updated_id instead of scanning it
+            keyset = '(last_updated, id) < (?, ?)'
+            where_sql = f'{where_sql} AND {keyset}' if where_sql else f'WHERE {keyset}'
+            params += [last_updated, question_id]
+        
+        # id and last_updated are always selected to build the next cursor
+        select = ['id', 'last_updated']
+        select += [field for field in fields if field in COLUMN_FIELDS and field not in select]
+        for field, (table, column) in TAG_TABLES.items():
+            if field in fields:
+                select.append(f'(SELECT json_group_array({column}) FROM {table} '
+                              f'WHERE question_id = questions.id) AS {field}')
+        json_fields = [field for field in fields if field not in COLUMN_FIELDS and field not in TAG_TABLES]
+        if json_fields:
+            select.append('metadata_json')
+        
+        try:
+            with self._connection() as conn:
+                # One extra row tells whether there is another page
+                rows = conn.execute(f'''
+                    SELECT {', '.join(select)} FROM questions {where_sql}
+                    ORDER BY last_updated DESC, id DESC LIMIT ?
+                ''', params + [limit + 1]).fetchall()
             
-            return [json.loads(row['metadata_json']) for row in rows]
+        except sqlite3.Error as e:
+            logger.error(f"Error querying questions in database: {str(e)}")
+            return {'questions': [], 'next_cursor': None}
+        
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = self.encode_cursor(rows[-1]['last_updated'], rows[-1]['id'])
+        
+        questions = []
+        for row in rows:
+            metadata = json.loads(row['metadata_json']) if json_fields else {}
+            question = {}
+            for field in fields:
+                if field in TAG_TABLES:
+                    question[field] = json.loads(row[field])
+                elif field == 'review_completed':
+                    question[field] = bool(row[field])
+                elif field in COLUMN_FIELDS:
+                    question[field] = row[field]
+                else:
+                    question[field] = metadata.get(field)
+            questions.append(question)
+        
+        return {'questions': questions, 'next_cursor': next_cursor}
+    
+    def count_questions(self, filters=None, review_completed=None):
+        """
+        Count the questions matching the filters without reading any rows.
+        
+        Args:
+            filters (dict, optional): Filters as accepted by _filter_clause()
+            review_completed (bool, optional): Filter by review status
+            
+        Returns:
+            int: Number of matching questions, or None on error
+            
+        Raises:
+            ValueError: If a filter is invalid
+        """
+        where_sql, params = self._filter_clause(filters, review_completed)
+        try:
+            with self._connection() as conn:
+                return conn.execute(f'SELECT COUNT(*) FROM questions {where_sql}', params).fetchone()[0]
             
         except sqlite3.Error as e:
-            logger.error(f"Error retrieving questions from database: {str(e)}")
+            logger.error(f"Error counting questions in database: {str(e)}")
+            return None
+    
+    @staticmethod
+    def build_match_query(text, completions=()):
+        """
+        Turn plain search text into an FTS5 query that matches every word,
+        with the last word also matching as a prefix (for search-as-you-type).
+        
+        The index is stemmed, so "convergin" is not a prefix of the indexed
+        stem "converg"; the last word therefore also matches any of the given
+        completions, which FTS5 stems the same way as the indexed text.
+        
+        Args:
+            text (str): Search text as typed by the user
+            completions (iterable): Indexed words starting with the last word
+            
+        Returns:
+            str: FTS5 MATCH expression, or None if the text has no words
+        """
+        words = re.findall(r'\w+', text or '')
+        if not words:
+            return None
+        # Quoting each word keeps FTS5 operators and punctuation in user text from being parsed
+        terms = [f'"{word}"' for word in words]
+        terms[-1] += '*'
+        if completions:
+            alternatives = [terms[-1]] + [f'"{word}"' for word in completions]
+            terms[-1] = f"({' OR '.join(alternatives)})"
+        # FTS5 doesn't allow an implicit AND before a parenthesized group
+        return ' AND '.join(terms)
+    
+    def _complete_word(self, conn, text):
+        """
+        Find indexed words that start with the last word of the search text.
+        
+        Args:
+            conn (sqlite3.Connection): Database connection
+            text (str): Search text as typed by the user
+            
+        Returns:
+            list: Up to SEARCH_PREFIX_COMPLETIONS words, in alphabetical order
+        """
+        words = SEARCH_TERM_PATTERN.findall(text or '')
+        if not words:
             return []
-        finally:
-            if conn:
-                conn.close()
+        prefix = words[-1].lower()
+        # Range scan on the primary key; U+10FFFF sorts after every other character
+        rows = conn.execute(
+            'SELECT term FROM search_terms WHERE term > ? AND term < ? ORDER BY term LIMIT ?',
+            (prefix, prefix + '\U0010ffff', SEARCH_PREFIX_COMPLETIONS)
+        ).fetchall()
+        return [row['term'] for row in rows]
+    
+    def search_questions(self, query, filters=None, review_completed=None, limit=20, offset=0, raw=False):
+        """
+        Full-text search over question text, keywords and answers, best
+        matches first (bm25, weighted by SEARCH_WEIGHTS).
+        
+        Args:
+            query (str): Search text, or an FTS5 query if raw is True
+            filters (dict, optional): Filters as accepted by _filter_clause()
+            review_completed (bool, optional): Filter by review status
+            limit (int): Maximum number of results
+            offset (int): Number of results to skip
+            raw (bool): Pass the query to FTS5 unchanged (phrases, NEAR, OR, column filters)
+            
+        Returns:
+            list: Result dicts with filename, subject, chapter, topic, score
+                and a highlighted snippet of the matching text
+            
+        Raises:
+            ValueError: If search is unavailable or the query or a filter is invalid
+        """
+        if not self.search_enabled:
+            raise ValueError("Full-text search is not available in this SQLite build")
+        
+        if not raw and not self.build_match_query(query):
+            return []
+        
+        where_sql, params = self._filter_clause(filters, review_completed)
+        where_sql = f'{where_sql} AND questions_fts MATCH ?' if where_sql else 'WHERE questions_fts MATCH ?'
+        weights = ', '.join(str(weight) for weight in SEARCH_WEIGHTS)
+        
+        try:
+            with self._connection() as conn:
+                match = query if raw else self.build_match_query(query, self._complete_word(conn, query))
+                rows = conn.execute(f'''
+                    SELECT filename, subject, chapter, topic,
+                           bm25(questions_fts, {weights}) AS score,
+                           snippet(questions_fts, -1, '<mark>', '</mark>', '…', 16) AS snippet
+                    FROM questions_fts JOIN questions ON questions.id = questions_fts.rowid
+                    {where_sql}
+                    ORDER BY score LIMIT ? OFFSET ?
+                ''', params + [match, limit, offset]).fetchall()
+            
+        except sqlite3.OperationalError as e:
+            # Only the text of a raw query can be malformed; anything else (e.g. a locked database) is a server error
+            if raw and any(marker in str(e).lower() for marker in SEARCH_QUERY_ERRORS):
+                raise ValueError(f"Invalid search query: {str(e)}")
+            logger.error(f"Error searching questions in database: {str(e)}")
+            return []
+        except sqlite3.Error as e:
+            logger.error(f"Error searching questions in database: {str(e)}")
+            return []
+        
+        return [{
+            'filename': row['filename'],
+            'subject': row['subject'],
+            'chapter': row['chapter'],
+            'topic': row['topic'],
+            # bm25 is lower-is-better; flip it so higher means more relevant
+            'score': -row['score'],
+            'snippet': row['snippet']
+        } for row in rows]
+    
+    def get_saved_filenames(self):
+        """
+        Get the filenames of all questions stored in the database.
+        
+        Returns:
+            set: Set of question image filenames
+        """
+        try:
+            with self._connection() as conn:
+                return {row['filename'] for row in conn.execute('SELECT filename FROM questions')}
+            
+        except sqlite3.Error as e:
+            logger.error(f"Error retrieving filenames from database: {str(e)}")
+            return set()
     
     def delete_question(self, filename):
         """
@@ -225,14 +918,14 @@ class DatabaseManager:
         Returns:
             bool: True if successful, False otherwise
         """
-        conn = self._get_connection()
-        if not conn:
-            return False
-            
         try:
-            cursor = conn.cursor()
-            cursor.execute('DELETE FROM questions WHERE filename = ?', (filename,))
-            conn.commit()
+            with self._connection() as conn:
+                if self.search_enabled:
+                    conn.execute('DELETE FROM questions_fts WHERE rowid = (SELECT id FROM questions WHERE filename = ?)',
+                                 (filename,))
+                cursor = conn.cursor()
+                cursor.execute('DELETE FROM questions WHERE filename = ?', (filename,))
+                conn.commit()
             
             if cursor.rowcount > 0:
                 logger.info(f"Question deleted from database: {filename}")
@@ -242,16 +935,36 @@ class DatabaseManager:
                 return False
                 
         except sqlite3.Error as e:
-            if conn:
-                conn.rollback()
             logger.error(f"Error deleting question from database: {str(e)}")
             return False
-        finally:
-            if conn:
-                conn.close()
+    
+    def pool_stats(self):
+        """
+        Get connection pool usage.
+        
+        Returns:
+            dict: Pool size, idle connections and connections in use
+        """
+        with self._pool_lock:
+            return {
+                'pool_size': self.pool_size,
+                'idle': len(self._idle),
+                'in_use': self._in_use
+            }
     
     def close(self):
         """
-        Placeholder for compatibility - connections are closed after each operation.
+        Close all idle pooled connections. Connections still in use are
+        closed when they are returned.
         """
-        pass
\ No newline at end of file
+        with self._pool_lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        
+        for conn in idle:
+            try:
+                # Let SQLite refresh query planner statistics before disconnecting
+                conn.execute('PRAGMA optimize')
+                conn.close()
+            except sqlite3.Error as e:
+                logger.warning(f"Error closing database connection: {str(e)}")
@@ -0,0 +1,160 @@
+# modules/enhancement_pipeline.py
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+class EnhancementPipeline:
+    """
+    Enhances many questions in one server-side run: OCR results are streamed
+    into concurrent LLM calls, and all enhanced metadata is written back with
+    a single batched metadata update. If the LLM processor batches questions,
+    OCR results are grouped by subject and sent several per request.
+    """
+
+    # Fields the LLM fills in; an entry without them has not been enhanced yet
+    ENHANCED_FIELDS = ('question_type', 'difficulty_level')
+
+    def __init__(self, ocr_processor, llm_processor, metadata_manager, max_concurrency=4):
+        """
+        Initialize the pipeline.
+
+        Args:
+            ocr_processor (OCRProcessor): Source of question text
+            llm_processor (LLMProcessor): Performs the metadata analysis
+            metadata_manager (MetadataManager): Destination for enhanced metadata
+            max_concurrency (int): Maximum number of LLM calls in flight at once
+        """
+        self.ocr_processor = ocr_processor
+        self.llm_processor = llm_processor
+        self.metadata_manager = metadata_manager
+        self.max_concurrency = max_concurrency
+
+    def find_unenhanced(self):
+        """
+        Get the images whose metadata has not been enhanced by the LLM yet.
+
+        Returns:
+            list: List of image filenames
+        """
+        metadata_map = self.metadata_manager.get_metadata_map()
+        unenhanced = []
+        for filename in self.ocr_processor.get_image_list():
+            metadata = metadata_map.get(filename) or {}
+            if not all(metadata.get(field) for field in self.ENHANCED_FIELDS):
+                unenhanced.append(filename)
+        return unenhanced
+
+    def run(self, filenames, job=None):
+        """
+        OCR and enhance a list of questions.
+
+        Args:
+            filenames (list): Image filenames to enhance
+            job (Job, optional): Background job used to report per-question
+                results and to check for cancellation
+
+        Returns:
+            dict: Summary with 'enhanced', 'failed' and 'saved' counts
+        """
+        updates = []
+        failed = 0
+        lock = threading.Lock()
+        cancel_event = job.cancel_event if job else None
+
+        def report(result):
+            nonlocal failed
+            with lock:
+                if result.get('success'):
+                    updates.append((result['filename'], result['metadata']))
+                else:
+                    failed += 1
+            if job:
+                job.add_result(result)
+
+        def analyze(filename, ocr_text):
+            try:
+                existing_metadata = self.metadata_manager.get_metadata_for_image(filename)
+                metadata = self.llm_processor.analyze_question(ocr_text, existing_metadata)
+                if 'error' in metadata:
+                    report({'filename': filename, 'success': False, 'error': metadata['error']})
+                else:
+                    report({'filename': filename, 'success': True, 'metadata': metadata})
+            except Exception as e:
+                logger.error(f"Enhancement failed for {filename}: {str(e)}")
+                report({'filename': filename, 'success': False, 'error': str(e)})
+            finally:
+                slots.release()
+
+        def analyze_group(group):
+            try:
+                results = self.llm_processor.analyze_batch([
+                    {'id': filename, 'ocr_text': ocr_text, 'existing_metadata': existing_metadata}
+                    for filename, ocr_text, existing_metadata in group
+                ])
+                for filename, _, _ in group:
+                    metadata = results.get(filename) or {'error': 'No analysis returned'}
+                    if 'error' in metadata:
+                        report({'filename': filename, 'success': False, 'error': metadata['error']})
+                    else:
+                        report({'filename': filename, 'success': True, 'metadata': metadata})
+            except Exception as e:
+                logger.error(f"Batched enhancement failed for {len(group)} questions: {str(e)}")
+                for filename, _, _ in group:
+                    report({'filename': filename, 'success': False, 'error': str(e)})
+            finally:
+                slots.release()
+
+        # Questions waiting to fill a batch, grouped by subject so they share a prompt prefix
+        pending_groups = {}
+        batching = self.llm_processor.batch_capacity() > 1
+
+        # Bound queued LLM work so OCR can't run arbitrarily far ahead
+        slots = threading.BoundedSemaphore(self.max_concurrency * 2)
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='enhance') as executor:
+            def on_ocr_result(index, ocr_result):
+                filename = ocr_result['filename']
+                if not ocr_result.get('success') or not ocr_result.get('text'):
+                    report({'filename': filename, 'success': False,
+                            'error': ocr_result.get('error', 'No OCR text extracted')})
+                    return
+                if cancel_event is not None and cancel_event.is_set():
+                    report({'filename': filename, 'success': False,
+                            'error': 'Enhancement cancelled', 'cancelled': True})
+                    return
+
+                if not batching:
+                    slots.acquire()
+                    executor.submit(analyze, filename, ocr_result['text'])
+                    return
+
+                existing_metadata = self.metadata_manager.get_metadata_for_image(filename)
+                subject = str((existing_metadata or {}).get('subject') or '').strip().lower()
+                group = pending_groups.setdefault(subject, [])
+                group.append((filename, ocr_result['text'], existing_metadata))
+                if len(group) >= self.llm_processor.batch_capacity():
+                    slots.acquire()
+                    executor.submit(analyze_group, pending_groups.pop(subject))
+
+            self.ocr_processor.process_batch(
+                filenames,
+                progress_callback=on_ocr_result,
+                cancel_event=cancel_event
+            )
+
+            # Send the partly filled batches
+            for group in pending_groups.values():
+                slots.acquire()
+                executor.submit(analyze_group, group)
+
+        # Write everything back in one batch (completed items are kept even if cancelled)
+        saved = 0
+        if updates:
+            saved, save_failures = self.metadata_manager.update_batch_metadata(updates, create_missing=True)
+            if save_failures:
+                logger.error(f"Failed to save enhanced metadata for {save_failures} questions")
+
+        logger.info(f"Enhancement run finished: {len(updates)} enhanced, {failed} failed, {saved} saved")
+        return {'enhanced': len(updates), 'failed': failed, 'saved': saved}
@@ -0,0 +1,289 @@
+# modules/image_index.py
+import os
+import time
+import logging
+import threading
+
+# Conditionally import watchdog (inotify on Linux) if available
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+    WATCHDOG_AVAILABLE = True
+except ImportError:
+    WATCHDOG_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+class ImageIndex:
+    """
+    Cached index of the question images in a folder.
+
+    The folder is scanned once with os.scandir and each image's size and
+    mtime are kept in memory. After that the index is refreshed
+    incrementally: with watchdog installed, file system events (inotify on
+    Linux) mark the files to re-check; otherwise the folder is re-scanned
+    at most once per poll interval. Listeners are told which images were
+    added, modified or removed by each refresh.
+    """
+
+    def __init__(self, images_dir, prefix='question_', suffix='.png', poll_interval=2.0, watch=True):
+        """
+        Initialize the image index.
+
+        Args:
+            images_dir (str): Path to the directory containing question images
+            prefix (str): Filename prefix of question images
+            suffix (str): Filename extension of question images (case-insensitive)
+            poll_interval (float): Minimum seconds between two polling scans
+            watch (bool): Whether to use file system events when watchdog is installed
+        """
+        self.images_dir = images_dir
+        self.prefix = prefix
+        self.suffix = suffix.lower()
+        self.poll_interval = poll_interval
+
+        self._lock = threading.RLock()
+        self._entries = {}  # filename -> (size, mtime_ns)
+        self._sorted = None  # Sorted filenames, rebuilt after a change
+        self._scanned = False
+        self._last_scan = 0.0
+        self._listeners = []
+
+        # Filenames reported by file system events since the last refresh
+        self._dirty = set()
+        self._observer = None
+        if watch:
+            self._start_observer()
+
+    def matches(self, filename):
+        """
+        Check whether a filename is a question image.
+
+        Args:
+            filename (str): Filename without directory
+
+        Returns:
+            bool: True if the file belongs in the index
+        """
+        return filename.startswith(self.prefix) and filename.lower().endswith(self.suffix)
+
+    def add_listener(self, callback):
+        """
+        Register a function called after each refresh that changed the index.
+
+        Args:
+            callback (callable): Called as callback(added, modified, removed)
+                with lists of filenames
+        """
+        with self._lock:
+            self._listeners.append(callback)
+
+    def get_images(self):
+        """
+        Get all question images, refreshing the index first if needed.
+
+        Returns:
+            list: Sorted list of image filenames
+        """
+        with self._lock:
+            self.refresh()
+            if self._sorted is None:
+                self._sorted = sorted(self._entries)
+            return list(self._sorted)
+
+    def get_image_set(self):
+        """
+        Get all question images as a set, for membership checks.
+
+        Returns:
+            set: Set of image filenames
+        """
+        with self._lock:
+            self.refresh()
+            return set(self._entries)
+
+    def get_entry(self, filename):
+        """
+        Get the indexed size and modification time of an image.
+
+        Args:
+            filename (str): Image filename
+
+        Returns:
+            tuple: (size, mtime_ns), or None if the image isn't indexed
+        """
+        with self._lock:
+            self.refresh()
+            return self._entries.get(filename)
+
+    def partition(self, completed_filenames):
+        """
+        Split the images into pending and completed ones with set lookups.
+
+        Args:
+            completed_filenames (iterable): Filenames marked as review completed
+
+        Returns:
+            tuple: (pending, completed) lists; completed keeps the given order
+                and only includes images that exist, pending is sorted
+        """
+        with self._lock:
+            images = self.get_images()
+            existing = set(self._entries)
+
+        completed = [filename for filename in completed_filenames if filename in existing]
+        completed_set = set(completed)
+        pending = [filename for filename in images if filename not in completed_set]
+        return pending, completed
+
+    def refresh(self, force=False):
+        """
+        Bring the index up to date with the folder.
+
+        Args:
+            force (bool): Re-scan the whole folder even if it was scanned recently
+
+        Returns:
+            tuple: (added, modified, removed) lists of filenames
+        """
+        with self._lock:
+            if not self._scanned or force:
+                changes = self._scan()
+            elif self._observer is not None:
+                changes = self._check_dirty()
+            elif time.monotonic() - self._last_scan >= self.poll_interval:
+                changes = self._scan()
+            else:
+                return [], [], []
+
+            if any(changes):
+                self._sorted = None
+                listeners = list(self._listeners)
+            else:
+                listeners = []
+
+        for callback in listeners:
+            try:
+                callback(*changes)
+            except Exception as e:
+                logger.error(f"Image index listener failed: {str(e)}")
+        return changes
+
+    def close(self):
+        """
+        Stop watching the folder for file system events.
+        """
+        observer, self._observer = self._observer, None
+        if observer is not None:
+            observer.stop()
+            observer.join(timeout=5)
+
+    def _scan(self):
+        """
+        Re-scan the whole folder and diff it against the index.
+
+        Returns:
+            tuple: (added, modified, removed) lists of filenames
+        """
+        self._last_scan = time.monotonic()
+        self._scanned = True
+        self._dirty.clear()
+
+        entries = {}
+        try:
+            with os.scandir(self.images_dir) as iterator:
+                for entry in iterator:
+                    if not self.matches(entry.name):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        # Removed between listing and stat
+                        continue
+                    entries[entry.name] = (stat.st_size, stat.st_mtime_ns)
+        except FileNotFoundError:
+            logger.error(f"Image directory not found: {self.images_dir}")
+        except OSError as e:
+            logger.error(f"Could not scan image directory {self.images_dir}: {str(e)}")
+            return [], [], []
+
+        previous = self._entries
+        added = [name for name in entries if name not in previous]
+        removed = [name for name in previous if name not in entries]
+        modified = [name for name, signature in entries.items()
+                    if name in previous and previous[name] != signature]
+        self._entries = entries
+        return added, modified, removed
+
+    def _check_dirty(self):
+        """
+        Re-check only the files reported by file system events.
+
+        Returns:
+            tuple: (added, modified, removed) lists of filenames
+        """
+        dirty, self._dirty = self._dirty, set()
+
+        added, modified, removed = [], [], []
+        for name in dirty:
+            try:
+                stat = os.stat(os.path.join(self.images_dir, name))
+                signature = (stat.st_size, stat.st_mtime_ns)
+            except OSError:
+                signature = None
+
+            previous = self._entries.get(name)
+            if signature is None:
+                if previous is not None:
+                    del self._entries[name]
+                    removed.append(name)
+            elif previous is None:
+                self._entries[name] = signature
+                added.append(name)
+            elif previous != signature:
+                self._entries[name] = signature
+                modified.append(name)
+        return added, modified, removed
+
+    def _mark_dirty(self, path):
+        """
+        Record a path reported by a file system event.
+
+        Args:
+            path (str): Path of the created, modified, moved or deleted file
+        """
+        name = os.path.basename(path)
+        if self.matches(name):
+            with self._lock:
+                self._dirty.add(name)
+
+    def _start_observer(self):
+        """
+        Start watching the folder with watchdog, if it is installed.
+        """
+        if not WATCHDOG_AVAILABLE:
+            logger.info("watchdog is not installed, polling the image folder for changes")
+            return
+        if not os.path.isdir(self.images_dir):
+            return
+
+        index = self
+
+        class _Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if event.is_directory:
+                    return
+                index._mark_dirty(event.src_path)
+                dest_path = getattr(event, 'dest_path', None)
+                if dest_path:
+                    index._mark_dirty(dest_path)
+
+        try:
+            observer = Observer()
+            observer.schedule(_Handler(), self.images_dir, recursive=False)
+            observer.daemon = True
+            observer.start()
+            self._observer = observer
+            logger.info(f"Watching image folder for changes: {self.images_dir}")
+        except Exception as e:
+            logger.warning(f"Could not watch image folder, polling instead: {str(e)}")
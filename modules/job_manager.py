@@ -0,0 +1,239 @@
+# modules/job_manager.py
+import uuid
+import logging
+import datetime
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+class Job:
+    """
+    Tracks the state, progress and partial results of a single background job.
+    """
+
+    def __init__(self, job_type, total=0):
+        """
+        Initialize a job.
+
+        Args:
+            job_type (str): Kind of work, e.g. 'ocr'
+            total (int): Number of items the job will process
+        """
+        self.id = uuid.uuid4().hex
+        self.job_type = job_type
+        self.total = total
+        self.status = 'queued'
+        self.processed = 0
+        self.failed = 0
+        self.results = []  # In completion order, so clients can page with an offset
+        self.summary = None
+        self.error = None
+        self.created_at = datetime.datetime.now().isoformat()
+        self.started_at = None
+        self.finished_at = None
+        self._cancel_event = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def cancel_event(self):
+        """
+        Event that is set when cancellation has been requested.
+
+        Returns:
+            threading.Event: Cancellation event
+        """
+        return self._cancel_event
+
+    def is_cancelled(self):
+        """
+        Check whether cancellation has been requested.
+
+        Returns:
+            bool: True if the job should stop
+        """
+        return self._cancel_event.is_set()
+
+    def add_result(self, result):
+        """
+        Record the result for one processed item.
+
+        Args:
+            result (dict): Result for the item; items with 'error' count as failed
+        """
+        with self._lock:
+            self.results.append(result)
+            self.processed += 1
+            if isinstance(result, dict) and result.get('error'):
+                self.failed += 1
+
+    def to_dict(self, offset=0, include_results=True):
+        """
+        Get a JSON-serializable view of the job.
+
+        Args:
+            offset (int): Only include results after this many already seen
+            include_results (bool): Whether to include partial results at all
+
+        Returns:
+            dict: Job status, progress and (optionally) results
+        """
+        with self._lock:
+            data = {
+                'job_id': self.id,
+                'job_type': self.job_type,
+                'status': self.status,
+                'total': self.total,
+                'processed': self.processed,
+                'failed': self.failed,
+                'progress': round(self.processed / self.total, 4) if self.total else 1.0,
+                'created_at': self.created_at,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+                'error': self.error,
+                'summary': self.summary
+            }
+            if include_results:
+                offset = max(0, offset)
+                data['offset'] = offset
+                data['results'] = self.results[offset:]
+                data['next_offset'] = len(self.results)
+        return data
+
+
+class JobManager:
+    """
+    Runs long-running work (such as batch OCR) on background threads so HTTP
+    requests can return immediately and poll for progress.
+    """
+
+    FINISHED_STATUSES = ('completed', 'failed', 'cancelled')
+
+    def __init__(self, max_workers=2, history_limit=50):
+        """
+        Initialize the job manager.
+
+        Args:
+            max_workers (int): Number of jobs that may run at the same time
+            history_limit (int): Number of finished jobs to keep for polling
+        """
+        self.history_limit = history_limit
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, job_type, total, target):
+        """
+        Queue a job for background execution.
+
+        Args:
+            job_type (str): Kind of work, e.g. 'ocr'
+            total (int): Number of items the job will process
+            target (callable): Function called with the Job; it should report
+                progress via job.add_result() and check job.is_cancelled().
+                Its return value is stored as the job summary.
+
+        Returns:
+            Job: The submitted job
+        """
+        job = Job(job_type, total)
+
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+
+        self._executor.submit(self._run, job, target)
+        logger.info(f"Submitted {job_type} job {job.id} with {total} items")
+        return job
+
+    def get(self, job_id):
+        """
+        Find a job by ID.
+
+        Args:
+            job_id (str): Job ID
+
+        Returns:
+            Job: The job, or None if not found
+        """
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list_jobs(self):
+        """
+        Get summaries of all known jobs, newest first.
+
+        Returns:
+            list: List of job status dictionaries (without results)
+        """
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job.to_dict(include_results=False) for job in reversed(jobs)]
+
+    def cancel(self, job_id):
+        """
+        Request cancellation of a job. Items already being processed finish,
+        but no new items are started.
+
+        Args:
+            job_id (str): Job ID
+
+        Returns:
+            bool: True if the job exists and was not already finished
+        """
+        job = self.get(job_id)
+        if not job or job.status in self.FINISHED_STATUSES:
+            return False
+
+        job.cancel_event.set()
+        logger.info(f"Cancellation requested for job {job_id}")
+        return True
+
+    def shutdown(self, wait=False):
+        """
+        Cancel outstanding jobs and stop the worker threads.
+
+        Args:
+            wait (bool): Whether to wait for running jobs to finish
+        """
+        with self._lock:
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            job.cancel_event.set()
+        self._executor.shutdown(wait=wait)
+
+    def _run(self, job, target):
+        """
+        Execute a job and record its final status.
+
+        Args:
+            job (Job): The job to run
+            target (callable): Function that does the work
+        """
+        if job.is_cancelled():
+            job.status = 'cancelled'
+            job.finished_at = datetime.datetime.now().isoformat()
+            return
+
+        job.status = 'running'
+        job.started_at = datetime.datetime.now().isoformat()
+
+        try:
+            job.summary = target(job)
+            job.status = 'cancelled' if job.is_cancelled() else 'completed'
+        except Exception as e:
+            job.error = str(e)
+            job.status = 'failed'
+            logger.error(f"Job {job.id} failed: {str(e)}")
+        finally:
+            job.finished_at = datetime.datetime.now().isoformat()
+            logger.info(f"Job {job.id} {job.status}: {job.processed}/{job.total} items processed")
+
+    def _prune(self):
+        """
+        Drop the oldest finished jobs beyond the history limit. Caller holds the lock.
+        """
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in self.FINISHED_STATUSES]
+        for job_id in finished[:max(0, len(finished) - self.history_limit)]:
+            del self._jobs[job_id]
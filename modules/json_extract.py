@@ -0,0 +1,167 @@
+# modules/json_extract.py
+import re
+import json
+
+# Markdown fences are expected around LLM JSON and aren't worth reporting as skipped text
+FENCE_PATTERN = re.compile(r'^\s*(```(json)?)?\s*$', re.IGNORECASE)
+
+# Python literals LLMs sometimes emit instead of JSON ones
+PYTHON_LITERALS = {'True': 'true', 'False': 'false', 'None': 'null'}
+
+TRAILING_COMMA_PATTERN = re.compile(r'\s*[}\]]')
+WORD_PATTERN = re.compile(r'[A-Za-z]+')
+
+def extract_json(text, container='{'):
+    """
+    Extract the first JSON object (or array) from LLM output, tolerating
+    surrounding prose, trailing commas, Python literals and truncation.
+
+    Bracketed text that doesn't parse even after repair, such as a
+    "{placeholder}" in the prose, is skipped and the next opening bracket
+    after it is tried. Brackets nested inside the skipped text are never
+    taken for the value.
+
+    If the output was cut off before the JSON closed, the value is rebuilt
+    from the top-level members that were complete; the member that was
+    being written when the output stopped is dropped.
+
+    Args:
+        text (str): Raw LLM output
+        container (str): '{' to extract an object, '[' to extract an array
+
+    Returns:
+        tuple: (value, repairs) where repairs lists the fixes that were needed
+
+    Raises:
+        ValueError: If no usable JSON value can be recovered
+    """
+    close_char = '}' if container == '{' else ']'
+    kind = 'object' if container == '{' else 'array'
+
+    text = text or ''
+    start = text.find(container)
+    if start < 0:
+        raise ValueError(f"No JSON {kind} found in response")
+
+    # A bracketed span that isn't JSON (e.g. "{placeholder}" in prose) is skipped for the next candidate
+    error = None
+    while start >= 0:
+        repairs = []
+        if not FENCE_PATTERN.match(text[:start]):
+            repairs.append('skipped leading text')
+
+        end, top_level_commas = _find_close(text, start)
+        if end is None:
+            break
+
+        candidate = text[start:end + 1]
+        try:
+            return json.loads(candidate), repairs
+        except ValueError:
+            pass
+
+        try:
+            return json.loads(_repair_syntax(candidate)), repairs + ['fixed syntax']
+        except ValueError as e:
+            error = e
+        # Resume after the failed span: a value nested in it is not the top-level value
+        start = text.find(container, end + 1)
+
+    if start < 0:
+        raise ValueError(f"Malformed JSON {kind} in response: {str(error)}")
+
+    # Truncated: keep the complete members before the last top-level comma that parses
+    for cut in reversed(top_level_commas):
+        candidate = _repair_syntax(text[start:cut] + close_char)
+        try:
+            return json.loads(candidate), repairs + ['truncated']
+        except ValueError:
+            continue
+
+    raise ValueError(f"Truncated JSON {kind} in response with no complete members")
+
+def _find_close(text, start):
+    """
+    Find where the bracketed value starting at start closes.
+
+    Args:
+        text (str): Raw LLM output
+        start (int): Index of the opening bracket
+
+    Returns:
+        tuple: (end, top_level_commas) where end is the index of the closing
+            bracket or None if the value never closes, and top_level_commas
+            lists the indexes of commas directly inside the value (fallback
+            cut points for truncated output)
+    """
+    depth = 0
+    in_string = False
+    escaped = False
+    top_level_commas = []
+    for index in range(start, len(text)):
+        char = text[index]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in '{[':
+            depth += 1
+        elif char in '}]':
+            depth -= 1
+            if depth == 0:
+                return index, top_level_commas
+        elif char == ',' and depth == 1:
+            top_level_commas.append(index)
+
+    return None, top_level_commas
+
+def _repair_syntax(candidate):
+    """
+    Fix common syntax defects outside string literals: trailing commas
+    before a closing bracket and Python True/False/None literals.
+
+    Args:
+        candidate (str): JSON text
+
+    Returns:
+        str: Repaired JSON text
+    """
+    output = []
+    in_string = False
+    escaped = False
+    index = 0
+    while index < len(candidate):
+        char = candidate[index]
+        if in_string:
+            output.append(char)
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+            index += 1
+            continue
+
+        if char == '"':
+            in_string = True
+        elif char == ',':
+            # Drop the comma if only whitespace separates it from a closing bracket
+            if TRAILING_COMMA_PATTERN.match(candidate, index + 1):
+                index += 1
+                continue
+        elif char.isalpha():
+            word = WORD_PATTERN.match(candidate, index).group(0)
+            output.append(PYTHON_LITERALS.get(word, word))
+            index += len(word)
+            continue
+
+        output.append(char)
+        index += 1
+
+    return ''.join(output)
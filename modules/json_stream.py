@@ -0,0 +1,109 @@
+# modules/json_stream.py
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+class IncrementalJSONParser:
+    """
+    Extracts the top-level fields of a JSON object while it is still being
+    streamed. Text is fed in arbitrary chunks; each call to feed() returns
+    the fields whose values became complete in that chunk. Any text before
+    the opening brace (such as a ```json fence) is ignored.
+    """
+
+    def __init__(self):
+        """
+        Initialize the parser.
+        """
+        self._text = ''
+        self._position = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._started = False
+        self._finished = False
+
+        # Top-level field being read: its key text and where its value starts
+        self._key_start = None
+        self._key = None
+        self._value_start = None
+
+    def feed(self, chunk):
+        """
+        Add streamed text and collect the fields completed by it.
+
+        Args:
+            chunk (str): Next piece of the response text
+
+        Returns:
+            list: List of (field, value) tuples, in the order they completed
+        """
+        fields = []
+        if self._finished or not chunk:
+            return fields
+
+        self._text += chunk
+        text = self._text
+
+        while self._position < len(text):
+            char = text[self._position]
+            index = self._position
+            self._position += 1
+
+            # Skip any preamble until the object opens
+            if not self._started:
+                if char == '{':
+                    self._started = True
+                    self._depth = 1
+                continue
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._key is None and self._key_start is not None:
+                        self._key = json.loads(text[self._key_start:index + 1])
+                continue
+
+            if char == '"':
+                self._in_string = True
+                if self._depth == 1 and self._key is None and self._value_start is None:
+                    self._key_start = index
+            elif char in '{[':
+                self._depth += 1
+            elif char in '}]':
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit(text, index, fields)
+                    self._finished = True
+                    break
+            elif char == ':' and self._depth == 1 and self._key is not None and self._value_start is None:
+                self._value_start = index + 1
+            elif char == ',' and self._depth == 1:
+                self._emit(text, index, fields)
+
+        return fields
+
+    def _emit(self, text, end, fields):
+        """
+        Finish the current top-level field, if one is being read.
+
+        Args:
+            text (str): Buffered response text
+            end (int): Index of the delimiter that ended the value
+            fields (list): Completed fields to append to
+        """
+        if self._key is not None and self._value_start is not None:
+            raw_value = text[self._value_start:end].strip()
+            try:
+                fields.append((self._key, json.loads(raw_value)))
+            except ValueError:
+                logger.debug(f"Could not parse streamed value for field '{self._key}'")
+
+        self._key_start = None
+        self._key = None
+        self._value_start = None
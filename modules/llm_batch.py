@@ -0,0 +1,702 @@
+# modules/llm_batch.py
+import os
+import json
+import time
+import logging
+import datetime
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+class LLMBatchManager:
+    """
+    Runs LLM enhancement through the provider's offline batch API.
+
+    Prompts are written to a JSONL batch file (one request per line, keyed by
+    a custom_id), submitted as a batch job, polled until the provider has
+    finished, and the results are parsed and written back to the metadata in
+    one batched update. Each batch has a JSON manifest next to its JSONL file
+    mapping custom_ids to images, so a batch can be polled and ingested again
+    after a restart. The base URL is configurable so the whole cycle can be
+    run against a local stand-in server.
+
+    Batches can take up to a day, so nothing waits for them in a job worker:
+    a light poller thread checks submitted batches marked for auto-ingest
+    once per poll interval and ingests them when the provider is done.
+    """
+
+    # Default API roots per provider
+    PROVIDER_URLS = {
+        'openai': 'https://api.openai.com/v1',
+        'anthropic': 'https://api.anthropic.com/v1'
+    }
+
+    # Provider statuses after which a batch won't change anymore
+    FINISHED_STATUSES = ('completed', 'ended', 'failed', 'expired', 'cancelled', 'canceled')
+
+    # Local statuses that follow a finished provider status; provider updates don't overwrite them
+    INGEST_STATUSES = ('ingesting', 'ingested')
+
+    def __init__(self, llm_processor, metadata_manager, ocr_processor, batch_dir, base_url=None,
+                 poll_interval=60):
+        """
+        Initialize the batch manager.
+
+        Args:
+            llm_processor (LLMProcessor): Builds the prompts and parses responses
+            metadata_manager (MetadataManager): Destination for enhanced metadata
+            ocr_processor (OCRProcessor): Source of question text
+            batch_dir (str): Directory for batch files and manifests
+            base_url (str, optional): API root to use instead of the provider's
+            poll_interval (float): Seconds between status checks while waiting
+        """
+        self.llm_processor = llm_processor
+        self.metadata_manager = metadata_manager
+        self.ocr_processor = ocr_processor
+        self.batch_dir = batch_dir
+        self.base_url = (base_url or self.PROVIDER_URLS[llm_processor.api_type]).rstrip('/')
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._batch_locks = {}  # batch_id -> lock serializing manifest updates
+        self._ingesting = set()  # Batches this process is ingesting right now
+        self._poller = None
+        self._stop_event = threading.Event()
+
+        # Ensure batch directory exists
+        if not os.path.exists(batch_dir):
+            os.makedirs(batch_dir)
+
+    def run(self, filenames, job=None, wait=False, auto_ingest=True):
+        """
+        Create and submit a batch, then (optionally) wait for it and ingest the results.
+
+        Args:
+            filenames (list): Image filenames to enhance
+            job (Job, optional): Background job used to report per-question
+                results and to check for cancellation
+            wait (bool): Whether to poll until the batch finishes and ingest it.
+                This blocks the caller for as long as the provider takes (up to
+                a day), so don't use it from a job worker; rely on auto_ingest.
+            auto_ingest (bool): Whether the poller should ingest the batch once
+                the provider has finished it
+
+        Returns:
+            dict: Summary with the batch 'id', its 'status' and result counts
+        """
+        cancel_event = job.cancel_event if job else None
+        # A batch this call waits for is ingested here, not by the poller
+        manifest = self.create(filenames, job, auto_ingest=auto_ingest and not wait)
+        if not manifest['items']:
+            return self._summary(manifest)
+
+        manifest = self.submit(manifest['id'])
+        if not wait:
+            return self._summary(manifest)
+
+        while manifest['status'] not in self.FINISHED_STATUSES:
+            if cancel_event is not None and cancel_event.wait(self.poll_interval):
+                manifest = self.cancel(manifest['id'])
+                if manifest['status'] not in self.FINISHED_STATUSES:
+                    # Partial results can be ingested once the provider finishes cancelling
+                    return self._summary(manifest)
+                break
+            if cancel_event is None:
+                time.sleep(self.poll_interval)
+            manifest = self.refresh(manifest['id'])
+
+        return self.ingest(manifest['id'], job)
+
+    def create(self, filenames, job=None, auto_ingest=False):
+        """
+        OCR the questions and write their prompts to a new batch file.
+        Questions with a cached LLM response are enhanced right away instead.
+
+        Args:
+            filenames (list): Image filenames to enhance
+            job (Job, optional): Background job for per-question results
+            auto_ingest (bool): Whether the poller should ingest the batch once it finishes
+
+        Returns:
+            dict: Batch manifest
+        """
+        batch_id = datetime.datetime.now().strftime("batch_%Y%m%d_%H%M%S_%f")
+        ocr_results = self.ocr_processor.process_batch(filenames, cancel_event=job.cancel_event if job else None)
+
+        items = {}
+        lines = []
+        cached_updates = []
+        for ocr_result in ocr_results:
+            filename = ocr_result['filename']
+            if not ocr_result.get('success') or not ocr_result.get('text'):
+                self._report(job, {'filename': filename, 'success': False,
+                                   'error': ocr_result.get('error', 'No OCR text extracted')})
+                continue
+
+            existing_metadata = self.metadata_manager.get_metadata_for_image(filename)
+            request = self.llm_processor._prepare_analysis(ocr_result['text'], existing_metadata)
+            cached = self.llm_processor._cached_analysis(request)
+            if cached is not None:
+                cached_updates.append((filename, cached))
+                self._report(job, {'filename': filename, 'success': True, 'metadata': cached})
+                continue
+
+            # Providers restrict custom_id characters, so number the items instead of using filenames
+            custom_id = f"q{len(items) + 1}"
+            items[custom_id] = {
+                'filename': filename,
+                'cache_key': request['cache_key'],
+                'text_key': request['text_key']
+            }
+            lines.append(self._batch_line(custom_id, request))
+            self.llm_processor._record_trim(request['trim_stats'])
+
+        if cached_updates:
+            self.metadata_manager.update_batch_metadata(cached_updates, create_missing=True)
+
+        with open(self._input_path(batch_id), 'w') as f:
+            for line in lines:
+                f.write(json.dumps(line) + '\n')
+
+        manifest = {
+            'id': batch_id,
+            'provider': self.llm_processor.api_type,
+            'model': self.llm_processor.model,
+            'provider_batch_id': None,
+            'status': 'created',
+            'created': datetime.datetime.now().isoformat(),
+            'cached': len(cached_updates),
+            'auto_ingest': auto_ingest,
+            'items': items
+        }
+        self._save_manifest(manifest)
+        logger.info(f"Created LLM batch {batch_id} with {len(items)} requests ({len(cached_updates)} cached)")
+        return manifest
+
+    def submit(self, batch_id):
+        """
+        Submit a created batch file to the provider.
+
+        Args:
+            batch_id (str): Local batch ID
+
+        Returns:
+            dict: Updated batch manifest
+        """
+        manifest = self._load_manifest(batch_id)
+        session = self.llm_processor._get_session()
+        timeout = (self.llm_processor.connect_timeout, self.llm_processor.read_timeout)
+
+        if manifest['provider'] == 'openai':
+            # Upload the JSONL file, then create a batch job that reads it
+            with open(self._input_path(batch_id), 'rb') as f:
+                response = session.post(
+                    f"{self.base_url}/files",
+                    headers=self._headers(json_body=False),
+                    data={'purpose': 'batch'},
+                    files={'file': (os.path.basename(self._input_path(batch_id)), f, 'application/jsonl')},
+                    timeout=timeout
+                )
+            file_info = self._check(response, 'upload batch file')
+            response = session.post(
+                f"{self.base_url}/batches",
+                headers=self._headers(),
+                json={
+                    'input_file_id': file_info['id'],
+                    'endpoint': '/v1/chat/completions',
+                    'completion_window': '24h'
+                },
+                timeout=timeout
+            )
+        else:
+            with open(self._input_path(batch_id), 'r') as f:
+                requests_list = [json.loads(line) for line in f if line.strip()]
+            response = session.post(
+                f"{self.base_url}/messages/batches",
+                headers=self._headers(),
+                json={'requests': requests_list},
+                timeout=timeout
+            )
+
+        batch_info = self._check(response, 'create batch')
+        manifest['provider_batch_id'] = batch_info['id']
+        manifest['status'] = self._provider_status(batch_info)
+        manifest['submitted'] = datetime.datetime.now().isoformat()
+        self._save_manifest(manifest)
+        logger.info(f"Submitted LLM batch {batch_id} as {batch_info['id']}")
+        return manifest
+
+    def refresh(self, batch_id):
+        """
+        Fetch the provider's status for a submitted batch.
+
+        Args:
+            batch_id (str): Local batch ID
+
+        Returns:
+            dict: Updated batch manifest
+        """
+        manifest = self._load_manifest(batch_id)
+        if not manifest.get('provider_batch_id') or manifest['status'] in self.INGEST_STATUSES:
+            return manifest
+
+        path = 'batches' if manifest['provider'] == 'openai' else 'messages/batches'
+        response = self.llm_processor._get_session().get(
+            f"{self.base_url}/{path}/{manifest['provider_batch_id']}",
+            headers=self._headers(),
+            timeout=(self.llm_processor.connect_timeout, self.llm_processor.read_timeout)
+        )
+        batch_info = self._check(response, 'check batch status')
+
+        return self._update_manifest(batch_id, {
+            'status': self._provider_status(batch_info),
+            'results_location': batch_info.get('output_file_id') or batch_info.get('results_url'),
+            # OpenAI writes failed requests to a separate file; a batch where all failed only has this one
+            'errors_location': batch_info.get('error_file_id')
+        })
+
+    def cancel(self, batch_id):
+        """
+        Ask the provider to cancel a submitted batch.
+
+        Args:
+            batch_id (str): Local batch ID
+
+        Returns:
+            dict: Updated batch manifest
+        """
+        manifest = self._load_manifest(batch_id)
+        if not manifest.get('provider_batch_id') or manifest['status'] in self.FINISHED_STATUSES + self.INGEST_STATUSES:
+            return manifest
+
+        path = 'batches' if manifest['provider'] == 'openai' else 'messages/batches'
+        response = self.llm_processor._get_session().post(
+            f"{self.base_url}/{path}/{manifest['provider_batch_id']}/cancel",
+            headers=self._headers(),
+            timeout=(self.llm_processor.connect_timeout, self.llm_processor.read_timeout)
+        )
+        batch_info = self._check(response, 'cancel batch')
+        manifest = self._update_manifest(batch_id, {'status': self._provider_status(batch_info)})
+        logger.info(f"Cancelled LLM batch {batch_id}")
+        return manifest
+
+    def ingest(self, batch_id, job=None):
+        """
+        Download the results of a finished batch and write them to the metadata.
+
+        The batch is claimed by moving it to 'ingesting' before anything is
+        downloaded, so the poller and a manual ingest can't both write the
+        results. A batch left 'ingesting' by a process that stopped midway
+        can be ingested again.
+
+        Args:
+            batch_id (str): Local batch ID
+            job (Job, optional): Background job for per-question results
+
+        Returns:
+            dict: Summary with the batch 'id', 'status' and result counts
+        """
+        self.refresh(batch_id)
+        with self._batch_lock(batch_id):
+            manifest = self._load_manifest(batch_id)
+            if manifest['status'] == 'ingested':
+                return self._summary(manifest)
+            if batch_id in self._ingesting:
+                raise RuntimeError(f"Batch {batch_id} is already being ingested")
+            if manifest['status'] not in self.FINISHED_STATUSES + ('ingesting',):
+                raise RuntimeError(f"Batch {batch_id} is not finished yet (status: {manifest['status']})")
+
+            # Keep the provider status to fall back to if ingesting fails
+            if manifest['status'] != 'ingesting':
+                manifest['provider_status'] = manifest['status']
+            manifest['status'] = 'ingesting'
+            self._save_manifest(manifest)
+            self._ingesting.add(batch_id)
+
+        try:
+            return self._ingest_claimed(manifest, job)
+        except Exception:
+            with self._batch_lock(batch_id):
+                manifest = self._load_manifest(batch_id)
+                if manifest['status'] == 'ingesting':
+                    manifest['status'] = manifest['provider_status']
+                    self._save_manifest(manifest)
+            raise
+        finally:
+            self._ingesting.discard(batch_id)
+
+    def _ingest_claimed(self, manifest, job=None):
+        """
+        Download and save the results of a batch claimed by ingest().
+
+        Args:
+            manifest (dict): Batch manifest in the 'ingesting' status
+            job (Job, optional): Background job for per-question results
+
+        Returns:
+            dict: Summary with the batch 'id', 'status' and result counts
+        """
+        batch_id = manifest['id']
+        answered = {}
+        for location_key, kind in (('results_location', 'results'), ('errors_location', 'errors')):
+            if manifest.get(location_key):
+                for line in self._download_results(manifest, manifest[location_key], kind):
+                    answered[line.get('custom_id')] = line
+
+        updates = []
+        failed = 0
+        for custom_id, item in manifest['items'].items():
+            text, error = self._result_text(manifest['provider'], answered.get(custom_id))
+            metadata = self.llm_processor._parse_response(text) if error is None else {'error': error}
+            if 'error' in metadata:
+                failed += 1
+                self._report(job, {'filename': item['filename'], 'success': False, 'error': metadata['error']})
+                continue
+
+            # Incomplete analyses are saved without their 'missing_fields' flag but not cached
+            if 'missing_fields' not in metadata:
+                self.llm_processor._cache_analysis(item, text)
+            updates.append((item['filename'], metadata))
+            self._report(job, {'filename': item['filename'], 'success': True, 'metadata': metadata})
+
+        saved = 0
+        if updates:
+            saved, save_failures = self.metadata_manager.update_batch_metadata(updates, create_missing=True)
+            if save_failures:
+                logger.error(f"Failed to save enhanced metadata for {save_failures} questions")
+
+        with self._batch_lock(batch_id):
+            manifest['status'] = 'ingested'
+            manifest['ingested'] = datetime.datetime.now().isoformat()
+            manifest['results'] = {'enhanced': len(updates), 'failed': failed, 'saved': saved}
+            self._save_manifest(manifest)
+        logger.info(f"Ingested LLM batch {batch_id}: {len(updates)} enhanced, {failed} failed, {saved} saved")
+        return self._summary(manifest)
+
+    def start_poller(self):
+        """
+        Start the background thread that ingests finished auto-ingest batches.
+
+        Returns:
+            bool: True if the poller was started, False if it was already running
+        """
+        if self._poller is not None and self._poller.is_alive():
+            return False
+
+        self._stop_event.clear()
+        self._poller = threading.Thread(target=self._poll_loop, name='llm-batch-poller', daemon=True)
+        self._poller.start()
+        return True
+
+    def stop_poller(self):
+        """
+        Stop the background poller thread.
+        """
+        self._stop_event.set()
+        if self._poller is not None:
+            self._poller.join(timeout=5)
+            self._poller = None
+
+    def poll_pending(self):
+        """
+        Check every submitted auto-ingest batch once and ingest the finished ones.
+
+        Returns:
+            list: Summaries of the batches ingested by this check
+        """
+        ingested = []
+        for batch_id in self._batch_ids():
+            manifest = self._load_manifest(batch_id)
+            if not manifest.get('auto_ingest') or not manifest.get('provider_batch_id'):
+                continue
+            if manifest['status'] == 'ingested' or batch_id in self._ingesting:
+                continue
+
+            try:
+                manifest = self.refresh(batch_id)
+                # 'ingesting' here was left by a process that stopped midway
+                if manifest['status'] in self.FINISHED_STATUSES + ('ingesting',):
+                    ingested.append(self.ingest(batch_id))
+            except Exception as e:
+                logger.error(f"Failed to poll LLM batch {batch_id}: {str(e)}")
+        return ingested
+
+    def _poll_loop(self):
+        """
+        Poller thread: check pending batches once per poll interval.
+        """
+        while not self._stop_event.wait(self.poll_interval):
+            self.poll_pending()
+
+    def get(self, batch_id, refresh=False):
+        """
+        Get the summary of a batch.
+
+        Args:
+            batch_id (str): Local batch ID
+            refresh (bool): Whether to fetch the provider's current status first
+
+        Returns:
+            dict: Batch summary, or None if the batch doesn't exist
+        """
+        if not os.path.exists(self._manifest_path(batch_id)):
+            return None
+        manifest = self.refresh(batch_id) if refresh else self._load_manifest(batch_id)
+        return self._summary(manifest)
+
+    def list_batches(self):
+        """
+        List all batches, newest first.
+
+        Returns:
+            list: List of batch summaries
+        """
+        return [self._summary(self._load_manifest(batch_id)) for batch_id in reversed(self._batch_ids())]
+
+    def _batch_ids(self):
+        """
+        Get the IDs of all batches, oldest first.
+
+        Returns:
+            list: Local batch IDs
+        """
+        return sorted(name[:-len('.json')] for name in os.listdir(self.batch_dir) if name.endswith('.json'))
+
+    def _batch_line(self, custom_id, request):
+        """
+        Build one line of the batch file.
+
+        Args:
+            custom_id (str): ID of the request within the batch
+            request (dict): Prepared request from LLMProcessor._prepare_analysis()
+
+        Returns:
+            dict: Batch file line in the provider's format
+        """
+        body = self.llm_processor.request_body(request['suffix'], request['prefix'])
+        if self.llm_processor.api_type == 'openai':
+            return {'custom_id': custom_id, 'method': 'POST', 'url': '/v1/chat/completions', 'body': body}
+        return {'custom_id': custom_id, 'params': body}
+
+    def _download_results(self, manifest, location, kind='results'):
+        """
+        Download a JSONL results (or errors) file of a finished batch.
+
+        Args:
+            manifest (dict): Batch manifest
+            location (str): Provider file ID or results URL
+            kind (str): 'results' or 'errors', used to name the local copy
+
+        Returns:
+            list: Parsed result lines
+        """
+        if manifest['provider'] == 'openai':
+            url = f"{self.base_url}/files/{location}/content"
+        elif location.startswith('http'):
+            url = location
+        else:
+            url = f"{self.base_url}/{location.lstrip('/')}"
+
+        response = self.llm_processor._get_session().get(
+            url,
+            headers=self._headers(),
+            timeout=(self.llm_processor.connect_timeout, self.llm_processor.read_timeout)
+        )
+        if response.status_code != 200:
+            raise RuntimeError(f"Failed to download batch {kind}: HTTP {response.status_code}")
+
+        # Keep the results next to the input file for inspection
+        with open(os.path.join(self.batch_dir, f"{manifest['id']}.{kind}.jsonl"), 'w') as f:
+            f.write(response.text)
+
+        results = []
+        for line in response.text.splitlines():
+            if not line.strip():
+                continue
+            try:
+                results.append(json.loads(line))
+            except ValueError:
+                logger.warning(f"Skipping malformed result line in batch {manifest['id']}")
+        return results
+
+    def _result_text(self, provider, line):
+        """
+        Extract the response text from a batch result line.
+
+        Args:
+            provider (str): 'openai' or 'anthropic'
+            line (dict): Result line, or None if the item has no result
+
+        Returns:
+            tuple: (text, error) where exactly one is None
+        """
+        if line is None:
+            return None, 'No result returned for this request'
+
+        try:
+            if provider == 'openai':
+                response = line.get('response') or {}
+                if line.get('error') or response.get('status_code') != 200:
+                    error = line.get('error') or (response.get('body') or {}).get('error') or response.get('status_code')
+                    return None, f"Batch request failed: {error}"
+                return response['body']['choices'][0]['message']['content'], None
+
+            result = line.get('result') or {}
+            if result.get('type') != 'succeeded':
+                return None, f"Batch request {result.get('type', 'failed')}: {result.get('error')}"
+            return result['message']['content'][0]['text'], None
+        except (KeyError, IndexError, TypeError) as e:
+            return None, f"Unexpected batch result structure: {str(e)}"
+
+    def _provider_status(self, batch_info):
+        """
+        Get the status of a batch from the provider's batch object.
+
+        Args:
+            batch_info (dict): Batch object returned by the provider
+
+        Returns:
+            str: Provider status
+        """
+        return batch_info.get('status') or batch_info.get('processing_status') or 'unknown'
+
+    def _headers(self, json_body=True):
+        """
+        Get the request headers for the configured provider.
+
+        Args:
+            json_body (bool): Whether the request body is JSON
+
+        Returns:
+            dict: HTTP headers
+        """
+        if self.llm_processor.api_type == 'openai':
+            headers = {"Authorization": f"Bearer {self.llm_processor.api_key}"}
+        else:
+            headers = {"x-api-key": self.llm_processor.api_key, "anthropic-version": "2023-06-01"}
+        if json_body:
+            headers["Content-Type"] = "application/json"
+        return headers
+
+    def _check(self, response, action):
+        """
+        Check a batch API response and return its JSON body.
+
+        Args:
+            response: HTTP response
+            action (str): What the request was for, used in the error message
+
+        Returns:
+            dict: Parsed JSON body
+        """
+        if response.status_code not in (200, 201):
+            raise RuntimeError(f"Failed to {action}: HTTP {response.status_code} {response.text[:200]}")
+        return response.json()
+
+    def _report(self, job, result):
+        """
+        Report a per-question result to the job, if there is one.
+
+        Args:
+            job (Job): Background job, or None
+            result (dict): Per-question result
+        """
+        if job:
+            job.add_result(result)
+
+    def _summary(self, manifest):
+        """
+        Build the public summary of a batch manifest.
+
+        Args:
+            manifest (dict): Batch manifest
+
+        Returns:
+            dict: Batch summary without the per-item mapping
+        """
+        summary = {key: value for key, value in manifest.items() if key != 'items'}
+        summary['requests'] = len(manifest.get('items', {}))
+        return summary
+
+    def _batch_lock(self, batch_id):
+        """
+        Get the lock that serializes manifest updates of one batch.
+
+        Args:
+            batch_id (str): Local batch ID
+
+        Returns:
+            threading.Lock: The batch's lock
+        """
+        with self._lock:
+            return self._batch_locks.setdefault(batch_id, threading.Lock())
+
+    def _update_manifest(self, batch_id, changes):
+        """
+        Apply provider updates to the current manifest, unless the batch has
+        moved on to ingesting in the meantime.
+
+        Args:
+            batch_id (str): Local batch ID
+            changes (dict): Manifest keys to set
+
+        Returns:
+            dict: The manifest as saved (unchanged if it is ingesting or ingested)
+        """
+        with self._batch_lock(batch_id):
+            manifest = self._load_manifest(batch_id)
+            if manifest['status'] in self.INGEST_STATUSES:
+                return manifest
+            manifest.update(changes)
+            self._save_manifest(manifest)
+            return manifest
+
+    def _load_manifest(self, batch_id):
+        """
+        Read a batch manifest.
+
+        Args:
+            batch_id (str): Local batch ID
+
+        Returns:
+            dict: Batch manifest
+        """
+        with open(self._manifest_path(batch_id), 'r') as f:
+            return json.load(f)
+
+    def _save_manifest(self, manifest):
+        """
+        Write a batch manifest atomically.
+
+        Args:
+            manifest (dict): Batch manifest
+        """
+        with self._lock:
+            fd, tmp_path = tempfile.mkstemp(dir=self.batch_dir, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(manifest, f, indent=2)
+            os.replace(tmp_path, self._manifest_path(manifest['id']))
+
+    def _manifest_path(self, batch_id):
+        """
+        Get the manifest path for a batch ID.
+
+        Args:
+            batch_id (str): Local batch ID
+
+        Returns:
+            str: Path of the manifest file
+        """
+        return os.path.join(self.batch_dir, f"{batch_id}.json")
+
+    def _input_path(self, batch_id):
+        """
+        Get the batch file path for a batch ID.
+
+        Args:
+            batch_id (str): Local batch ID
+
+        Returns:
+            str: Path of the JSONL batch file
+        """
+        return os.path.join(self.batch_dir, f"{batch_id}.jsonl")
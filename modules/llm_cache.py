@@ -0,0 +1,231 @@
+# modules/llm_cache.py
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Minimum seconds between two sweeps that delete expired entries
+EXPIRY_INTERVAL = 60
+
+# A hit only rewrites an entry's access time once it is this many seconds old,
+# so most lookups stay read-only; LRU order is kept to this granularity
+ACCESS_UPDATE_INTERVAL = 3600
+
+# Share of max_entries evicted at once when the cache is full, so eviction doesn't run on every put
+EVICTION_FRACTION = 0.05
+
+class LLMResponseCache:
+    """
+    Persistent cache of LLM responses, stored in SQLite.
+
+    Responses are keyed by a hash of the model, temperature and final prompt.
+    Optionally, a second key built from the normalized OCR text lets
+    near-duplicate questions (same wording, different whitespace, case or
+    punctuation, or different existing metadata) reuse an earlier answer.
+    Entries expire after a TTL and the least recently used entries are
+    evicted once the cache is full. Lookups only write when an entry's
+    access time is more than ACCESS_UPDATE_INTERVAL old.
+    """
+
+    def __init__(self, db_file, ttl_seconds=30 * 24 * 3600, max_entries=20000, near_duplicates=True):
+        """
+        Initialize the response cache.
+
+        Args:
+            db_file (str): Path to the SQLite file holding the cache
+            ttl_seconds (float): Age after which entries expire (0 = never)
+            max_entries (int): Maximum number of cached responses
+            near_duplicates (bool): Whether to match on normalized OCR text
+                when there's no exact prompt match
+        """
+        self.db_file = db_file
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.near_duplicates = near_duplicates
+
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._near_duplicate_hits = 0
+        self._misses = 0
+        self._last_expiry = 0.0
+        self._count = 0  # Running entry count, so put() doesn't count the table
+
+        # Ensure parent directory exists
+        db_dir = os.path.dirname(db_file)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir)
+
+        self._conn = sqlite3.connect(db_file, check_same_thread=False)
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                cache_key TEXT PRIMARY KEY,
+                text_key TEXT,
+                response TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_llm_cache_text_key ON llm_cache (text_key)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_llm_cache_last_access ON llm_cache (last_access)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_llm_cache_created ON llm_cache (created)')
+        self._conn.commit()
+        self._count = self._conn.execute('SELECT COUNT(*) FROM llm_cache').fetchone()[0]
+
+    @staticmethod
+    def make_key(model, temperature, prompt):
+        """
+        Build the exact-match key for a prompt.
+
+        Args:
+            model (str): Model name
+            temperature (float): Sampling temperature
+            prompt (str): Final prompt sent to the LLM
+
+        Returns:
+            str: Cache key
+        """
+        return hashlib.sha256(f"{model}|{temperature}|{prompt}".encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def make_text_key(model, temperature, subject, ocr_text):
+        """
+        Build the near-duplicate key from normalized question text.
+
+        Args:
+            model (str): Model name
+            temperature (float): Sampling temperature
+            subject (str): Question subject, since the syllabus differs per subject
+            ocr_text (str): OCR-extracted question text
+
+        Returns:
+            str: Text key, or None if the text is empty after normalization
+        """
+        # Lowercase and keep only letters and digits so OCR spacing/punctuation noise doesn't matter
+        normalized = ' '.join(re.findall(r'[a-z0-9]+', (ocr_text or '').lower()))
+        if not normalized:
+            return None
+        source = f"{model}|{temperature}|{(subject or '').strip().lower()}|{normalized}"
+        return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+    def get(self, cache_key, text_key=None):
+        """
+        Look up a cached response.
+
+        Args:
+            cache_key (str): Exact-match key from make_key()
+            text_key (str, optional): Near-duplicate key from make_text_key()
+
+        Returns:
+            str: Cached response, or None if not cached
+        """
+        now = time.time()
+        # Expired entries are swept in put(); until then they are just not returned
+        oldest = now - self.ttl_seconds if self.ttl_seconds else 0
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT cache_key, response, last_access FROM llm_cache WHERE cache_key = ? AND created >= ?',
+                (cache_key, oldest)
+            ).fetchone()
+            near_duplicate = False
+            if row is None and text_key and self.near_duplicates:
+                row = self._conn.execute('''
+                    SELECT cache_key, response, last_access FROM llm_cache
+                    WHERE text_key = ? AND created >= ? ORDER BY last_access DESC LIMIT 1
+                ''', (text_key, oldest)).fetchone()
+                near_duplicate = row is not None
+
+            if row is None:
+                self._misses += 1
+                return None
+
+            if now - row[2] >= ACCESS_UPDATE_INTERVAL:
+                self._conn.execute('UPDATE llm_cache SET last_access = ? WHERE cache_key = ?', (now, row[0]))
+                self._conn.commit()
+
+            if near_duplicate:
+                self._near_duplicate_hits += 1
+            else:
+                self._hits += 1
+            return row[1]
+
+    def put(self, cache_key, response, text_key=None):
+        """
+        Store a response, evicting the least recently used entries if the cache is full.
+
+        Args:
+            cache_key (str): Exact-match key from make_key()
+            response (str): Raw LLM response
+            text_key (str, optional): Near-duplicate key from make_text_key()
+        """
+        now = time.time()
+        with self._lock:
+            count = self._count
+            try:
+                exists = self._conn.execute('SELECT 1 FROM llm_cache WHERE cache_key = ?', (cache_key,)).fetchone()
+                self._conn.execute('''
+                    INSERT OR REPLACE INTO llm_cache (cache_key, text_key, response, created, last_access)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (cache_key, text_key, response, now, now))
+                if exists is None:
+                    count += 1
+
+                if self.ttl_seconds and now - self._last_expiry >= EXPIRY_INTERVAL:
+                    count -= self._conn.execute('DELETE FROM llm_cache WHERE created < ?',
+                                                (now - self.ttl_seconds,)).rowcount
+                    self._last_expiry = now
+
+                if self.max_entries and count > self.max_entries:
+                    # Evict down to a little below the limit and re-count, which also corrects any drift
+                    target = self.max_entries - int(self.max_entries * EVICTION_FRACTION)
+                    self._conn.execute('''
+                        DELETE FROM llm_cache WHERE cache_key IN (
+                            SELECT cache_key FROM llm_cache ORDER BY last_access ASC LIMIT ?
+                        )
+                    ''', (count - target,))
+                    count = self._conn.execute('SELECT COUNT(*) FROM llm_cache').fetchone()[0]
+                self._conn.commit()
+                self._count = count
+            except sqlite3.Error as e:
+                self._conn.rollback()
+                logger.error(f"Failed to store LLM response in cache: {str(e)}")
+
+    def clear(self):
+        """
+        Remove all cached responses and reset the counters.
+        """
+        with self._lock:
+            self._conn.execute('DELETE FROM llm_cache')
+            self._conn.commit()
+            self._count = 0
+            self._hits = self._near_duplicate_hits = self._misses = 0
+
+    def stats(self):
+        """
+        Get cache size and hit/miss counters.
+
+        Returns:
+            dict: Cache statistics
+        """
+        with self._lock:
+            entries = self._count
+            lookups = self._hits + self._near_duplicate_hits + self._misses
+            return {
+                'entries': entries,
+                'max_entries': self.max_entries,
+                'hits': self._hits,
+                'near_duplicate_hits': self._near_duplicate_hits,
+                'misses': self._misses,
+                'hit_rate': round((self._hits + self._near_duplicate_hits) / lookups, 4) if lookups else None
+            }
+
+    def close(self):
+        """
+        Close the cache database.
+        """
+        with self._lock:
+            self._conn.close()
@@ -1,14 +1,23 @@
 # modules/llm_processor.py
 import os
 import json
+import time
 import logging
+import threading
 import requests
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 from distutils.version import StrictVersion
 
+from modules.rate_limiter import RateLimiter
+from modules.syllabus_registry import SyllabusRegistry
+from modules.json_stream import IncrementalJSONParser
+from modules.json_extract import extract_json
+
 # Conditionally import anthropic SDK if available
 try:
     import anthropic
+    import httpx
     ANTHROPIC_SDK_AVAILABLE = True
 except ImportError:
     ANTHROPIC_SDK_AVAILABLE = False
@@ -18,6 +27,36 @@ load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# HTTP status codes worth retrying: rate limits, overload and transient server errors
+RETRYABLE_STATUS_CODES = (408, 429, 500, 502, 503, 504, 529)
+
+class RetryableLLMError(Exception):
+    """
+    Raised for LLM API failures that may succeed if retried later
+    (rate limits, overload, timeouts and connection errors).
+    """
+    
+    def __init__(self, message, status_code=None, retry_after=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+def _parse_retry_after(headers):
+    """
+    Read the retry-after header from an HTTP response.
+    
+    Args:
+        headers (Mapping): Response headers
+        
+    Returns:
+        float: Seconds to wait, or None if the header is missing or not a number
+    """
+    value = headers.get('retry-after') if headers else None
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
 class LLMProcessor:
     """
     Handles integration with Large Language Models for metadata enhancement.
@@ -237,14 +276,159 @@ class LLMProcessor:
   ]
 }
     
-    def __init__(self, api_type='openai'):
+    # Default models per API type
+    DEFAULT_MODELS = {
+        'openai': 'gpt-4',  # Or gpt-3.5-turbo for a cheaper, faster option
+        'anthropic': 'claude-3-haiku-20240307'
+    }
+    
+    # Shortest prompt prefix (system prompt included) Anthropic will cache, per model
+    # family; a cache_control marker on a shorter prefix is silently ignored
+    MIN_CACHEABLE_TOKENS = {
+        'claude-3-haiku': 2048,
+        'claude-3-5-haiku': 2048,
+        'claude-haiku': 2048
+    }
+    DEFAULT_MIN_CACHEABLE_TOKENS = 1024
+    
+    # Static parts of the analysis prompt. They come before the question so the
+    # provider can cache the shared prefix; only the question and metadata vary.
+    PROMPT_HEADER = ("\nYou are an expert in educational assessment. Analyze the exam question given at the "
+                     "end of this prompt and generate enhanced metadata for it.")
+    # Appended before the questions of a batched request
+    BATCH_INSTRUCTIONS = ("The {count} questions below are each marked with a QUESTION ID. Analyze every "
+                          "question separately and return a JSON array with one object per question, in the "
+                          "format above, each with an added \"id\" field holding the question's ID. Do not "
+                          "include any other text in your response - only the JSON array.\n")
+    
+    # Fields expected in an analysis: (type, required). Choices only apply to multiple choice.
+    METADATA_SCHEMA = {
+        'chapter': (str, True),
+        'topic': (str, True),
+        'question_type': (str, True),
+        'difficulty_level': (str, True),
+        'keywords': (list, True),
+        'cognitive_skills': (list, True),
+        'cleaned_text': (str, True),
+        'answer': (str, True),
+        'choices': (list, False),
+        'answer_confidence': (float, True)
+    }
+    
+    # Appended to a question when reprompting for fields missing from its analysis
+    MISSING_FIELDS_INSTRUCTIONS = ("\nYour previous analysis of this question was missing these fields: {fields}. "
+                                   "Return a JSON object with only these fields, in the format above. Do not "
+                                   "include any other text in your response - only the JSON.\n")
+    
+    SYSTEM_PROMPT = "You are an expert in educational assessment and metadata generation."
+    
+    # Starting estimate of output tokens for one question's analysis
+    BATCH_ITEM_TOKENS = 400
+    
+    PROMPT_INSTRUCTIONS = """Return your analysis in the following JSON format:
+Please generate the following additional metadata:
+1. Question type (multiple choice, short answer, fill in the blanks, open ended, calculation, essay, etc.)
+2. Difficulty level (easy, medium, hard, very hard)
+3. Keywords or key concepts (comma-separated)
+4. Cognitive skills required (recall, understanding, application, analysis, evaluation, creation etc)
+5. Detailed topic classification with subtopics
+6. A cleaned and properly formatted version of the question text and answer choices (for multiple choice) with your answer and your confidence in the answer
+
+Return your analysis in the following JSON format:
+```json
+{
+  "chapter": "chapter matched up from syllabus json",
+  "topic": "topic matched up from syllabus json",
+  "question_type": "string (e.g., 'multiple_choice', 'true_false', 'open_ended', 'fill_in_the_blank', 'other')",
+  "difficulty_level": "string (e.g., 'easy', 'medium', 'hard')",
+  "keywords": ["string (e.g., 'keyword1')", "string (e.g., 'keyword2')", "string (e.g., 'keyword3')"],
+  "cognitive_skills": ["string (e.g., 'recall')", "string (e.g., 'understanding')", "string (e.g., 'application')"],
+  "cleaned_text": "string (The rephrased and formatted question text)",
+  "answer": "string (For multiple choice, the letter of the correct answer.  For other types, the full answer text.)",
+  "choices": [
+    {
+      "letter": "string (e.g., 'A')",
+      "text": "string (Text of choice A)"
+    },
+    {
+      "letter": "string (e.g., 'B')",
+      "text": "string (Text of choice B)"
+    },
+    {
+      "letter": "string (e.g., 'C')",
+      "text": "string (Text of choice C)"
+    }
+  ],
+  "answer_confidence": "number (between 0 and 1, e.g., 0.95)"
+}
+```
+
+Do not include any other text in your response - only the JSON.
+"""
+    
+    def __init__(self, api_type='openai', pool_size=10, connect_timeout=10, read_timeout=60,
+                 model=None, temperature=0.3, max_tokens=1000, rate_limiter=None, response_cache=None,
+                 syllabus_registry=None, syllabus_top_k=0, prompt_caching=True,
+                 batch_max_items=1, batch_max_tokens=4000):
         """
         Initialize LLM processor with the specified API type.
         
         Args:
             api_type (str): Type of LLM API to use ('openai' or 'anthropic')
+            pool_size (int): Maximum keep-alive connections per provider
+            connect_timeout (float): Seconds to wait when opening a connection
+            read_timeout (float): Seconds to wait for the LLM to respond
+            model (str, optional): Model name; defaults to DEFAULT_MODELS for the API type
+            temperature (float): Sampling temperature (lower is more consistent)
+            max_tokens (int): Maximum tokens in the LLM response
+            rate_limiter (RateLimiter, optional): Shared limiter for request and
+                token budgets and retries. A default one is created if omitted.
+            response_cache (LLMResponseCache, optional): Cache for LLM responses.
+                If None, responses are not cached.
+            syllabus_registry (SyllabusRegistry, optional): Subject syllabi used in
+                prompts. Defaults to the built-in syllabi.
+            syllabus_top_k (int): If set, only the syllabus chapters most similar
+                to the question text (at most this many) are put in the prompt
+            prompt_caching (bool): Whether to mark the static prompt prefix for
+                provider-side prompt caching (Anthropic)
+            batch_max_items (int): Maximum questions per batched request (1 disables batching)
+            batch_max_tokens (int): Output token budget of a batched request
         """
         self.api_type = api_type.lower()
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.model = model or self.DEFAULT_MODELS.get(self.api_type)
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.response_cache = response_cache
+        self.syllabus_registry = syllabus_registry or self.default_syllabus_registry()
+        self.syllabus_top_k = syllabus_top_k
+        
+        # Syllabus trimming statistics: per thread for the last prompt, plus running totals
+        self._local = threading.local()
+        self._trim_lock = threading.Lock()
+        self._trim_totals = {'prompts': 0, 'trimmed_prompts': 0, 'tokens_saved': 0}
+        
+        # Token usage reported by the provider, including prompt cache reads and writes
+        self.prompt_caching = prompt_caching
+        self._usage_lock = threading.Lock()
+        self._usage_totals = {'calls': 0, 'input_tokens': 0, 'output_tokens': 0,
+                              'cache_read_tokens': 0, 'cache_write_tokens': 0,
+                              'cache_marked_requests': 0, 'cache_skipped_requests': 0}
+        # Prefix lengths already warned about as too short to cache
+        self._short_prefix_warnings = set()
+        
+        # Multi-question batching; the per-question output estimate adapts to observed usage
+        self.batch_max_items = batch_max_items
+        self.batch_max_tokens = batch_max_tokens
+        self._batch_item_tokens = float(self.BATCH_ITEM_TOKENS)
+        
+        # Long-lived HTTP clients, created on first use and shared across threads
+        self._session = None
+        self._anthropic_client = None
+        self._client_lock = threading.Lock()
         
         # Set up API credentials based on the API type
         if self.api_type == 'openai':
@@ -258,13 +442,85 @@ class LLMProcessor:
         else:
             raise ValueError(f"Unsupported API type: {api_type}")
     
-    def analyze_question(self, ocr_text, existing_metadata=None):
+    @classmethod
+    def default_syllabus_registry(cls):
+        """
+        Build a syllabus registry holding the built-in syllabi.
+        
+        Returns:
+            SyllabusRegistry: Registry with the built-in subjects
+        """
+        registry = SyllabusRegistry()
+        registry.register('physics', 'Physics', cls.PHYSICS_SYLLABUS)
+        registry.register('chemistry', 'Chemistry', cls.CHEMISTRY_SYLLABUS)
+        registry.register('mathematics', 'Mathematics', cls.MATHEMATICS_SYLLABUS, aliases=['math', 'maths'])
+        registry.register('economics', 'Economics', cls.ECONOMICS_SYLLABUS)
+        registry.register('general paper', 'General Paper', cls.GP_SYLLABUS, aliases=['gp'])
+        return registry
+    
+    def close(self):
+        """
+        Close the pooled HTTP connections and the response cache.
+        """
+        with self._client_lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+            if self._anthropic_client is not None:
+                self._anthropic_client.close()
+                self._anthropic_client = None
+        
+        if self.response_cache:
+            self.response_cache.close()
+    
+    def _get_session(self):
+        """
+        Get the shared requests session, creating it on first use.
+        
+        Returns:
+            requests.Session: Session with a keep-alive connection pool
+        """
+        with self._client_lock:
+            if self._session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=2, pool_maxsize=self.pool_size)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self._session = session
+            return self._session
+    
+    def _get_anthropic_client(self):
+        """
+        Get the shared Anthropic SDK client, creating it on first use.
+        
+        Returns:
+            anthropic.Anthropic: SDK client with a keep-alive connection pool
+        """
+        with self._client_lock:
+            if self._anthropic_client is None:
+                http_client = httpx.Client(
+                    limits=httpx.Limits(
+                        max_connections=self.pool_size,
+                        max_keepalive_connections=self.pool_size
+                    )
+                )
+                self._anthropic_client = anthropic.Anthropic(
+                    api_key=self.api_key,
+                    timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+                    # Retries are handled by _call_llm so they respect the shared rate limiter
+                    max_retries=0,
+                    http_client=http_client
+                )
+            return self._anthropic_client
+    
+    def analyze_question(self, ocr_text, existing_metadata=None, use_cache=True):
         """
         Send OCR-extracted text to LLM for analysis and metadata enhancement.
         
         Args:
             ocr_text (str): OCR-extracted text from the question image
             existing_metadata (dict, optional): Existing metadata for the question
+            use_cache (bool): Whether a cached response may be returned
             
         Returns:
             dict: Enhanced metadata from LLM analysis
@@ -272,38 +528,328 @@ class LLMProcessor:
         if not ocr_text:
             return {'error': 'No OCR text provided for analysis'}
         
-        # Prepare existing metadata for the prompt
-        metadata_str = self._format_metadata(existing_metadata) if existing_metadata else "No existing metadata."
+        request = self._prepare_analysis(ocr_text, existing_metadata)
         
-        # Create the prompt
-        prompt = self._create_prompt(ocr_text, metadata_str, existing_metadata)
+        # Reuse an earlier answer for the same prompt (or the same question text)
+        if use_cache:
+            cached = self._cached_analysis(request)
+            if cached is not None:
+                return cached
         
+        return self._analyze_prepared(request)
+    
+    def stream_analysis(self, ocr_text, existing_metadata=None, custom_prompt=None, use_cache=True):
+        """
+        Analyze a question while streaming the LLM response. Top-level fields
+        are reported as soon as their values are complete; the final metadata
+        is parsed from the whole response exactly like analyze_question().
+        
+        Args:
+            ocr_text (str): OCR-extracted text from the question image
+            existing_metadata (dict, optional): Existing metadata for the question
+            custom_prompt (str, optional): Prompt to send instead of the generated one
+            use_cache (bool): Whether a cached response may be returned
+            
+        Yields:
+            tuple: (event, data) pairs: ('field', {'field', 'value'}) for each
+                completed field, then ('done', {'metadata'}) or ('error', {'error', ...})
+        """
+        if not ocr_text:
+            yield 'error', {'error': 'No OCR text provided for analysis'}
+            return
+        
+        request = None
+        if custom_prompt:
+            prompt, prefix = custom_prompt, ''
+        else:
+            request = self._prepare_analysis(ocr_text, existing_metadata)
+            prompt, prefix = request['suffix'], request['prefix']
+            cached = self._cached_analysis(request) if use_cache else None
+            if cached is not None:
+                for field, value in cached.items():
+                    yield 'field', {'field': field, 'value': value}
+                yield 'done', {'metadata': cached, 'cached': True}
+                return
+            self._record_trim(request['trim_stats'])
+        
+        parser = IncrementalJSONParser()
+        chunks = []
+        try:
+            for text in self._stream_llm(prompt, prefix):
+                chunks.append(text)
+                for field, value in parser.feed(text):
+                    if field == 'choices':
+                        value = self._format_choices({'choices': value})['choices']
+                    yield 'field', {'field': field, 'value': value}
+        except Exception as e:
+            yield 'error', self._analysis_error(e)
+            return
+        
+        response = ''.join(chunks)
+        enhanced_metadata = self._parse_response(response)
+        if 'error' in enhanced_metadata:
+            yield 'error', enhanced_metadata
+            return
+        
+        if request and 'missing_fields' in enhanced_metadata:
+            missing = enhanced_metadata['missing_fields']
+            enhanced_metadata = self._complete_missing_fields(request, enhanced_metadata)
+            for field in missing:
+                if field in enhanced_metadata:
+                    yield 'field', {'field': field, 'value': enhanced_metadata[field]}
+            response = json.dumps(enhanced_metadata)
+        
+        if request and 'missing_fields' not in enhanced_metadata:
+            self._cache_analysis(request, response)
+        yield 'done', {'metadata': enhanced_metadata, 'cached': False}
+    
+    def analyze_batch(self, items, use_cache=True):
+        """
+        Analyze several questions, packing questions that share a prompt prefix
+        (same subject and syllabus) into one LLM request. Items the batched
+        response doesn't answer properly are retried on their own.
+        
+        Args:
+            items (list): List of dictionaries with 'id', 'ocr_text' and
+                optionally 'existing_metadata'
+            use_cache (bool): Whether cached responses may be returned
+            
+        Returns:
+            dict: Enhanced metadata (or an 'error' dictionary) keyed by item id
+        """
+        results = {}
+        groups = {}
+        for item in items:
+            item_id = item['id']
+            if not item.get('ocr_text'):
+                results[item_id] = {'error': 'No OCR text provided for analysis'}
+                continue
+            
+            request = self._prepare_analysis(item['ocr_text'], item.get('existing_metadata'))
+            if use_cache:
+                cached = self._cached_analysis(request)
+                if cached is not None:
+                    results[item_id] = cached
+                    continue
+            
+            request['id'] = item_id
+            groups.setdefault(request['prefix'], []).append(request)
+        
+        for prefix, requests_for_prefix in groups.items():
+            position = 0
+            while position < len(requests_for_prefix):
+                chunk = requests_for_prefix[position:position + self.batch_capacity()]
+                position += len(chunk)
+                
+                if len(chunk) == 1:
+                    results[chunk[0]['id']] = self._analyze_prepared(chunk[0])
+                    continue
+                
+                answered = self._analyze_chunk(prefix, chunk)
+                for request in chunk:
+                    metadata = answered.get(request['id'])
+                    if metadata is None or 'error' in metadata:
+                        # Retry items the batch didn't answer, one at a time
+                        logger.info(f"Retrying question {request['id']} outside its batch")
+                        metadata = self._analyze_prepared(request)
+                    results[request['id']] = metadata
+        
+        return results
+    
+    def batch_capacity(self):
+        """
+        Get the number of questions to put in one batched request, based on
+        the output token budget and the observed output size per question.
+        
+        Returns:
+            int: Questions per request (1 if batching is disabled)
+        """
+        if self.batch_max_items <= 1:
+            return 1
+        with self._usage_lock:
+            item_tokens = self._batch_item_tokens
+        # Leave a fifth of the budget spare so a long answer doesn't truncate the array
+        return max(1, min(self.batch_max_items, int(self.batch_max_tokens * 0.8 // item_tokens)))
+    
+    def _analyze_prepared(self, request):
+        """
+        Analyze one question with its own LLM request.
+        
+        Args:
+            request (dict): Prepared request from _prepare_analysis()
+            
+        Returns:
+            dict: Enhanced metadata from LLM analysis
+        """
         try:
             # Call the appropriate LLM API
-            if self.api_type == 'openai':
-                response = self._call_openai(prompt)
-            elif self.api_type == 'anthropic':
-                response = self._call_anthropic(prompt)
+            self._record_trim(request['trim_stats'])
+            response = self._call_llm(request['suffix'], prefix=request['prefix'])
             
             # Parse the LLM response
             enhanced_metadata = self._parse_response(response)
+            if 'error' in enhanced_metadata:
+                return enhanced_metadata
+            
+            # Ask only for the fields that are missing rather than redoing the question
+            if 'missing_fields' in enhanced_metadata:
+                enhanced_metadata = self._complete_missing_fields(request, enhanced_metadata)
+                response = json.dumps(enhanced_metadata)
+            
+            # Only cache complete analyses
+            if 'missing_fields' not in enhanced_metadata:
+                self._cache_analysis(request, response)
             return enhanced_metadata
             
         except Exception as e:
-            error_msg = f"LLM analysis failed: {str(e)}"
-            logger.error(error_msg)
+            return self._analysis_error(e)
+    
+    def _analyze_chunk(self, prefix, chunk):
+        """
+        Analyze several questions in a single LLM request.
+        
+        Args:
+            prefix (str): Prompt prefix shared by all questions in the chunk
+            chunk (list): Prepared requests from _prepare_analysis() with an 'id'
+            
+        Returns:
+            dict: Parsed metadata (or an 'error' dictionary) keyed by item id
+        """
+        # Number the questions locally; ids like filenames are easy for the LLM to mangle
+        local_ids = [str(index + 1) for index in range(len(chunk))]
+        parts = [self.BATCH_INSTRUCTIONS.format(count=len(chunk))]
+        for local_id, request in zip(local_ids, chunk):
+            parts.append(f"QUESTION ID: {local_id}\n{request['suffix']}")
+            self._record_trim(request['trim_stats'])
+        
+        try:
+            response = self._call_llm("\n".join(parts), prefix=prefix, max_tokens=self.batch_max_tokens)
+        except Exception as e:
+            logger.error(f"Batched LLM analysis failed: {str(e)}")
+            return {}
+        
+        parsed = self._parse_response(response, item_ids=local_ids)
+        if 'error' in parsed:
+            self._update_batch_item_tokens(len(chunk), truncated=True)
+            return {}
+        
+        answered = {}
+        items = parsed['items']
+        for local_id, request in zip(local_ids, chunk):
+            metadata = items.get(local_id)
+            if metadata is not None and 'missing_fields' in metadata:
+                metadata = self._complete_missing_fields(request, metadata)
+                if 'missing_fields' not in metadata:
+                    self._cache_analysis(request, json.dumps(metadata))
+            elif metadata is not None:
+                self._cache_analysis(request, json.dumps(parsed['raw_items'][local_id]))
+            answered[request['id']] = metadata
+        
+        self._update_batch_item_tokens(len(chunk), truncated=len(parsed['raw_items']) < len(chunk))
+        return answered
+    
+    def _update_batch_item_tokens(self, item_count, truncated=False):
+        """
+        Update the estimate of output tokens per question after a batched request.
+        
+        Args:
+            item_count (int): Number of questions in the request
+            truncated (bool): Whether the response missed questions, suggesting
+                it ran out of output tokens
+        """
+        usage = getattr(self._local, 'usage', None)
+        with self._usage_lock:
+            if truncated:
+                self._batch_item_tokens *= 1.5
+            elif usage and usage.get('output_tokens'):
+                observed = usage['output_tokens'] / item_count
+                self._batch_item_tokens = 0.7 * self._batch_item_tokens + 0.3 * observed
+    
+    def _prepare_analysis(self, ocr_text, existing_metadata=None):
+        """
+        Build the prompt and cache keys for analyzing one question.
+        
+        Args:
+            ocr_text (str): OCR-extracted text from the question image
+            existing_metadata (dict, optional): Existing metadata for the question
             
-            # Add more detailed information based on exception type
-            if 'anthropic-version' in str(e).lower():
-                error_msg = "API version error: The Anthropic API version header might be incorrect. Please update your API version or check your credentials."
-            elif 'api key' in str(e).lower() or 'apikey' in str(e).lower() or 'authentication' in str(e).lower():
-                error_msg = "Authentication error: Please check your Anthropic API key is correctly set in the environment variables."
-            elif 'model' in str(e).lower():
-                error_msg = "Model error: The requested AI model may be invalid or unavailable. Please check your model configuration."
-            elif 'timeout' in str(e).lower() or 'connection' in str(e).lower():
-                error_msg = "Connection error: Unable to connect to the LLM service. Please check your internet connection and try again."
+        Returns:
+            dict: 'prefix' and 'suffix' of the prompt, 'trim_stats' for the
+                syllabus, plus 'cache_key' and 'text_key' (None if the response
+                cache is disabled)
+        """
+        # Prepare existing metadata for the prompt
+        metadata_str = self._format_metadata(existing_metadata) if existing_metadata else "No existing metadata."
+        
+        # Create the prompt: a stable, cacheable prefix followed by the question
+        prefix, suffix, trim_stats = self._build_prompt(ocr_text, metadata_str, existing_metadata)
+        request = {'prefix': prefix, 'suffix': suffix, 'trim_stats': trim_stats, 'cache_key': None, 'text_key': None}
+        
+        # Trimming is only recorded once the prompt is sent; until then this thread has no stats
+        self._local.prompt_stats = None
+        
+        if self.response_cache:
+            subject = existing_metadata.get('subject') if existing_metadata else None
+            request['cache_key'] = self.response_cache.make_key(self.model, self.temperature, prefix + suffix)
+            request['text_key'] = self.response_cache.make_text_key(self.model, self.temperature, subject, ocr_text)
+        return request
+    
+    def _cached_analysis(self, request):
+        """
+        Look up a cached analysis for a prepared request.
+        
+        Args:
+            request (dict): Prepared request from _prepare_analysis()
             
-            return {'error': error_msg, 'detailed_error': str(e)}
+        Returns:
+            dict: Enhanced metadata, or None if nothing usable is cached
+        """
+        if not self.response_cache:
+            return None
+        
+        cached_response = self.response_cache.get(request['cache_key'], request['text_key'])
+        if cached_response is not None:
+            enhanced_metadata = self._parse_response(cached_response)
+            if 'error' not in enhanced_metadata and 'missing_fields' not in enhanced_metadata:
+                logger.info("Using cached LLM response")
+                return enhanced_metadata
+        return None
+    
+    def _cache_analysis(self, request, response):
+        """
+        Store a successful response for a prepared request.
+        
+        Args:
+            request (dict): Prepared request from _prepare_analysis()
+            response (str): Raw LLM response for that single question
+        """
+        if self.response_cache:
+            self.response_cache.put(request['cache_key'], response, request['text_key'])
+    
+    def _analysis_error(self, e):
+        """
+        Turn an exception raised during analysis into an error result.
+        
+        Args:
+            e (Exception): The exception
+            
+        Returns:
+            dict: Dictionary with 'error' and 'detailed_error'
+        """
+        error_msg = f"LLM analysis failed: {str(e)}"
+        logger.error(error_msg)
+        
+        # Add more detailed information based on exception type
+        if 'anthropic-version' in str(e).lower():
+            error_msg = "API version error: The Anthropic API version header might be incorrect. Please update your API version or check your credentials."
+        elif 'api key' in str(e).lower() or 'apikey' in str(e).lower() or 'authentication' in str(e).lower():
+            error_msg = "Authentication error: Please check your Anthropic API key is correctly set in the environment variables."
+        elif 'model' in str(e).lower():
+            error_msg = "Model error: The requested AI model may be invalid or unavailable. Please check your model configuration."
+        elif 'timeout' in str(e).lower() or 'connection' in str(e).lower():
+            error_msg = "Connection error: Unable to connect to the LLM service. Please check your internet connection and try again."
+        
+        return {'error': error_msg, 'detailed_error': str(e)}
     
     def _format_metadata(self, metadata):
         """
@@ -334,231 +880,513 @@ class LLMProcessor:
         Returns:
             str: Complete prompt for the LLM
         """
-        # Determine subject based on metadata
-        is_physics = False
-        is_chemistry = False
-        is_math = False
-        is_economics = False
-        is_gp = False
+        prefix, suffix = self._create_prompt_parts(ocr_text, metadata_str, existing_metadata)
+        return prefix + suffix
+    
+    def _create_prompt_parts(self, ocr_text, metadata_str, existing_metadata=None):
+        """
+        Create the prompt for the LLM as a prefix shared by every question of
+        the same subject and a suffix holding the question itself.
         
-        # Debug log the incoming metadata
-        logger.info(f"Creating prompt with metadata: {existing_metadata}")
+        Args:
+            ocr_text (str): OCR-extracted text
+            metadata_str (str): Formatted existing metadata
+            existing_metadata (dict, optional): Raw metadata dictionary
+            
+        Returns:
+            tuple: (prefix, suffix) strings; the complete prompt is prefix + suffix
+        """
+        prefix, suffix, _ = self._build_prompt(ocr_text, metadata_str, existing_metadata)
+        return prefix, suffix
+    
+    def _build_prompt(self, ocr_text, metadata_str, existing_metadata=None):
+        """
+        Build the prompt parts together with the syllabus trimming statistics.
+        Nothing is recorded here, so previews and cache hits don't count as
+        prompts sent; call _record_trim() when the prompt goes to the provider.
         
-        # Check if metadata contains subject information
-        subject_found = False
+        Args:
+            ocr_text (str): OCR-extracted text
+            metadata_str (str): Formatted existing metadata
+            existing_metadata (dict, optional): Raw metadata dictionary
+            
+        Returns:
+            tuple: (prefix, suffix, trim_stats); trim_stats is None if the
+                syllabus wasn't trimmed
+        """
+        # A trimmed syllabus depends on the question, so it goes in the suffix
+        # and the prefix stays identical for every question of the subject
+        subject = self._detect_subject(metadata_str, existing_metadata)
         
+        # Subject instructions are built once per syllabus by the registry
+        syllabus = self.syllabus_registry.resolve(subject)
+        trim_stats = None
+        if syllabus:
+            subject_instruction = syllabus['instruction']
+            if self.syllabus_top_k:
+                subject_instruction, trim_stats = self.syllabus_registry.select_chapters(
+                    syllabus, ocr_text, self.syllabus_top_k)
+            logger.debug(f"Using {syllabus['name']} syllabus ({len(subject_instruction)} chars)")
+        else:
+            subject_instruction = ""
+            if subject:
+                logger.debug(f"Subject '{subject}' not recognized as any of the configured subjects")
+        
+        # Instructions and the full syllabus first so the prefix is identical across questions
+        prefix = f"{self.PROMPT_HEADER}\n\n{self.PROMPT_INSTRUCTIONS}\n"
+        suffix = f"QUESTION TEXT:\n{ocr_text}\n\nEXISTING METADATA:\n{metadata_str}\n"
+        if subject_instruction and trim_stats:
+            suffix = f"{subject_instruction}\n\n{suffix}"
+        elif subject_instruction:
+            prefix += f"{subject_instruction}\n\n"
+        return prefix, suffix, trim_stats
+    
+    def _record_trim(self, trim_stats):
+        """
+        Record the token savings of syllabus trimming for a prompt being sent.
+        
+        Args:
+            trim_stats (dict): Statistics from SyllabusRegistry.select_chapters(),
+                or None if the syllabus wasn't trimmed
+        """
+        if trim_stats:
+            # Estimate tokens the same way the rate limiter budget does
+            full_tokens = trim_stats['full_chars'] // 4 + 1
+            trimmed_tokens = trim_stats['trimmed_chars'] // 4 + 1
+            trim_stats = dict(trim_stats, full_tokens=full_tokens, trimmed_tokens=trimmed_tokens,
+                              tokens_saved=full_tokens - trimmed_tokens)
+            logger.info(f"Trimmed {trim_stats['subject']} syllabus to {len(trim_stats['chapters_kept'])}/"
+                        f"{trim_stats['chapters_total']} chapters, saving ~{trim_stats['tokens_saved']} tokens")
+        
+        self._local.prompt_stats = trim_stats
+        with self._trim_lock:
+            self._trim_totals['prompts'] += 1
+            if trim_stats:
+                self._trim_totals['trimmed_prompts'] += 1
+                self._trim_totals['tokens_saved'] += trim_stats['tokens_saved']
+    
+    def last_prompt_stats(self):
+        """
+        Get the syllabus trimming statistics of the last prompt this thread sent.
+        
+        Returns:
+            dict: Trimming statistics, or None if the syllabus wasn't trimmed
+        """
+        return getattr(self._local, 'prompt_stats', None)
+    
+    def prompt_stats(self):
+        """
+        Get running totals of syllabus trimming across all prompts sent.
+        
+        Returns:
+            dict: Prompt counts and estimated tokens saved
+        """
+        with self._trim_lock:
+            return dict(self._trim_totals, syllabus_top_k=self.syllabus_top_k)
+    
+    def usage_stats(self):
+        """
+        Get running totals of the token usage reported by the provider.
+        
+        Returns:
+            dict: Call count, input/output tokens, prompt cache reads/writes
+                and how many requests were (or were too short to be) marked
+                for prompt caching
+        """
+        with self._usage_lock:
+            stats = dict(self._usage_totals, prompt_caching=self.prompt_caching)
+        prompt_tokens = stats['input_tokens'] + stats['cache_read_tokens'] + stats['cache_write_tokens']
+        stats['cache_read_ratio'] = round(stats['cache_read_tokens'] / prompt_tokens, 4) if prompt_tokens else None
+        return stats
+    
+    def _record_usage(self, usage, estimated_tokens):
+        """
+        Add a call's token usage to the totals and correct the rate limiter's
+        token budget with it.
+        
+        Args:
+            usage (dict): Normalized usage from the provider, or None if not reported
+            estimated_tokens (int): Tokens reserved from the rate limiter for the call
+        """
+        self._local.usage = usage
+        if not usage:
+            return
+        
+        with self._usage_lock:
+            self._usage_totals['calls'] += 1
+            for key in ('input_tokens', 'output_tokens', 'cache_read_tokens', 'cache_write_tokens'):
+                self._usage_totals[key] += usage.get(key, 0)
+        
+        if usage.get('cache_read_tokens'):
+            logger.debug(f"Prompt cache hit: {usage['cache_read_tokens']} input tokens read from cache")
+        
+        actual_tokens = sum(usage.get(key, 0) for key in
+                            ('input_tokens', 'output_tokens', 'cache_read_tokens', 'cache_write_tokens'))
+        self.rate_limiter.record_usage(estimated_tokens, actual_tokens)
+    
+    def _detect_subject(self, metadata_str, existing_metadata=None):
+        """
+        Find the question subject in the existing metadata.
+        
+        Args:
+            metadata_str (str): Formatted existing metadata
+            existing_metadata (dict, optional): Raw metadata dictionary
+            
+        Returns:
+            str: Lowercased subject, or None if no subject is set
+        """
         # First try to get subject from existing_metadata dict if it exists
-        if existing_metadata and 'subject' in existing_metadata:
-            subject = existing_metadata['subject'].lower()
-            subject_found = True
-            logger.info(f"Found subject in existing_metadata: {subject}")
+        if existing_metadata and existing_metadata.get('subject'):
+            return existing_metadata['subject'].strip().lower()
         
         # If not found in existing_metadata, try to extract from metadata_str
-        elif metadata_str and "Subject:" in metadata_str:
-            # Extract subject from metadata_str
-            lines = metadata_str.split("\n")
-            for line in lines:
+        if metadata_str and "Subject:" in metadata_str:
+            for line in metadata_str.split("\n"):
                 if line.startswith("Subject:"):
-                    subject = line.replace("Subject:", "").strip().lower()
-                    subject_found = True
-                    logger.info(f"Found subject in metadata_str: {subject}")
+                    return line.replace("Subject:", "").strip().lower()
+        
+        return None
+    
+    def _call_llm(self, prompt, prefix='', max_tokens=None):
+        """
+        Call the configured LLM API within the rate limits, retrying throttled
+        and transient failures with backoff.
+        
+        Args:
+            prompt (str): Prompt for the LLM (the per-question part if a prefix is given)
+            prefix (str, optional): Static prompt prefix that the provider may cache
+            max_tokens (int, optional): Output token limit; defaults to self.max_tokens
+            
+        Returns:
+            str: LLM response
+        """
+        call = self._call_openai if self.api_type == 'openai' else self._call_anthropic
+        estimated_tokens = self._estimate_tokens(prefix + prompt) + (max_tokens or self.max_tokens)
+        
+        text, usage = self._with_retries(lambda: call(prompt, prefix, max_tokens), estimated_tokens)
+        self._record_usage(usage, estimated_tokens)
+        return text
+    
+    def _stream_llm(self, prompt, prefix=''):
+        """
+        Call the configured LLM API in streaming mode, within the rate limits.
+        Opening the stream is retried like _call_llm; once text has started
+        arriving, failures are raised to the caller.
+        
+        Args:
+            prompt (str): Prompt for the LLM (the per-question part if a prefix is given)
+            prefix (str, optional): Static prompt prefix that the provider may cache
+            
+        Yields:
+            str: Pieces of the LLM response as they arrive
+        """
+        estimated_tokens = self._estimate_tokens(prefix + prompt) + self.max_tokens
+        response = self._with_retries(lambda: self._open_stream(prompt, prefix), estimated_tokens)
+        
+        usage = {}
+        try:
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith('data:'):
+                    continue
+                payload = line[len('data:'):].strip()
+                if payload == '[DONE]':
                     break
+                
+                text = self._stream_event_text(json.loads(payload), usage)
+                if text:
+                    yield text
+        finally:
+            response.close()
+            self._record_usage(usage or None, estimated_tokens)
+    
+    def _open_stream(self, prompt, prefix=''):
+        """
+        Start a streaming request to the configured API.
         
-        if subject_found:
-            if subject == 'physics':
-                is_physics = True
-                logger.info("Subject identified as physics")
-            elif subject == 'chemistry':
-                is_chemistry = True
-                logger.info("Subject identified as chemistry")
-            elif subject == 'mathematics' or subject == 'math':
-                is_math = True
-                logger.info("Subject identified as mathematics")
-            elif subject == 'economics':
-                is_economics = True
-                logger.info("Subject identified as economics")
-            elif subject == 'general paper' or subject == 'gp':
-                is_gp = True
-                logger.info("Subject identified as general paper")
-            else:
-                logger.info(f"Subject '{subject}' not recognized as any of the configured subjects")
+        Args:
+            prompt (str): Prompt for the LLM
+            prefix (str, optional): Static prompt prefix
+            
+        Returns:
+            requests.Response: Open response whose body is the server-sent event stream
+        """
+        body = self.request_body(prompt, prefix)
+        body["stream"] = True
+        if self.api_type == 'openai':
+            url = "https://api.openai.com/v1/chat/completions"
+            headers = {"Content-Type": "application/json", "Authorization": f"Bearer {self.api_key}"}
+            # Ask for a final chunk with token usage
+            body["stream_options"] = {"include_usage": True}
         else:
-            logger.info("No subject found in metadata")
-            
-        # Add subject-specific instructions if relevant
-        subject_instruction = ""
-        
-        if is_physics:
-            syllabus_str = str(self.PHYSICS_SYLLABUS)
-            subject_instruction = f"""This is a Physics question. Find and update 'chapter' and 'topic' with the correct values from this syllabus json: {syllabus_str}."""
-            logger.info(f"Adding physics syllabus to prompt: {syllabus_str}")
-            logger.info(f"Physics syllabus variable type: {type(self.PHYSICS_SYLLABUS)}")
-        elif is_chemistry:
-            subject_instruction = f"""This is a Chemistry question. Find and update 'chapter' and 'topic' with the correct values from this syllabus json: {self.CHEMISTRY_SYLLABUS}."""
-            logger.info(f"Adding chemistry syllabus to prompt: {self.CHEMISTRY_SYLLABUS}")
-        elif is_math:
-            subject_instruction = f"""This is a Mathematics question. Find and update 'chapter' and 'topic' with the correct values from this syllabus json:  {self.MATHEMATICS_SYLLABUS}."""
-            logger.info(f"Adding mathematics syllabus to prompt: {self.MATHEMATICS_SYLLABUS}")
-        elif is_economics:
-            subject_instruction = f"""This is an Economics question. Find and update 'chapter' and 'topic' with the correct values from this syllabus json:  {self.ECONOMICS_SYLLABUS}."""
-            logger.info(f"Adding economics syllabus to prompt: {self.ECONOMICS_SYLLABUS}")
-        elif is_gp:
-            subject_instruction = f"""This is a General Paper question. Find and update 'chapter' and 'topic' with the correct values from this syllabus json:  {self.GP_SYLLABUS}."""
-            logger.info(f"Adding general paper syllabus to prompt: {self.GP_SYLLABUS}")
-        
-        logger.info(f"Final subject instruction: {subject_instruction}")
-        
-        # Build the complete prompt
-        full_prompt = f"""
-You are an expert in educational assessment. Analyze the following exam question and generate enhanced metadata for it.
-
-QUESTION TEXT:
-{ocr_text}
-
-EXISTING METADATA:
-{metadata_str}
-
-{subject_instruction}
-
-Return your analysis in the following JSON format:
-Please generate the following additional metadata:
-1. Question type (multiple choice, short answer, fill in the blanks, open ended, calculation, essay, etc.)
-2. Difficulty level (easy, medium, hard, very hard)
-3. Keywords or key concepts (comma-separated)
-4. Cognitive skills required (recall, understanding, application, analysis, evaluation, creation etc)
-5. Detailed topic classification with subtopics
-6. A cleaned and properly formatted version of the question text and answer choices (for multiple choice) with your answer and your confidence in the answer
-
-Return your analysis in the following JSON format:
-```json
-{{
-  "chapter": "chapter matched up from syllabus json",
-  "topic": "topic matched up from syllabus json",
-  "question_type": "string (e.g., 'multiple_choice', 'true_false', 'open_ended', 'fill_in_the_blank', 'other')",
-  "difficulty_level": "string (e.g., 'easy', 'medium', 'hard')",
-  "keywords": ["string (e.g., 'keyword1')", "string (e.g., 'keyword2')", "string (e.g., 'keyword3')"],
-  "cognitive_skills": ["string (e.g., 'recall')", "string (e.g., 'understanding')", "string (e.g., 'application')"],
-  "cleaned_text": "string (The rephrased and formatted question text)",
-  "answer": "string (For multiple choice, the letter of the correct answer.  For other types, the full answer text.)",
-  "choices": [
-    {{
-      "letter": "string (e.g., 'A')",
-      "text": "string (Text of choice A)"
-    }},
-    {{
-      "letter": "string (e.g., 'B')",
-      "text": "string (Text of choice B)"
-    }},
-    {{
-      "letter": "string (e.g., 'C')",
-      "text": "string (Text of choice C)"
-    }}
-  ],
-  "answer_confidence": "number (between 0 and 1, e.g., 0.95)"
-}}
-```
-
-Do not include any other text in your response - only the JSON.
-"""
-
-        # Log a shortened version of the prompt for debugging
-        ocr_preview = ocr_text[:100] + "..." if len(ocr_text) > 100 else ocr_text
-        log_prompt = f"""
-You are an expert in educational assessment. Analyze the following exam question and generate enhanced metadata for it.
-
-QUESTION TEXT:
-{ocr_preview}
-
-EXISTING METADATA:
-{metadata_str}
-
-{subject_instruction}
-
-Return your analysis in the following JSON format:
-[...rest of prompt omitted for brevity...]
-"""
-        logger.info(f"Generated prompt with subject instruction: {log_prompt}")
+            url = "https://api.anthropic.com/v1/messages"
+            headers = {"Content-Type": "application/json", "x-api-key": self.api_key,
+                       "anthropic-version": "2023-06-01"}
         
-        return full_prompt
+        provider = 'OpenAI' if self.api_type == 'openai' else 'Anthropic'
+        try:
+            response = self._get_session().post(
+                url,
+                headers=headers,
+                json=body,
+                stream=True,
+                timeout=(self.connect_timeout, self.read_timeout)
+            )
+        except requests.exceptions.Timeout:
+            raise RetryableLLMError(f"Connection timeout: The {provider} API request took too long to complete.")
+        except requests.exceptions.ConnectionError:
+            raise RetryableLLMError(f"Connection error: Could not connect to the {provider} API.")
+        
+        if response.status_code in RETRYABLE_STATUS_CODES:
+            response.close()
+            raise RetryableLLMError(f"{provider} API error: HTTP {response.status_code}",
+                                    status_code=response.status_code,
+                                    retry_after=_parse_retry_after(response.headers))
+        
+        if response.status_code != 200:
+            error_content = response.text[:500]
+            response.close()
+            raise Exception(f"{provider} API error: {error_content}")
+        
+        return response
     
-    def _call_openai(self, prompt):
+    def _stream_event_text(self, event, usage):
         """
-        Call OpenAI API for LLM processing.
+        Get the text carried by one streamed event, collecting token usage on the way.
         
         Args:
-            prompt (str): Complete prompt for the LLM
+            event (dict): Parsed event data
+            usage (dict): Normalized usage, updated in place
             
         Returns:
-            str: LLM response
+            str: Response text in the event, or None
+        """
+        if self.api_type == 'openai':
+            if event.get('usage'):
+                usage.update(self._openai_usage(event['usage']))
+            choices = event.get('choices') or []
+            return choices[0].get('delta', {}).get('content') if choices else None
+        
+        event_type = event.get('type')
+        if event_type == 'content_block_delta':
+            return event.get('delta', {}).get('text')
+        if event_type == 'message_start':
+            usage.update(self._anthropic_usage(event.get('message', {}).get('usage')) or {})
+        elif event_type == 'message_delta' and event.get('usage'):
+            usage['output_tokens'] = event['usage'].get('output_tokens', 0)
+        elif event_type == 'error':
+            raise Exception(f"Anthropic API error: {event.get('error')}")
+        return None
+    
+    def _with_retries(self, call, estimated_tokens):
+        """
+        Run an API call within the rate limits, retrying throttled and
+        transient failures with backoff. Each attempt takes a request slot,
+        but the tokens of a failed attempt are returned to the budget.
+        
+        Args:
+            call (callable): Function making the API call; raises
+                RetryableLLMError for failures worth retrying
+            estimated_tokens (int): Tokens to reserve from the rate limiter
+            
+        Returns:
+            The return value of call
+        """
+        for attempt in range(self.rate_limiter.max_retries + 1):
+            self.rate_limiter.acquire(estimated_tokens)
+            try:
+                return call()
+            except RetryableLLMError as e:
+                # The failed attempt used no tokens; give back its reservation so retries don't drain the budget
+                self.rate_limiter.record_usage(estimated_tokens, 0)
+                if e.status_code in (429, 529):
+                    self.rate_limiter.record_throttle(e.retry_after)
+                if attempt >= self.rate_limiter.max_retries:
+                    raise
+                
+                delay = self.rate_limiter.backoff_delay(attempt, e.retry_after)
+                logger.warning(f"LLM call failed ({str(e)}); retrying in {delay:.1f}s "
+                               f"(attempt {attempt + 1}/{self.rate_limiter.max_retries})")
+                time.sleep(delay)
+    
+    @staticmethod
+    def _estimate_tokens(text):
+        """
+        Roughly estimate the number of tokens in a text (about 4 characters per token).
+        
+        Args:
+            text (str): Text to measure
+            
+        Returns:
+            int: Estimated token count
+        """
+        return len(text or '') // 4 + 1
+    
+    def min_cacheable_tokens(self):
+        """
+        Get the shortest prefix the configured Anthropic model will cache.
+        
+        Returns:
+            int: Minimum cacheable prefix length in tokens
+        """
+        for model_prefix, tokens in self.MIN_CACHEABLE_TOKENS.items():
+            if (self.model or '').startswith(model_prefix):
+                return tokens
+        return self.DEFAULT_MIN_CACHEABLE_TOKENS
+    
+    def _cacheable_prefix(self, prefix):
+        """
+        Decide whether to mark a prompt prefix for prompt caching. Prefixes
+        below the model's minimum would never be cached, so they aren't
+        marked (and a warning is logged once per prefix length).
+        
+        Args:
+            prefix (str): Static prompt prefix
+            
+        Returns:
+            bool: True if the prefix should carry a cache_control marker
+        """
+        if not prefix or not self.prompt_caching:
+            return False
+        
+        prefix_tokens = self._estimate_tokens(self.SYSTEM_PROMPT + prefix)
+        cacheable = prefix_tokens >= self.min_cacheable_tokens()
+        with self._usage_lock:
+            self._usage_totals['cache_marked_requests' if cacheable else 'cache_skipped_requests'] += 1
+            warn = not cacheable and prefix_tokens not in self._short_prefix_warnings
+            if warn:
+                self._short_prefix_warnings.add(prefix_tokens)
+        
+        if warn:
+            logger.warning(f"Prompt prefix of ~{prefix_tokens} tokens is below the {self.min_cacheable_tokens()}-token "
+                           f"minimum for prompt caching with {self.model}; sending it uncached")
+        return cacheable
+    
+    def request_body(self, prompt, prefix='', max_tokens=None):
+        """
+        Build the request body for the configured API. Used for direct calls
+        and for the lines of offline batch files.
+        
+        Args:
+            prompt (str): Prompt for the LLM
+            prefix (str, optional): Static prompt prefix
+            max_tokens (int, optional): Output token limit; OpenAI uses its own
+                default and Anthropic uses self.max_tokens if omitted
+            
+        Returns:
+            dict: JSON body for the chat completions / messages endpoint
+        """
+        if self.api_type == 'openai':
+            body = {
+                "model": self.model,
+                "messages": [
+                    {"role": "system", "content": self.SYSTEM_PROMPT},
+                    {"role": "user", "content": prefix + prompt}
+                ],
+                "temperature": self.temperature  # Lower temperature for more consistent, focused responses
+            }
+            if max_tokens:
+                body["max_tokens"] = max_tokens
+            return body
+        
+        if self._cacheable_prefix(prefix):
+            content = [
+                {"type": "text", "text": prefix, "cache_control": {"type": "ephemeral"}},
+                {"type": "text", "text": prompt}
+            ]
+        else:
+            content = prefix + prompt
+        
+        return {
+            "model": self.model,
+            "max_tokens": max_tokens or self.max_tokens,
+            "temperature": self.temperature,
+            "system": self.SYSTEM_PROMPT,
+            "messages": [
+                {"role": "user", "content": content}
+            ]
+        }
+    
+    def _call_openai(self, prompt, prefix='', max_tokens=None):
+        """
+        Call OpenAI API for LLM processing. OpenAI caches long prompt prefixes
+        automatically, so the prefix is simply sent first.
+        
+        Args:
+            prompt (str): Prompt for the LLM
+            prefix (str, optional): Static prompt prefix
+            max_tokens (int, optional): Output token limit (OpenAI's default if omitted)
+            
+        Returns:
+            tuple: (LLM response, normalized token usage)
         """
         headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {self.api_key}"
         }
         
-        data = {
-            "model": "gpt-4",  # Or gpt-3.5-turbo for a cheaper, faster option
-            "messages": [
-                {"role": "system", "content": "You are an expert in educational assessment and metadata generation."},
-                {"role": "user", "content": prompt}
-            ],
-            "temperature": 0.3  # Lower temperature for more consistent, focused responses
-        }
+        data = self.request_body(prompt, prefix, max_tokens)
+        
+        try:
+            response = self._get_session().post(
+                "https://api.openai.com/v1/chat/completions",
+                headers=headers,
+                json=data,
+                timeout=(self.connect_timeout, self.read_timeout)
+            )
+        except requests.exceptions.Timeout:
+            raise RetryableLLMError("Connection timeout: The OpenAI API request took too long to complete.")
+        except requests.exceptions.ConnectionError:
+            raise RetryableLLMError("Connection error: Could not connect to the OpenAI API.")
         
-        response = requests.post(
-            "https://api.openai.com/v1/chat/completions",
-            headers=headers,
-            json=data
-        )
+        if response.status_code in RETRYABLE_STATUS_CODES:
+            raise RetryableLLMError(f"OpenAI API error: HTTP {response.status_code}",
+                                    status_code=response.status_code,
+                                    retry_after=_parse_retry_after(response.headers))
         
         if response.status_code != 200:
             error_content = response.json()
             raise Exception(f"OpenAI API error: {error_content}")
         
         result = response.json()
-        return result["choices"][0]["message"]["content"]
+        return result["choices"][0]["message"]["content"], self._openai_usage(result.get("usage"))
     
-    def _call_anthropic(self, prompt):
+    def _call_anthropic(self, prompt, prefix='', max_tokens=None):
         """
-        Call Anthropic API for LLM processing.
+        Call Anthropic API for LLM processing. The prefix is sent as its own
+        content block marked for prompt caching.
         
         Args:
-            prompt (str): Complete prompt for the LLM
+            prompt (str): Prompt for the LLM
+            prefix (str, optional): Static prompt prefix
+            max_tokens (int, optional): Output token limit; defaults to self.max_tokens
             
         Returns:
-            str: LLM response
+            tuple: (LLM response, normalized token usage)
         """
+        body = self.request_body(prompt, prefix, max_tokens)
+        
         # Use SDK if available, otherwise fall back to direct API calls
         if ANTHROPIC_SDK_AVAILABLE:
             try:
-                # Fix SDK initialization by using only api_key parameter
-                client = anthropic.Anthropic(api_key=self.api_key)
+                # Reuse the pooled client rather than opening new connections per call
+                client = self._get_anthropic_client()
                 # Using the latest model available with the SDK
-                message = client.messages.create(
-                    model="claude-3-haiku-20240307",  # Updated to a newer model available in the API
-                    max_tokens=1000,
-                    temperature=0.3,
-                    system="You are an expert in educational assessment and metadata generation.",
-                    messages=[
-                        {"role": "user", "content": prompt}
-                    ]
-                )
-                # Check SDK version to handle different response formats
-                try:
-                    return message.content[0].text
-                except (AttributeError, IndexError):
-                    # Older SDK version might have a different structure
-                    if hasattr(message, 'completion'):
-                        return message.completion
-                    elif hasattr(message, 'content'):
-                        if isinstance(message.content, str):
-                            return message.content
-                        elif isinstance(message.content, list):
-                            for content_block in message.content:
-                                if hasattr(content_block, 'text'):
-                                    return content_block.text
-                        # Last resort fallback
-                        return str(message.content)
+                message = client.messages.create(**body)
+                usage = getattr(message, 'usage', None)
+                return self._sdk_message_text(message), self._anthropic_usage({
+                    key: getattr(usage, key, None) or 0 for key in
+                    ('input_tokens', 'output_tokens', 'cache_read_input_tokens', 'cache_creation_input_tokens')
+                } if usage else None)
+            except anthropic.APIStatusError as e:
+                if e.status_code in RETRYABLE_STATUS_CODES:
+                    # Throttling and overload won't be fixed by the direct API fallback
+                    raise RetryableLLMError(f"Anthropic API error: HTTP {e.status_code}",
+                                            status_code=e.status_code,
+                                            retry_after=_parse_retry_after(e.response.headers))
+                logger.error(f"Anthropic SDK error: {str(e)}")
+                logger.info("Falling back to direct API call")
+            except anthropic.APIConnectionError as e:
+                raise RetryableLLMError(f"Connection error: Could not connect to the Anthropic API ({str(e)})")
             except Exception as e:
                 logger.error(f"Anthropic SDK error: {str(e)}")
                 logger.info("Falling back to direct API call")
@@ -577,20 +1405,19 @@ Return your analysis in the following JSON format:
         
         try:
             # Use messages endpoint for Claude 3 models
-            response = requests.post(
+            response = self._get_session().post(
                 "https://api.anthropic.com/v1/messages",
                 headers=headers,
-                json={
-                    "model": "claude-3-haiku-20240307",  # Updated to newer model
-                    "max_tokens": 1000,
-                    "temperature": 0.3,
-                    "messages": [
-                        {"role": "user", "content": prompt}
-                    ]
-                },
-                timeout=30  # Add a 30 second timeout to prevent hanging
+                json=body,
+                timeout=(self.connect_timeout, self.read_timeout)  # Prevent hanging
             )
             
+            # Rate limits and overload (possibly as HTML error pages) are retried
+            if response.status_code in RETRYABLE_STATUS_CODES:
+                raise RetryableLLMError(f"Anthropic API error: HTTP {response.status_code}",
+                                        status_code=response.status_code,
+                                        retry_after=_parse_retry_after(response.headers))
+            
             # Check for non-JSON responses (like HTML error pages)
             content_type = response.headers.get('Content-Type', '')
             if 'application/json' not in content_type.lower():
@@ -602,30 +1429,105 @@ Return your analysis in the following JSON format:
             
             result = response.json()
             # Extract content from the messages endpoint response
+            usage = self._anthropic_usage(result.get("usage"))
             if "content" in result and len(result["content"]) > 0:
-                return result["content"][0]["text"]
+                return result["content"][0]["text"], usage
             else:
                 logger.error(f"Unexpected response structure: {result}")
-                return ""
+                return "", usage
         except requests.exceptions.Timeout:
-            logger.error("Anthropic API request timed out after 30 seconds")
-            raise Exception("Connection timeout: The API request took too long to complete. Please try again later.")
+            logger.error(f"Anthropic API request timed out after {self.read_timeout} seconds")
+            raise RetryableLLMError("Connection timeout: The API request took too long to complete. Please try again later.")
         except requests.exceptions.ConnectionError:
             logger.error("Connection error when calling Anthropic API")
-            raise Exception("Connection error: Could not connect to the Anthropic API. Please check your internet connection.")
+            raise RetryableLLMError("Connection error: Could not connect to the Anthropic API. Please check your internet connection.")
         except requests.exceptions.RequestException as e:
             logger.error(f"API request failed: {str(e)}")
             raise Exception(f"API request failed: {str(e)}")
     
-    def _parse_response(self, response):
+    @staticmethod
+    def _sdk_message_text(message):
+        """
+        Extract the response text from an Anthropic SDK message.
+        
+        Args:
+            message: Message returned by the SDK
+            
+        Returns:
+            str: Response text
+        """
+        # Check SDK version to handle different response formats
+        try:
+            return message.content[0].text
+        except (AttributeError, IndexError):
+            # Older SDK version might have a different structure
+            if hasattr(message, 'completion'):
+                return message.completion
+            elif hasattr(message, 'content'):
+                if isinstance(message.content, str):
+                    return message.content
+                elif isinstance(message.content, list):
+                    for content_block in message.content:
+                        if hasattr(content_block, 'text'):
+                            return content_block.text
+                # Last resort fallback
+                return str(message.content)
+    
+    @staticmethod
+    def _openai_usage(usage):
+        """
+        Normalize the usage block of an OpenAI response.
+        
+        Args:
+            usage (dict): Usage as reported by the API, or None
+            
+        Returns:
+            dict: Normalized token usage, or None if not reported
+        """
+        if not usage:
+            return None
+        cached_tokens = (usage.get('prompt_tokens_details') or {}).get('cached_tokens') or 0
+        return {
+            'input_tokens': (usage.get('prompt_tokens') or 0) - cached_tokens,
+            'output_tokens': usage.get('completion_tokens') or 0,
+            'cache_read_tokens': cached_tokens,
+            'cache_write_tokens': 0
+        }
+    
+    @staticmethod
+    def _anthropic_usage(usage):
+        """
+        Normalize the usage block of an Anthropic response.
+        
+        Args:
+            usage (dict): Usage as reported by the API, or None
+            
+        Returns:
+            dict: Normalized token usage, or None if not reported
+        """
+        if not usage:
+            return None
+        return {
+            'input_tokens': usage.get('input_tokens') or 0,
+            'output_tokens': usage.get('output_tokens') or 0,
+            'cache_read_tokens': usage.get('cache_read_input_tokens') or 0,
+            'cache_write_tokens': usage.get('cache_creation_input_tokens') or 0
+        }
+    
+    def _parse_response(self, response, item_ids=None):
         """
         Parse the LLM response into a structured format.
         
         Args:
             response (str): LLM response
+            item_ids (list, optional): IDs of the questions in a batched request.
+                If given, the response is expected to be a JSON array of objects
+                carrying these IDs.
             
         Returns:
-            dict: Structured metadata
+            dict: Structured metadata. For a batched response, 'items' maps
+                each answered ID to its metadata and 'raw_items' to the
+                unformatted object.
         """
         try:
             # Check if response is None or empty
@@ -639,32 +1541,26 @@ Return your analysis in the following JSON format:
                 logger.debug(f"HTML response received: {response[:200]}...")
                 return {'error': error_msg, 'raw_response': response[:500]}
             
-            # Extract JSON from the response - assuming the response is JSON or contains JSON
-            json_content = response.strip()
-            
-            # If the response includes markdown code blocks, extract the JSON
-            if "```json" in json_content:
-                json_content = json_content.split("```json")[1].split("```")[0].strip()
-            elif "```" in json_content:
-                json_content = json_content.split("```")[1].split("```")[0].strip()
+            # Find the JSON in the response, repairing prose, fences, trailing commas and truncation
+            container = '{'
+            if item_ids is not None:
+                first_array, first_object = response.find('['), response.find('{')
+                if first_array != -1 and (first_object == -1 or first_array < first_object):
+                    container = '['
+            metadata, repairs = extract_json(response, container)
+            if repairs:
+                logger.warning(f"Repaired LLM response JSON ({', '.join(repairs)})")
             
-            # Parse the JSON
-            metadata = json.loads(json_content)
+            if item_ids is not None:
+                # A single object is accepted as a batch of one
+                return self._split_batch_response(metadata if container == '[' else [metadata],
+                                                  item_ids, response)
             
-            # Fix the choices display format if present
-            if 'choices' in metadata and isinstance(metadata['choices'], list):
-                formatted_choices = []
-                for choice in metadata['choices']:
-                    if isinstance(choice, dict) and 'letter' in choice and 'text' in choice:
-                        formatted_choices.append(f"{choice['letter']}: {choice['text']}")
-                
-                # Replace the choices array with the formatted string
-                if formatted_choices:
-                    metadata['choices'] = formatted_choices
+            if not isinstance(metadata, dict):
+                raise ValueError("Expected a JSON object in the LLM response")
+            return self._validate_metadata(self._format_choices(metadata))
             
-            return metadata
-            
-        except json.JSONDecodeError as e:
+        except ValueError as e:
             error_msg = f"Failed to parse LLM response: {str(e)}"
             logger.error(error_msg)
             logger.debug(f"Problematic response: {response}")
@@ -673,4 +1569,140 @@ Return your analysis in the following JSON format:
             error_msg = f"Error processing LLM response: {str(e)}"
             logger.error(error_msg)
             logger.debug(f"Problematic response: {response}")
-            return {'error': error_msg, 'raw_response': str(response)[:500] if response else 'None'}
\ No newline at end of file
+            return {'error': error_msg, 'raw_response': str(response)[:500] if response else 'None'}
+    
+    def _split_batch_response(self, parsed, item_ids, response):
+        """
+        Split the JSON array of a batched response into per-question metadata.
+        
+        Args:
+            parsed: Parsed JSON of the response
+            item_ids (list): IDs of the questions in the request
+            response (str): Raw LLM response, for error reporting
+            
+        Returns:
+            dict: 'items' and 'raw_items' keyed by ID, or an 'error' dictionary
+        """
+        if not isinstance(parsed, list):
+            error_msg = "Expected a JSON array in the batched LLM response"
+            logger.error(error_msg)
+            return {'error': error_msg, 'raw_response': str(response)[:500]}
+        
+        wanted = set(item_ids)
+        items = {}
+        raw_items = {}
+        for entry in parsed:
+            if not isinstance(entry, dict):
+                continue
+            item_id = str(entry.pop('id', ''))
+            if item_id in wanted and item_id not in items:
+                raw_items[item_id] = dict(entry)
+                items[item_id] = self._validate_metadata(self._format_choices(entry))
+        
+        missing = wanted - set(items)
+        if missing:
+            logger.warning(f"Batched LLM response is missing {len(missing)} of {len(item_ids)} questions")
+        return {'items': items, 'raw_items': raw_items}
+    
+    def _validate_metadata(self, metadata):
+        """
+        Check parsed metadata against METADATA_SCHEMA. Values of a near-miss
+        type are coerced (e.g. a comma-separated string for a list); values
+        that can't be used are dropped. Required fields that end up absent
+        are listed under 'missing_fields'.
+        
+        Args:
+            metadata (dict): Parsed metadata
+            
+        Returns:
+            dict: The same metadata, with 'missing_fields' if anything is missing
+        """
+        missing = []
+        for field, (expected_type, required) in self.METADATA_SCHEMA.items():
+            value = metadata.get(field)
+            if value is not None and not isinstance(value, expected_type):
+                if expected_type is list and isinstance(value, str):
+                    value = [item.strip() for item in value.split(',') if item.strip()]
+                elif expected_type is str and isinstance(value, (int, float)):
+                    value = str(value)
+                elif expected_type is float and isinstance(value, (int, str)) and not isinstance(value, bool):
+                    try:
+                        value = float(value)
+                    except ValueError:
+                        value = None
+                else:
+                    value = None
+                
+                if value is None:
+                    logger.warning(f"Dropping LLM field '{field}' with unexpected type")
+                    metadata.pop(field, None)
+                else:
+                    metadata[field] = value
+            
+            if required and metadata.get(field) is None:
+                missing.append(field)
+        
+        metadata.pop('missing_fields', None)
+        if missing:
+            metadata['missing_fields'] = missing
+        return metadata
+    
+    def _complete_missing_fields(self, request, metadata):
+        """
+        Ask the LLM again for only the fields missing from an analysis and
+        merge them in.
+        
+        Args:
+            request (dict): Prepared request from _prepare_analysis()
+            metadata (dict): Parsed metadata with 'missing_fields'
+            
+        Returns:
+            dict: Merged metadata; 'missing_fields' remains if fields are still missing
+        """
+        missing = metadata.get('missing_fields')
+        if not missing:
+            return metadata
+        
+        logger.info(f"Reprompting LLM for missing fields: {', '.join(missing)}")
+        suffix = request['suffix'] + self.MISSING_FIELDS_INSTRUCTIONS.format(fields=', '.join(missing))
+        try:
+            extra = self._parse_response(self._call_llm(suffix, prefix=request['prefix']))
+        except Exception as e:
+            logger.error(f"Reprompt for missing fields failed: {str(e)}")
+            return metadata
+        if 'error' in extra:
+            return metadata
+        
+        merged = dict(metadata)
+        for field in missing:
+            if extra.get(field) is not None:
+                merged[field] = extra[field]
+        
+        still_missing = [field for field in missing if merged.get(field) is None]
+        merged.pop('missing_fields')
+        if still_missing:
+            merged['missing_fields'] = still_missing
+        return merged
+    
+    @staticmethod
+    def _format_choices(metadata):
+        """
+        Fix the choices display format of parsed metadata, if present.
+        
+        Args:
+            metadata (dict): Parsed metadata
+            
+        Returns:
+            dict: The same metadata with choices as "letter: text" strings
+        """
+        if 'choices' in metadata and isinstance(metadata['choices'], list):
+            formatted_choices = []
+            for choice in metadata['choices']:
+                if isinstance(choice, dict) and 'letter' in choice and 'text' in choice:
+                    formatted_choices.append(f"{choice['letter']}: {choice['text']}")
+            
+            # Replace the choices array with the formatted string
+            if formatted_choices:
+                metadata['choices'] = formatted_choices
+        
+        return metadata
\ No newline at end of file
@@ -2,47 +2,87 @@
 import os
 import json
 import logging
+import copy
 import datetime
-import shutil
+import threading
+
+from modules.backup_manager import BackupManager
 
 logger = logging.getLogger(__name__)
 
 class MetadataManager:
     """
     Handles reading, updating, and saving metadata for question images.
+    
+    The metadata file is kept in memory, indexed by filename, and only
+    re-parsed when its modification time or size changes on disk.
+    
+    In journal mode, each change is appended as a small record to a
+    write-ahead journal next to the metadata file instead of rewriting the
+    whole file. The journal is replayed on load and compacted into the main
+    file in the background or once it grows past a size threshold.
     """
     
-    def __init__(self, metadata_file):
+    # Keys an LLM analysis adds to describe its result rather than the question.
+    # They're never stored, and updating an entry removes any that are stored.
+    ANALYSIS_FLAGS = ('missing_fields',)
+    
+    def __init__(self, metadata_file, journal_enabled=True, journal_max_bytes=1024 * 1024, compact_interval=30,
+                 backup_min_interval=300, backup_keep_last=20, backup_keep_daily=14):
         """
         Initialize metadata manager with the path to the metadata file.
         
         Args:
             metadata_file (str): Path to the metadata JSON file
+            journal_enabled (bool): Whether to journal changes instead of rewriting
+                the metadata file on every update
+            journal_max_bytes (int): Journal size that triggers an immediate compaction
+            compact_interval (float): Seconds after a journaled change before the
+                journal is compacted in the background
+            backup_min_interval (float): Minimum seconds between two backup snapshots
+            backup_keep_last (int): Number of most recent backup snapshots to keep
+            backup_keep_daily (int): Number of days for which one backup snapshot
+                per day is kept
         """
         self.metadata_file = metadata_file
+        self.journal_file = f"{metadata_file}.journal"
+        self.journal_enabled = journal_enabled
+        self.journal_max_bytes = journal_max_bytes
+        self.compact_interval = compact_interval
         self.backup_dir = os.path.join(os.path.dirname(metadata_file), 'metadata_backups')
         
-        # Ensure backup directory exists
-        if not os.path.exists(self.backup_dir):
-            os.makedirs(self.backup_dir)
+        # Resident copy of the metadata file, indexed by filename
+        self._entries = []
+        self._index = {}
+        self._signature = None
+        self._loaded = False
+        self._lock = threading.RLock()
+        self._compaction_timer = None
+        
+        # Deduplicated, rate-limited snapshots of the metadata list
+        self.backup_manager = BackupManager(
+            self.backup_dir,
+            min_interval=backup_min_interval,
+            keep_last=backup_keep_last,
+            keep_daily=backup_keep_daily
+        )
+        
+        # Recover changes journaled before the last shutdown
+        if os.path.exists(self.journal_file) and os.path.getsize(self.journal_file) > 0:
+            logger.info(f"Replaying metadata journal: {self.journal_file}")
+            self.compact()
     
     def read_metadata(self):
         """
-        Read the metadata file and parse the JSON.
+        Get all metadata entries, re-reading the file only if it changed on disk.
         
         Returns:
-            list: List of metadata entries, or empty list if file doesn't exist
+            list: Copies of the metadata entries, or empty list if file doesn't exist
         """
-        if not os.path.exists(self.metadata_file):
-            logger.warning(f"Metadata file not found: {self.metadata_file}")
-            return []
-        
-        try:
-            with open(self.metadata_file, 'r') as f:
-                return json.load(f)
-        except json.JSONDecodeError as e:
-            logger.error(f"Error parsing metadata file: {str(e)}")
-            return []
+        with self._lock:
+            self._ensure_loaded()
+            # Hand out copies so callers can't modify the resident store
+            return copy.deepcopy(self._entries)
     
     def get_metadata_for_image(self, image_filename):
         """
@@ -54,13 +94,54 @@ class MetadataManager:
         Returns:
             dict: Metadata entry for the image, or None if not found
         """
-        metadata_list = self.read_metadata()
+        with self._lock:
+            self._ensure_loaded()
+            entry = self._index.get(image_filename)
+            # Hand out a copy so callers can't modify the resident store
+            return copy.deepcopy(entry) if entry is not None else None
+    
+    def get_metadata_map(self):
+        """
+        Get all metadata entries keyed by filename, from the in-memory index.
         
-        for entry in metadata_list:
-            if entry.get('filename') == image_filename:
-                return entry
+        Returns:
+            dict: Mapping of filename to a copy of its metadata entry
+        """
+        with self._lock:
+            self._ensure_loaded()
+            # Hand out copies so callers can't modify the resident store
+            return copy.deepcopy(self._index)
+    
+    def get_completed_entries(self, filenames=None):
+        """
+        Get copies of the metadata entries whose review is completed.
         
-        return None
+        Args:
+            filenames (list, optional): Only these images; all completed entries if None
+            
+        Returns:
+            tuple: (entries, skipped) where entries are deep copies safe to use
+                outside the lock and skipped lists the requested filenames that
+                have no completed entry
+        """
+        with self._lock:
+            self._ensure_loaded()
+            
+            if filenames is None:
+                completed = [entry for entry in self._index.values() if entry.get('review_completed', False)]
+                skipped = []
+            else:
+                completed = []
+                skipped = []
+                for filename in filenames:
+                    entry = self._index.get(filename)
+                    if entry and entry.get('review_completed', False):
+                        completed.append(entry)
+                    else:
+                        skipped.append(filename)
+            
+            # Copied under the lock so a concurrent update can't change an entry mid-copy
+            return copy.deepcopy(completed), skipped
     
     def update_metadata(self, image_filename, enhanced_metadata):
         """
@@ -73,42 +154,24 @@ class MetadataManager:
         Returns:
             bool: True if successful, False otherwise
         """
-        # First create a backup
-        self._create_backup()
-        
-        metadata_list = self.read_metadata()
-        updated = False
-        
-        for entry in metadata_list:
-            if entry.get('filename') == image_filename:
-                # Update the entry with enhanced metadata
-                for key, value in enhanced_metadata.items():
-                    entry[key] = value
-                
-                # Add a timestamp for the update
-                entry['last_updated'] = datetime.datetime.now().isoformat()
-                updated = True
-                break
-        
-        if not updated:
-            # Create a new entry if none exists
-            logger.info(f"Creating new metadata entry for {image_filename}")
-            new_entry = {'filename': image_filename}
+        with self._lock:
+            self._ensure_loaded()
             
-            # Update with enhanced metadata
-            for key, value in enhanced_metadata.items():
-                new_entry[key] = value
-                
-            # Add creation timestamp
-            new_entry['created'] = datetime.datetime.now().isoformat()
-            new_entry['last_updated'] = new_entry['created']
+            now = datetime.datetime.now().isoformat()
+            fields = self._stored_fields(enhanced_metadata)
             
-            # Add to metadata list
-            metadata_list.append(new_entry)
-            updated = True
-        
-        # Save the updated metadata
-        return self._save_metadata(metadata_list)
+            if image_filename not in self._index:
+                # Create a new entry if none exists
+                logger.info(f"Creating new metadata entry for {image_filename}")
+                fields['created'] = now
+            
+            # Add a timestamp for the update
+            fields['last_updated'] = now
+            
+            record = self._apply_change(image_filename, fields, self._stale_flags(image_filename))
+            
+            # Save the updated metadata
+            return self._persist([record])
         
     def mark_review_completed(self, image_filename, completed=True):
         """
@@ -121,47 +184,32 @@ class MetadataManager:
         Returns:
             bool: True if successful, False otherwise
         """
-        # Create a backup before modifying
-        self._create_backup()
-        
-        metadata_list = self.read_metadata()
-        updated = False
-        
-        for entry in metadata_list:
-            if entry.get('filename') == image_filename:
-                # Set the review_completed status
-                entry['review_completed'] = completed
-                
-                # Add a timestamp for the review completion
-                if completed:
-                    entry['review_completed_at'] = datetime.datetime.now().isoformat()
-                else:
-                    # Remove the timestamp if unmarking as completed
-                    entry.pop('review_completed_at', None)
-                
-                # Update the last_updated timestamp
-                entry['last_updated'] = datetime.datetime.now().isoformat()
-                updated = True
-                break
-        
-        if not updated:
-            # Create a new entry if none exists
-            logger.info(f"Creating new metadata entry for {image_filename} with review status")
-            new_entry = {
-                'filename': image_filename,
-                'review_completed': completed,
-                'created': datetime.datetime.now().isoformat(),
-                'last_updated': datetime.datetime.now().isoformat()
-            }
+        with self._lock:
+            self._ensure_loaded()
+            
+            now = datetime.datetime.now().isoformat()
+            fields = {'review_completed': completed}
+            unset = []
+            
+            if image_filename not in self._index:
+                # Create a new entry if none exists
+                logger.info(f"Creating new metadata entry for {image_filename} with review status")
+                fields['created'] = now
             
+            # Update the last_updated timestamp
+            fields['last_updated'] = now
+            
+            # Add a timestamp for the review completion
             if completed:
-                new_entry['review_completed_at'] = new_entry['last_updated']
-                
-            metadata_list.append(new_entry)
-            updated = True
-        
-        # Save the updated metadata
-        return self._save_metadata(metadata_list)
+                fields['review_completed_at'] = now
+            else:
+                # Remove the timestamp if unmarking as completed
+                unset.append('review_completed_at')
+            
+            record = self._apply_change(image_filename, fields, unset)
+            
+            # Save the updated metadata
+            return self._persist([record])
         
     def get_review_status_lists(self):
         """
@@ -170,19 +218,21 @@ class MetadataManager:
         Returns:
             tuple: (pending_review, completed_review) lists of filenames
         """
-        metadata_list = self.read_metadata()
         pending_review = []
         completed_review = []
         
-        for entry in metadata_list:
-            filename = entry.get('filename')
-            if not filename:
-                continue
-                
-            if entry.get('review_completed', False):
-                completed_review.append(filename)
-            else:
-                pending_review.append(filename)
+        # Only filenames leave the lock, so the resident entries are read without copying
+        with self._lock:
+            self._ensure_loaded()
+            for entry in self._entries:
+                filename = entry.get('filename')
+                if not filename:
+                    continue
+                    
+                if entry.get('review_completed', False):
+                    completed_review.append(filename)
+                else:
+                    pending_review.append(filename)
                 
         return pending_review, completed_review
         
@@ -193,25 +243,28 @@ class MetadataManager:
         Returns:
             list: List of filenames with completed review
         """
-        metadata_list = self.read_metadata()
         completed_review = []
         
-        for entry in metadata_list:
-            filename = entry.get('filename')
-            if not filename:
-                continue
-                
-            if entry.get('review_completed', False):
-                completed_review.append(filename)
+        with self._lock:
+            self._ensure_loaded()
+            for entry in self._entries:
+                filename = entry.get('filename')
+                if not filename:
+                    continue
+                    
+                if entry.get('review_completed', False):
+                    completed_review.append(filename)
                 
         return completed_review
     
-    def update_batch_metadata(self, updates):
+    def update_batch_metadata(self, updates, create_missing=False):
         """
         Update metadata for multiple images.
         
         Args:
             updates (list): List of tuples (image_filename, enhanced_metadata)
+            create_missing (bool): Whether to create entries for images that
+                don't have one yet (otherwise they count as failures)
             
         Returns:
             tuple: (success_count, failure_count)
@@ -219,65 +272,87 @@ class MetadataManager:
         if not updates:
             return (0, 0)
         
-        # First create a backup
-        self._create_backup()
-        
-        metadata_list = self.read_metadata()
-        success_count = 0
-        failure_count = 0
-        
-        for image_filename, enhanced_metadata in updates:
-            updated = False
+        with self._lock:
+            self._ensure_loaded()
             
-            for entry in metadata_list:
-                if entry.get('filename') == image_filename:
-                    # Update the entry with enhanced metadata
-                    for key, value in enhanced_metadata.items():
-                        entry[key] = value
-                    
-                    # Add a timestamp for the update
-                    entry['last_updated'] = datetime.datetime.now().isoformat()
-                    updated = True
+            success_count = 0
+            failure_count = 0
+            records = []
+            
+            for image_filename, enhanced_metadata in updates:
+                exists = image_filename in self._index
+                if exists or create_missing:
+                    # Update the entry and add a timestamp for the update
+                    now = datetime.datetime.now().isoformat()
+                    fields = self._stored_fields(enhanced_metadata)
+                    if not exists:
+                        logger.info(f"Creating new metadata entry for {image_filename}")
+                        fields['created'] = now
+                    fields['last_updated'] = now
+                    records.append(self._apply_change(image_filename, fields, self._stale_flags(image_filename)))
                     success_count += 1
-                    break
+                else:
+                    logger.warning(f"No metadata entry found for {image_filename}")
+                    failure_count += 1
+            
+            # Save the updated metadata
+            if not records or self._persist(records):
+                return (success_count, failure_count)
+            else:
+                # If save failed, count all as failures
+                return (0, success_count + failure_count)
+    
+    def compact(self):
+        """
+        Fold the journal into the main metadata file and truncate it.
+        
+        Returns:
+            bool: True if successful (or nothing to compact), False otherwise
+        """
+        with self._lock:
+            if self._compaction_timer:
+                self._compaction_timer.cancel()
+                self._compaction_timer = None
+            
+            if not os.path.exists(self.journal_file) or os.path.getsize(self.journal_file) == 0:
+                return True
             
-            if not updated:
-                logger.warning(f"No metadata entry found for {image_filename}")
-                failure_count += 1
-        
-        # Save the updated metadata
-        if self._save_metadata(metadata_list):
-            return (success_count, failure_count)
-        else:
-            # If save failed, count all as failures
-            return (0, success_count + failure_count)
+            self._ensure_loaded()
+            
+            # Back up the file we're about to replace
+            self._create_backup()
+            return self._save_metadata(self._entries)
+    
+    def close(self):
+        """
+        Compact any pending journal records, e.g. on application shutdown.
+        """
+        self.compact()
     
     def _create_backup(self):
         """
-        Create a backup of the metadata file before making changes.
+        Snapshot the metadata file as it is on disk, before it is overwritten.
+        The resident entries already include the pending changes (and the
+        replayed journal), so they can't be used for the snapshot.
+        Snapshots are skipped if one was taken recently or nothing changed;
+        the file is only read when a snapshot is due.
         
         Returns:
-            bool: True if backup was created, False otherwise
+            bool: True if a snapshot was created, False otherwise
         """
-        if not os.path.exists(self.metadata_file):
-            logger.warning(f"Cannot create backup: file {self.metadata_file} not found")
+        if not os.path.exists(self.metadata_file) or not self.backup_manager.due():
             return False
         
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_filename = f"metadata_backup_{timestamp}.json"
-        backup_path = os.path.join(self.backup_dir, backup_filename)
-        
         try:
-            shutil.copy2(self.metadata_file, backup_path)
-            logger.info(f"Created backup: {backup_path}")
-            return True
+            return self.backup_manager.snapshot(self._load_from_disk()) is not None
         except Exception as e:
             logger.error(f"Failed to create backup: {str(e)}")
             return False
     
     def _save_metadata(self, metadata_list):
         """
-        Save the metadata list to the metadata file.
+        Save the metadata list to the metadata file and clear the journal,
+        whose records are all reflected in the list.
         
         Args:
             metadata_list (list): List of metadata entries
@@ -285,14 +360,241 @@ class MetadataManager:
         Returns:
             bool: True if successful, False otherwise
         """
+        with self._lock:
+            try:
+                # Write to a temp file and rename so a crash can't leave a truncated file
+                tmp_file = f"{self.metadata_file}.tmp"
+                with open(tmp_file, 'w') as f:
+                    json.dump(metadata_list, f, indent=4)
+                    # The new file must be durable before the journal that backs it is truncated
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_file, self.metadata_file)
+                self._fsync_directory()
+                
+                if os.path.exists(self.journal_file):
+                    open(self.journal_file, 'w').close()
+                
+                # The saved list becomes the resident copy; record the new file
+                # signature so our own write doesn't trigger a reload
+                if metadata_list is not self._entries:
+                    self._entries = metadata_list
+                    self._rebuild_index()
+                self._signature = self._file_signature()
+                self._loaded = True
+                
+                logger.info(f"Metadata saved to {self.metadata_file}")
+                return True
+            except Exception as e:
+                logger.error(f"Failed to save metadata: {str(e)}")
+                # In-memory changes were not persisted; reload from disk next time
+                self._loaded = False
+                return False
+    
+    def _fsync_directory(self):
+        """
+        Flush the metadata directory so a rename within it survives a power loss.
+        """
+        # Directories can't be opened for fsync on Windows; the rename is durable there anyway
+        if os.name != 'posix':
+            return
+        
+        fd = os.open(os.path.dirname(os.path.abspath(self.metadata_file)), os.O_RDONLY)
         try:
-            with open(self.metadata_file, 'w') as f:
-                json.dump(metadata_list, f, indent=4)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    
+    def _persist(self, records):
+        """
+        Persist changes already applied to the resident store, either by
+        appending them to the journal or by rewriting the metadata file.
+        
+        Args:
+            records (list): Change records returned by _apply_change()
             
-            logger.info(f"Metadata saved to {self.metadata_file}")
-            return True
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        if not self.journal_enabled:
+            # Create a backup before overwriting the file
+            self._create_backup()
+            return self._save_metadata(self._entries)
+        
+        try:
+            with open(self.journal_file, 'ab+') as f:
+                # Start on a new line if a crash or failed append left a torn record at the end
+                if f.seek(0, os.SEEK_END) > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b'\n':
+                        f.write(b'\n')
+                f.write(''.join(json.dumps(record) + '\n' for record in records).encode('utf-8'))
+                f.flush()
+                os.fsync(f.fileno())
         except Exception as e:
-            logger.error(f"Failed to save metadata: {str(e)}")
+            logger.error(f"Failed to write metadata journal: {str(e)}")
+            # In-memory changes were not persisted; reload from disk next time
+            self._loaded = False
             return False
         
-        
\ No newline at end of file
+        self._signature = self._file_signature()
+        
+        if os.path.getsize(self.journal_file) >= self.journal_max_bytes:
+            return self.compact()
+        
+        self._schedule_compaction()
+        return True
+    
+    def _stored_fields(self, enhanced_metadata):
+        """
+        Get the fields of an update that belong in the stored entry.
+        
+        Args:
+            enhanced_metadata (dict): Metadata to add/update
+            
+        Returns:
+            dict: The metadata without ANALYSIS_FLAGS
+        """
+        return {key: value for key, value in enhanced_metadata.items() if key not in self.ANALYSIS_FLAGS}
+    
+    def _stale_flags(self, image_filename):
+        """
+        Get the ANALYSIS_FLAGS an existing entry still holds, to remove them.
+        
+        Args:
+            image_filename (str): Filename of the question image
+            
+        Returns:
+            list: Keys to unset (empty if the entry is clean or doesn't exist)
+        """
+        entry = self._index.get(image_filename) or {}
+        return [key for key in self.ANALYSIS_FLAGS if key in entry]
+    
+    def _apply_change(self, image_filename, fields, unset=None):
+        """
+        Apply a change to the resident store, creating the entry if needed.
+        
+        Args:
+            image_filename (str): Filename of the question image
+            fields (dict): Fields to set
+            unset (list, optional): Fields to remove
+            
+        Returns:
+            dict: Journal record describing the change
+        """
+        entry = self._index.get(image_filename)
+        if entry is None:
+            entry = {'filename': image_filename}
+            self._add_entry(entry)
+        
+        entry.update(fields)
+        for key in unset or []:
+            entry.pop(key, None)
+        
+        return {'filename': image_filename, 'set': fields, 'unset': unset or []}
+    
+    def _replay_journal(self):
+        """
+        Re-apply journaled changes on top of the freshly loaded metadata file.
+        """
+        if not os.path.exists(self.journal_file):
+            return
+        
+        count = 0
+        with open(self.journal_file, 'r') as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn record (crash or failed append); appends start on a new line, so later records are intact
+                    logger.warning(f"Skipping unreadable metadata journal record at line {line_number}")
+                    continue
+                self._apply_change(record['filename'], record.get('set', {}), record.get('unset'))
+                count += 1
+        
+        if count:
+            logger.info(f"Replayed {count} metadata journal records")
+    
+    def _schedule_compaction(self):
+        """
+        Start a background timer that compacts the journal, unless one is pending.
+        """
+        if self._compaction_timer and self._compaction_timer.is_alive():
+            return
+        
+        self._compaction_timer = threading.Timer(self.compact_interval, self.compact)
+        self._compaction_timer.daemon = True
+        self._compaction_timer.start()
+    
+    def _ensure_loaded(self):
+        """
+        Load the metadata file into memory if it hasn't been loaded yet or has
+        changed on disk since the last load. Caller must hold the lock.
+        """
+        signature = self._file_signature()
+        if self._loaded and signature == self._signature:
+            return
+        
+        self._entries = self._load_from_disk()
+        self._rebuild_index()
+        self._replay_journal()
+        self._signature = signature
+        self._loaded = True
+    
+    def _load_from_disk(self):
+        """
+        Read the metadata file and parse the JSON.
+        
+        Returns:
+            list: List of metadata entries, or empty list if file doesn't exist
+        """
+        if not os.path.exists(self.metadata_file):
+            logger.warning(f"Metadata file not found: {self.metadata_file}")
+            return []
+        
+        try:
+            with open(self.metadata_file, 'r') as f:
+                return json.load(f)
+        except json.JSONDecodeError as e:
+            logger.error(f"Error parsing metadata file: {str(e)}")
+            return []
+    
+    def _file_signature(self):
+        """
+        Get the modification time and size of the metadata file and its journal.
+        
+        Returns:
+            tuple: (mtime_ns, size) of the metadata file and of the journal,
+                with None for a file that doesn't exist
+        """
+        signature = []
+        for path in (self.metadata_file, self.journal_file):
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+    
+    def _rebuild_index(self):
+        """
+        Rebuild the filename index from the resident entries.
+        """
+        self._index = {}
+        for entry in self._entries:
+            filename = entry.get('filename')
+            # Keep the first entry for a filename, matching the old linear scan
+            if filename and filename not in self._index:
+                self._index[filename] = entry
+    
+    def _add_entry(self, entry):
+        """
+        Append a new entry to the resident store and index it.
+        
+        Args:
+            entry (dict): Metadata entry with a filename
+        """
+        self._entries.append(entry)
+        self._index.setdefault(entry['filename'], entry)
@@ -0,0 +1,149 @@
+# modules/ocr_cache.py
+import os
+import json
+import hashlib
+import logging
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+class OCRCache:
+    """
+    Persistent, content-addressed store for OCR results.
+    Each result is saved as a small JSON file named after a hash of the image
+    bytes and the OCR settings that produced it, so renamed or copied images
+    still hit and changed settings never return stale text.
+    """
+
+    def __init__(self, cache_dir):
+        """
+        Initialize the OCR cache.
+
+        Args:
+            cache_dir (str): Directory where cached OCR results are stored
+        """
+        self.cache_dir = cache_dir
+        # Remember image hashes by (size, mtime) so unchanged files are not re-read
+        self._hash_memo = {}
+        self._lock = threading.Lock()
+
+        # Ensure cache directory exists
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+    def image_hash(self, image_path):
+        """
+        Get the SHA-256 hash of an image file's contents.
+
+        Args:
+            image_path (str): Full path to the image file
+
+        Returns:
+            str: Hex digest of the image contents
+        """
+        stat = os.stat(image_path)
+        signature = (stat.st_size, stat.st_mtime_ns)
+
+        with self._lock:
+            memo = self._hash_memo.get(image_path)
+        if memo and memo[0] == signature:
+            return memo[1]
+
+        sha = hashlib.sha256()
+        with open(image_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                sha.update(chunk)
+        digest = sha.hexdigest()
+
+        with self._lock:
+            self._hash_memo[image_path] = (signature, digest)
+        return digest
+
+    def make_key(self, image_path, settings):
+        """
+        Build the cache key for an image and a set of OCR settings.
+
+        Args:
+            image_path (str): Full path to the image file
+            settings (dict): OCR settings (psm, language, Tesseract version, ...)
+
+        Returns:
+            str: Cache key
+        """
+        settings_str = json.dumps(settings, sort_keys=True)
+        key_source = f"{self.image_hash(image_path)}|{settings_str}"
+        return hashlib.sha256(key_source.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """
+        Look up a cached OCR result.
+
+        Args:
+            key (str): Cache key from make_key()
+
+        Returns:
+            dict: Cached entry, or None if not cached
+        """
+        path = self._entry_path(key)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Ignoring unreadable OCR cache entry {path}: {str(e)}")
+            return None
+
+    def contains(self, key):
+        """
+        Check whether a result is cached without reading it.
+
+        Args:
+            key (str): Cache key from make_key()
+
+        Returns:
+            bool: True if an entry exists for the key
+        """
+        return os.path.exists(self._entry_path(key))
+
+    def put(self, key, entry):
+        """
+        Store an OCR result in the cache.
+
+        Args:
+            key (str): Cache key from make_key()
+            entry (dict): Data to store (e.g. text and settings)
+
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        path = self._entry_path(key)
+        entry_dir = os.path.dirname(path)
+
+        try:
+            if not os.path.exists(entry_dir):
+                os.makedirs(entry_dir, exist_ok=True)
+
+            # Write to a temp file and rename so readers never see partial entries
+            fd, tmp_path = tempfile.mkstemp(dir=entry_dir, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+            return True
+        except Exception as e:
+            logger.error(f"Failed to write OCR cache entry {path}: {str(e)}")
+            return False
+
+    def _entry_path(self, key):
+        """
+        Get the file path for a cache key, sharded by the first two hex digits.
+
+        Args:
+            key (str): Cache key
+
+        Returns:
+            str: Path of the cache entry file
+        """
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
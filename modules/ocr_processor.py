@@ -1,42 +1,96 @@
 # modules/ocr_processor.py
 import os
+import datetime
 import pytesseract
 from PIL import Image
 import logging
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+
+from modules.ocr_cache import OCRCache
+from modules.image_index import ImageIndex
 
 logger = logging.getLogger(__name__)
 
+def _run_tesseract(image_path, language, ocr_config, tesseract_cmd=None):
+    """
+    Run Tesseract on a single image.
+    
+    Kept at module level so it can be sent to worker processes.
+    
+    Args:
+        image_path (str): Full path to the image file
+        language (str): Tesseract language pack(s) to use
+        ocr_config (str): Extra Tesseract command-line options
+        tesseract_cmd (str, optional): Path to the Tesseract executable
+        
+    Returns:
+        str: Raw OCR output
+    """
+    if tesseract_cmd:
+        pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    
+    with Image.open(image_path) as img:
+        return pytesseract.image_to_string(img, lang=language, config=ocr_config)
+
 class OCRProcessor:
     """
     Handles OCR processing for question images.
     Extracts text from images using Tesseract OCR.
     """
     
-    def __init__(self, images_dir):
+    def __init__(self, images_dir, cache_dir=None, psm=6, language='eng', tesseract_cmd=None,
+                 max_workers=None, max_in_flight=None, index_poll_interval=2.0, index_watch=True):
         """
         Initialize OCR processor with the directory containing question images.
         
         Args:
             images_dir (str): Path to the directory containing question images
+            cache_dir (str, optional): Directory for cached OCR results.
+                If None, results are not cached.
+            psm (int): Tesseract page segmentation mode
+            language (str): Tesseract language pack(s) to use
+            tesseract_cmd (str, optional): Path to the Tesseract executable
+            max_workers (int, optional): Worker processes used by process_batch.
+                Defaults to the number of CPUs.
+            max_in_flight (int, optional): Maximum images queued in the worker pool
+                at once. Defaults to twice max_workers.
+            index_poll_interval (float): Minimum seconds between two scans of
+                the image folder when it isn't watched for events
+            index_watch (bool): Whether to watch the image folder for file
+                system events (requires watchdog)
         """
         self.images_dir = images_dir
+        self.psm = psm
+        self.language = language
+        self.cache = OCRCache(cache_dir) if cache_dir else None
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_in_flight = max_in_flight
+        self._tesseract_version = None
+        self.image_index = ImageIndex(images_dir, poll_interval=index_poll_interval, watch=index_watch)
+        
         # Configure Tesseract path if needed
-        # pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'  # Uncomment on Windows
+        if tesseract_cmd:
+            pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
     
     def get_image_list(self):
         """
         Get a list of all question images in the configured directory.
         
+        The list comes from the cached image index, which only re-reads the
+        folder when it changed (or once per poll interval without watchdog).
+        
         Returns:
-            list: List of filenames for question images
+            list: Sorted list of filenames for question images
         """
-        if not os.path.exists(self.images_dir):
-            logger.error(f"Image directory not found: {self.images_dir}")
-            return []
-        
-        # Only include PNG files that start with "question_"
-        return [f for f in os.listdir(self.images_dir) 
-                if f.startswith("question_") and f.lower().endswith('.png')]
+        # Only PNG files that start with "question_" are indexed
+        return self.image_index.get_images()
+    
+    def close(self):
+        """
+        Stop watching the image folder.
+        """
+        self.image_index.close()
     
     def process_image(self, image_filename, force_reprocess=False):
         """
@@ -55,62 +109,245 @@ class OCRProcessor:
                     'error': str (optional)
                 }
         """
-        image_path = os.path.join(self.images_dir, image_filename)
-        result = {
-            'filename': image_filename,
-            'text': '',
-            'success': False
-        }
-        
-        if not os.path.exists(image_path):
-            result['error'] = f"Image file not found: {image_path}"
-            logger.error(result['error'])
+        result, cache_key = self._prepare_result(image_filename, force_reprocess)
+        if result['success'] or 'error' in result:
             return result
         
         try:
-            # Open the image
-            img = Image.open(image_path)
-            
             # Perform OCR
-            ocr_config = r'--psm 6'  # Assume a single block of text
-            extracted_text = pytesseract.image_to_string(img, config=ocr_config)
-            
-            # Clean the text
-            cleaned_text = self._clean_text(extracted_text)
-            
-            result['text'] = cleaned_text
-            result['success'] = True
-            return result
+            image_path = os.path.join(self.images_dir, image_filename)
+            extracted_text = _run_tesseract(image_path, self.language, f'--psm {self.psm}')
+            return self._finish_result(result, cache_key, extracted_text)
             
         except Exception as e:
-            error_msg = f"OCR processing failed for {image_filename}: {str(e)}"
-            result['error'] = error_msg
-            logger.error(error_msg)
-            return result
+            return self._fail_result(result, e)
     
-    def process_batch(self, image_filenames=None, force_reprocess=False):
+    def process_batch(self, image_filenames=None, force_reprocess=False, max_workers=None, max_in_flight=None,
+                      progress_callback=None, cancel_event=None):
         """
-        Process a batch of images.
+        Process a batch of images, fanning uncached images out across a process pool.
         
         Args:
             image_filenames (list, optional): List of filenames to process.
                 If None, all images in the directory will be processed.
             force_reprocess (bool): Whether to force reprocessing even if results exist
+            max_workers (int, optional): Number of worker processes.
+                Defaults to the value given at construction time.
+            max_in_flight (int, optional): Maximum number of images submitted to
+                the pool at once. Defaults to twice the number of workers.
+            progress_callback (callable, optional): Called as callback(index, result)
+                as soon as each image's result is available
+            cancel_event (threading.Event, optional): When set, no further images
+                are started and the remaining ones are reported as cancelled
                 
         Returns:
-            list: List of dictionaries containing OCR results for each image
+            list: List of dictionaries containing OCR results for each image,
+                in the same order as image_filenames
         """
         if image_filenames is None:
             image_filenames = self.get_image_list()
         
-        results = []
-        for filename in image_filenames:
-            logger.info(f"Processing {filename}...")
-            result = self.process_image(filename, force_reprocess=force_reprocess)
-            results.append(result)
+        max_workers = max_workers or self.max_workers
+        max_in_flight = max_in_flight or self.max_in_flight or max_workers * 2
+        results = [None] * len(image_filenames)
+        
+        def complete(index, result):
+            results[index] = result
+            if progress_callback:
+                progress_callback(index, result)
+        
+        def cancelled():
+            return cancel_event is not None and cancel_event.is_set()
+        
+        # Resolve cache hits and missing files up front; only the rest need Tesseract
+        pending = []
+        for index, filename in enumerate(image_filenames):
+            result, cache_key = self._prepare_result(filename, force_reprocess)
+            if result['success'] or 'error' in result:
+                complete(index, result)
+            else:
+                pending.append((index, result, cache_key))
+        
+        logger.info(f"OCR batch: {len(image_filenames)} images, {len(pending)} need processing")
+        
+        ocr_config = f'--psm {self.psm}'
+        
+        if max_workers <= 1 or len(pending) <= 1:
+            for index, result, cache_key in pending:
+                if cancelled():
+                    break
+                logger.info(f"Processing {result['filename']}...")
+                try:
+                    image_path = os.path.join(self.images_dir, result['filename'])
+                    extracted_text = _run_tesseract(image_path, self.language, ocr_config)
+                    complete(index, self._finish_result(result, cache_key, extracted_text))
+                except Exception as e:
+                    complete(index, self._fail_result(result, e))
+        else:
+            tesseract_cmd = pytesseract.pytesseract.tesseract_cmd
+            queue = iter(pending)
+            in_flight = {}
+            
+            def submit_next(executor):
+                item = None if cancelled() else next(queue, None)
+                if item is not None:
+                    image_path = os.path.join(self.images_dir, item[1]['filename'])
+                    future = executor.submit(_run_tesseract, image_path, self.language, ocr_config, tesseract_cmd)
+                    in_flight[future] = item
+            
+            try:
+                with ProcessPoolExecutor(max_workers=min(max_workers, len(pending))) as executor:
+                    # Keep at most max_in_flight images queued in the pool
+                    for _ in range(max_in_flight):
+                        submit_next(executor)
+                    
+                    while in_flight:
+                        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            index, result, cache_key = in_flight.pop(future)
+                            try:
+                                complete(index, self._finish_result(result, cache_key, future.result()))
+                            except Exception as e:
+                                complete(index, self._fail_result(result, e))
+                            submit_next(executor)
+            except BrokenProcessPool as e:
+                logger.error(f"OCR worker pool failed: {str(e)}")
+                for index, result, cache_key in pending:
+                    if results[index] is None:
+                        complete(index, self._fail_result(result, e))
+        
+        # Anything left unprocessed was skipped because of cancellation
+        for index, result, cache_key in pending:
+            if results[index] is None:
+                result['error'] = 'OCR cancelled before this image was processed'
+                result['cancelled'] = True
+                complete(index, result)
         
         return results
     
+    def has_cached_result(self, image_filename):
+        """
+        Check whether an image already has an OCR result, without running OCR.
+        
+        Args:
+            image_filename (str): Filename of the image
+            
+        Returns:
+            bool: True if a cached result exists for the image's current contents
+        """
+        image_path = os.path.join(self.images_dir, image_filename)
+        if not self.cache or not os.path.exists(image_path):
+            return False
+        
+        try:
+            return self.cache.contains(self.cache.make_key(image_path, self._ocr_settings()))
+        except Exception as e:
+            logger.warning(f"Could not check OCR cache for {image_filename}: {str(e)}")
+            return False
+    
+    def _prepare_result(self, image_filename, force_reprocess=False):
+        """
+        Build the result skeleton for an image and fill it from the cache if possible.
+        
+        Args:
+            image_filename (str): Filename of the image to process
+            force_reprocess (bool): Whether to ignore any cached result
+            
+        Returns:
+            tuple: (result, cache_key). The result is already final if it has
+                'success' set or contains an 'error'; otherwise OCR is still needed.
+        """
+        image_path = os.path.join(self.images_dir, image_filename)
+        result = {
+            'filename': image_filename,
+            'text': '',
+            'success': False
+        }
+        
+        if not os.path.exists(image_path):
+            result['error'] = f"Image file not found: {image_path}"
+            logger.error(result['error'])
+            return result, None
+        
+        if not self.cache:
+            return result, None
+        
+        try:
+            # Return the cached result unless a fresh OCR pass was requested
+            cache_key = self.cache.make_key(image_path, self._ocr_settings())
+            if not force_reprocess:
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    result['text'] = cached['text']
+                    result['success'] = True
+                    result['cached'] = True
+            return result, cache_key
+        except Exception as e:
+            return self._fail_result(result, e), None
+    
+    def _finish_result(self, result, cache_key, extracted_text):
+        """
+        Clean raw Tesseract output into the result and store it in the cache.
+        
+        Args:
+            result (dict): Result skeleton from _prepare_result()
+            cache_key (str): Cache key for the image, or None if caching is disabled
+            extracted_text (str): Raw OCR output
+            
+        Returns:
+            dict: Completed result
+        """
+        # Clean the text
+        cleaned_text = self._clean_text(extracted_text)
+        
+        result['text'] = cleaned_text
+        result['success'] = True
+        
+        if self.cache and cache_key:
+            self.cache.put(cache_key, {
+                'filename': result['filename'],
+                'text': cleaned_text,
+                'settings': self._ocr_settings(),
+                'processed_at': datetime.datetime.now().isoformat()
+            })
+        return result
+    
+    def _fail_result(self, result, error):
+        """
+        Record an OCR failure in the result.
+        
+        Args:
+            result (dict): Result skeleton from _prepare_result()
+            error (Exception): The error that occurred
+            
+        Returns:
+            dict: Failed result
+        """
+        error_msg = f"OCR processing failed for {result['filename']}: {str(error)}"
+        result['error'] = error_msg
+        logger.error(error_msg)
+        return result
+    
+    def _ocr_settings(self):
+        """
+        Get the OCR settings that determine the output for a given image.
+        
+        Returns:
+            dict: Settings used as part of the cache key
+        """
+        if self._tesseract_version is None:
+            try:
+                self._tesseract_version = str(pytesseract.get_tesseract_version())
+            except Exception as e:
+                logger.warning(f"Could not determine Tesseract version: {str(e)}")
+                self._tesseract_version = 'unknown'
+        
+        return {
+            'psm': self.psm,
+            'language': self.language,
+            'tesseract_version': self._tesseract_version
+        }
+    
     def _clean_text(self, text):
         """
         Clean and normalize OCR-extracted text.
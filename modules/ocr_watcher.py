@@ -0,0 +1,186 @@
+# modules/ocr_watcher.py
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+class OCRWatcher:
+    """
+    Watches the question folder and runs OCR on new or changed images in the
+    background, so results are already in the OCR cache when someone opens
+    them.
+
+    Changes come from the OCRProcessor's image index. An image is only queued
+    once it has stopped changing for the debounce period, so files that are
+    still being written aren't read half-finished. Queued images are processed
+    as background jobs, one job at a time and with a limited number of OCR
+    worker processes, so watching never competes with interactive OCR for
+    every CPU.
+    """
+
+    def __init__(self, ocr_processor, job_manager, debounce=2.0, max_workers=2, batch_size=50):
+        """
+        Initialize the watcher (it doesn't start until start() is called).
+
+        Args:
+            ocr_processor (OCRProcessor): Processor whose folder is watched
+            job_manager (JobManager): Runs the OCR jobs
+            debounce (float): Seconds an image must stay unchanged before it is queued
+            max_workers (int): OCR worker processes used by each watch job
+            batch_size (int): Maximum number of images per watch job
+        """
+        self.ocr_processor = ocr_processor
+        self.job_manager = job_manager
+        self.debounce = debounce
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+
+        self._lock = threading.Lock()
+        self._changed = {}  # filename -> monotonic time of its last change
+        self._job = None
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._queued_total = 0
+        self._listening = False
+
+    @property
+    def running(self):
+        """
+        Check whether the watcher is running.
+
+        Returns:
+            bool: True if the watch thread is alive
+        """
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """
+        Start watching. Images already in the folder are not queued; only
+        images added or changed from now on are.
+
+        Returns:
+            bool: True if the watcher was started, False if it was already running
+        """
+        with self._lock:
+            if self.running:
+                return False
+
+            # Take the current folder contents as the baseline before listening for changes
+            self.ocr_processor.image_index.get_images()
+            if not self._listening:
+                self.ocr_processor.image_index.add_listener(self._on_change)
+                self._listening = True
+
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name='ocr-watcher', daemon=True)
+            self._thread.start()
+
+        logger.info(f"OCR watcher started for {self.ocr_processor.images_dir}")
+        return True
+
+    def stop(self):
+        """
+        Stop watching. A watch job that is already running finishes its
+        current images; images still waiting for their debounce are dropped.
+
+        Returns:
+            bool: True if the watcher was running
+        """
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return False
+
+        self._stop_event.set()
+        thread.join(timeout=5)
+        with self._lock:
+            self._changed.clear()
+            if self._job is not None:
+                self._job.cancel_event.set()
+
+        logger.info("OCR watcher stopped")
+        return True
+
+    def status(self):
+        """
+        Get the watcher state.
+
+        Returns:
+            dict: Running flag, settings, waiting image count and the current job ID
+        """
+        with self._lock:
+            job = self._job
+            return {
+                'running': self.running,
+                'debounce': self.debounce,
+                'max_workers': self.max_workers,
+                'batch_size': self.batch_size,
+                'waiting': len(self._changed),
+                'queued_total': self._queued_total,
+                'job_id': job.id if job is not None and job.status not in self.job_manager.FINISHED_STATUSES else None
+            }
+
+    def _on_change(self, added, modified, removed):
+        """
+        Image index listener: remember changed images and forget removed ones.
+
+        Args:
+            added (list): New image filenames
+            modified (list): Changed image filenames
+            removed (list): Deleted image filenames
+        """
+        if not self.running:
+            return
+
+        now = time.monotonic()
+        with self._lock:
+            # A new change restarts the image's debounce period
+            for filename in added + modified:
+                self._changed[filename] = now
+            for filename in removed:
+                self._changed.pop(filename, None)
+
+    def _run(self):
+        """
+        Watch loop: refresh the image index and queue settled images.
+        """
+        # Checking a few times per debounce period keeps the added latency small
+        interval = max(0.5, min(self.debounce / 2, self.ocr_processor.image_index.poll_interval))
+
+        while not self._stop_event.wait(interval):
+            try:
+                self.ocr_processor.image_index.refresh()
+                self._submit_ready()
+            except Exception as e:
+                logger.error(f"OCR watcher error: {str(e)}")
+
+    def _submit_ready(self):
+        """
+        Start a watch job for images whose debounce period has passed, unless
+        the previous watch job is still running.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self._job is not None and self._job.status not in self.job_manager.FINISHED_STATUSES:
+                return
+
+            ready = sorted(filename for filename, changed in self._changed.items()
+                           if now - changed >= self.debounce)[:self.batch_size]
+            if not ready:
+                return
+            for filename in ready:
+                del self._changed[filename]
+            self._queued_total += len(ready)
+
+            # Results land in the OCR cache; changed images hash differently, so no forced reprocessing is needed
+            def run_watch_job(job):
+                self.ocr_processor.process_batch(
+                    ready,
+                    max_workers=self.max_workers,
+                    progress_callback=lambda index, result: job.add_result(result),
+                    cancel_event=job.cancel_event
+                )
+                return {'processed': job.processed, 'failed': job.failed}
+
+            self._job = self.job_manager.submit('ocr_watch', len(ready), run_watch_job)
+            logger.info(f"OCR watcher queued {len(ready)} images")
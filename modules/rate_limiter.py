@@ -0,0 +1,178 @@
+# modules/rate_limiter.py
+import time
+import random
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+class RateLimiter:
+    """
+    Client-side rate limiter for LLM API calls, shared by all threads.
+    Enforces a requests-per-minute and a tokens-per-minute budget with two
+    token buckets, pauses all callers when the provider asks us to back off,
+    and computes jittered exponential backoff delays for retries.
+    """
+
+    def __init__(self, requests_per_minute=50, tokens_per_minute=50000, max_retries=4,
+                 backoff_base=1.0, backoff_max=60.0):
+        """
+        Initialize the rate limiter.
+
+        Args:
+            requests_per_minute (int): Request budget per minute (0 disables the limit)
+            tokens_per_minute (int): Token budget per minute (0 disables the limit)
+            max_retries (int): Retries allowed for a throttled or failed call
+            backoff_base (float): Delay in seconds before the first retry
+            backoff_max (float): Upper bound on any single retry delay
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._lock = threading.Lock()
+        self._request_allowance = float(requests_per_minute)
+        self._token_allowance = float(tokens_per_minute)
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+
+        # Counters reported by state()
+        self._waiting = 0
+        self._total_wait = 0.0
+        self._throttled_count = 0
+        self._retry_count = 0
+        self._last_throttle_at = None
+
+    def acquire(self, tokens):
+        """
+        Block until a request using the given number of tokens fits in the budget.
+
+        Args:
+            tokens (int): Estimated tokens (input plus maximum output) for the request
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        # A single request larger than the whole budget still has to go through
+        if self.tokens_per_minute:
+            tokens = min(tokens, self.tokens_per_minute)
+
+        waited = 0.0
+        with self._lock:
+            self._waiting += 1
+        try:
+            while True:
+                with self._lock:
+                    now = time.monotonic()
+                    self._refill(now)
+
+                    wait = max(0.0, self._paused_until - now)
+                    if self.requests_per_minute and self._request_allowance < 1:
+                        wait = max(wait, (1 - self._request_allowance) * 60.0 / self.requests_per_minute)
+                    if self.tokens_per_minute and self._token_allowance < tokens:
+                        wait = max(wait, (tokens - self._token_allowance) * 60.0 / self.tokens_per_minute)
+
+                    if wait <= 0:
+                        if self.requests_per_minute:
+                            self._request_allowance -= 1
+                        if self.tokens_per_minute:
+                            self._token_allowance -= tokens
+                        self._total_wait += waited
+                        return waited
+
+                time.sleep(wait)
+                waited += wait
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+    def record_usage(self, estimated_tokens, actual_tokens):
+        """
+        Correct the token budget once the real usage of a request is known.
+
+        Args:
+            estimated_tokens (int): Tokens reserved by acquire()
+            actual_tokens (int): Tokens the provider reported for the request
+        """
+        if not self.tokens_per_minute:
+            return
+
+        with self._lock:
+            self._token_allowance = min(float(self.tokens_per_minute),
+                                        self._token_allowance + estimated_tokens - actual_tokens)
+
+    def record_throttle(self, retry_after=None):
+        """
+        Record that the provider throttled us, pausing all callers if it said how long to wait.
+
+        Args:
+            retry_after (float, optional): Seconds from the provider's retry-after header
+        """
+        with self._lock:
+            self._throttled_count += 1
+            self._last_throttle_at = time.time()
+            if retry_after:
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+                logger.warning(f"LLM provider asked us to back off for {retry_after:.1f}s")
+
+    def backoff_delay(self, attempt, retry_after=None):
+        """
+        Get the delay before retrying a failed call.
+
+        Args:
+            attempt (int): Zero-based number of the attempt that failed
+            retry_after (float, optional): Seconds from the provider's retry-after header
+
+        Returns:
+            float: Seconds to wait before the next attempt
+        """
+        with self._lock:
+            self._retry_count += 1
+
+        if retry_after:
+            return min(float(retry_after), self.backoff_max)
+
+        # Exponential backoff with jitter so concurrent callers don't retry in lockstep
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def state(self):
+        """
+        Get the current throttle state.
+
+        Returns:
+            dict: Remaining budgets, pause time and throttling counters
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            return {
+                'requests_per_minute': self.requests_per_minute,
+                'tokens_per_minute': self.tokens_per_minute,
+                'requests_available': round(self._request_allowance, 2) if self.requests_per_minute else None,
+                'tokens_available': int(self._token_allowance) if self.tokens_per_minute else None,
+                'paused_for': round(max(0.0, self._paused_until - now), 2),
+                'waiting_callers': self._waiting,
+                'total_wait_seconds': round(self._total_wait, 2),
+                'throttled_count': self._throttled_count,
+                'retry_count': self._retry_count,
+                'last_throttle_at': self._last_throttle_at
+            }
+
+    def _refill(self, now):
+        """
+        Refill both buckets for the time elapsed since the last refill. Caller holds the lock.
+
+        Args:
+            now (float): Current time.monotonic() value
+        """
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        if self.requests_per_minute:
+            self._request_allowance = min(float(self.requests_per_minute),
+                                          self._request_allowance + elapsed * self.requests_per_minute / 60.0)
+        if self.tokens_per_minute:
+            self._token_allowance = min(float(self.tokens_per_minute),
+                                        self._token_allowance + elapsed * self.tokens_per_minute / 60.0)
@@ -0,0 +1,278 @@
+# modules/syllabus_registry.py
+import os
+import re
+import json
+import math
+import logging
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+# Common words that carry no information about which chapter a question belongs to
+STOP_WORDS = frozenset('''
+    the and for are was were with that this from which what when where into onto than then
+    them they their there these those its has have had not but can may will would should
+    could does did each per all any some such very also only show find state give given
+    calculate determine explain describe value values answer question following shown below
+'''.split())
+
+class SyllabusRegistry:
+    """
+    Registry of subject syllabi used to build LLM prompts.
+
+    Each syllabus is serialized once, when it is registered, into a compact
+    canonical JSON fragment, together with the subject instruction that goes
+    into the prompt. Subject names and aliases are resolved with a single
+    dictionary lookup.
+
+    Structured syllabi (a list of chapter objects) also get a TF-IDF index
+    over their chapters, so a prompt can include only the chapters that are
+    most similar to the question text instead of the whole syllabus.
+    """
+
+    def __init__(self):
+        """
+        Initialize an empty registry.
+        """
+        self._subjects = {}
+        self._aliases = {}
+
+    def register(self, name, display_name, syllabus, aliases=None):
+        """
+        Add (or replace) a subject syllabus.
+
+        Args:
+            name (str): Canonical subject name, e.g. 'physics'
+            display_name (str): Name used in the prompt, e.g. 'Physics'
+            syllabus (str or dict): Syllabus as a topic list string or a
+                structured dictionary (e.g. {"Sections": [...]})
+            aliases (list, optional): Other names the subject may appear under
+
+        Returns:
+            dict: The registered subject entry
+        """
+        name = name.strip().lower()
+        fragment = syllabus if isinstance(syllabus, str) else self.serialize(syllabus)
+
+        entry = {
+            'name': name,
+            'display_name': display_name,
+            'syllabus': syllabus,
+            'fragment': fragment,
+            'instruction': self.build_instruction(display_name, fragment)
+        }
+        entry.update(self._build_chapter_index(syllabus))
+        self._subjects[name] = entry
+
+        for alias in [name, display_name] + list(aliases or []):
+            self._aliases[alias.strip().lower()] = name
+
+        return entry
+
+    @staticmethod
+    def serialize(syllabus):
+        """
+        Serialize a structured syllabus into compact canonical JSON.
+
+        Args:
+            syllabus (dict or list): Structured syllabus
+
+        Returns:
+            str: JSON without insignificant whitespace
+        """
+        return json.dumps(syllabus, separators=(',', ':'), ensure_ascii=False)
+
+    @staticmethod
+    def build_instruction(display_name, fragment):
+        """
+        Build the subject instruction for a syllabus fragment.
+
+        Args:
+            display_name (str): Subject name used in the prompt
+            fragment (str): Serialized syllabus
+
+        Returns:
+            str: Subject instruction for the prompt
+        """
+        article = 'an' if display_name[:1].lower() in 'aeiou' else 'a'
+        return (f"This is {article} {display_name} question. Find and update 'chapter' and 'topic' "
+                f"with the correct values from this syllabus json: {fragment}.")
+
+    @staticmethod
+    def tokenize(text):
+        """
+        Split text into lowercase terms for similarity scoring.
+
+        Args:
+            text (str): Text to tokenize
+
+        Returns:
+            list: List of terms, with stop words and short words removed
+        """
+        terms = []
+        for word in re.findall(r'[a-z]+', (text or '').lower()):
+            if len(word) < 3 or word in STOP_WORDS:
+                continue
+            # Crude plural folding so 'forces' matches 'force'
+            if len(word) > 4 and word.endswith('s') and not word.endswith('ss'):
+                word = word[:-1]
+            terms.append(word)
+        return terms
+
+    def select_chapters(self, entry, text, top_k):
+        """
+        Build a subject instruction holding only the top-k chapters most
+        similar to the question text.
+
+        Args:
+            entry (dict): Subject entry from resolve()
+            text (str): Question text (OCR output)
+            top_k (int): Number of chapters to keep
+
+        Returns:
+            tuple: (instruction, stats) where stats describes the trimming, or
+                (full instruction, None) if the syllabus can't be trimmed
+        """
+        chapters = entry.get('chapters')
+        if not chapters or top_k <= 0 or top_k >= len(chapters):
+            return entry['instruction'], None
+
+        # Weight the question terms by the IDF of the syllabus vocabulary
+        idf = entry['idf']
+        query = {term: count * idf[term] for term, count in Counter(self.tokenize(text)).items() if term in idf}
+        if not query:
+            # Nothing in the question matches the syllabus; keep it whole rather than guess
+            return entry['instruction'], None
+
+        query_norm = math.sqrt(sum(weight * weight for weight in query.values()))
+        scores = []
+        for position, vector in enumerate(entry['chapter_vectors']):
+            dot = sum(weight * vector.get(term, 0.0) for term, weight in query.items())
+            scores.append((dot / query_norm, position))
+
+        best = sorted(scores, key=lambda score: (-score[0], score[1]))[:top_k]
+        if best[0][0] <= 0:
+            return entry['instruction'], None
+
+        # Keep the syllabus order so the trimmed fragment reads like the original
+        kept = sorted(position for _, position in best)
+        selected = [chapters[position] for position in kept]
+        container = entry['chapter_container']
+        trimmed = {container: selected} if container else selected
+        instruction = self.build_instruction(entry['display_name'], self.serialize(trimmed))
+
+        stats = {
+            'subject': entry['name'],
+            'chapters_total': len(chapters),
+            'chapters_kept': [chapter.get('Chapter') for chapter in selected],
+            'full_chars': len(entry['instruction']),
+            'trimmed_chars': len(instruction)
+        }
+        return instruction, stats
+
+    def resolve(self, subject):
+        """
+        Find the syllabus entry for a subject name or alias.
+
+        Args:
+            subject (str): Subject as it appears in the metadata
+
+        Returns:
+            dict: Subject entry, or None if the subject isn't registered
+        """
+        if not subject:
+            return None
+        name = self._aliases.get(subject.strip().lower())
+        return self._subjects.get(name) if name else None
+
+    def subjects(self):
+        """
+        Get the canonical names of all registered subjects.
+
+        Returns:
+            list: List of subject names
+        """
+        return list(self._subjects)
+
+    def _build_chapter_index(self, syllabus):
+        """
+        Build the TF-IDF chapter index for a structured syllabus.
+
+        Args:
+            syllabus (str, dict or list): Syllabus as passed to register()
+
+        Returns:
+            dict: 'chapters', 'chapter_container', 'chapter_vectors' and 'idf',
+                or an empty dict if the syllabus isn't a list of chapters
+        """
+        # Accept either a bare list of chapters or {"Sections": [...]}
+        container = None
+        chapters = syllabus
+        if isinstance(syllabus, dict) and len(syllabus) == 1:
+            container, chapters = next(iter(syllabus.items()))
+        if not isinstance(chapters, list) or not chapters or not all(isinstance(c, dict) for c in chapters):
+            return {}
+
+        documents = []
+        for chapter in chapters:
+            parts = []
+            for value in chapter.values():
+                parts.extend(value if isinstance(value, list) else [value])
+            documents.append(Counter(self.tokenize(' '.join(str(part) for part in parts))))
+
+        document_frequency = Counter()
+        for document in documents:
+            document_frequency.update(document.keys())
+        idf = {term: math.log((1 + len(documents)) / (1 + df)) + 1 for term, df in document_frequency.items()}
+
+        vectors = []
+        for document in documents:
+            vector = {term: count * idf[term] for term, count in document.items()}
+            norm = math.sqrt(sum(weight * weight for weight in vector.values())) or 1.0
+            vectors.append({term: weight / norm for term, weight in vector.items()})
+
+        return {
+            'chapters': chapters,
+            'chapter_container': container,
+            'chapter_vectors': vectors,
+            'idf': idf
+        }
+
+    def load_directory(self, directory):
+        """
+        Register every syllabus file (*.json) in a directory. Each file holds
+        {"subject": ..., "display_name": ..., "aliases": [...], "syllabus": ...}
+        and replaces any built-in syllabus for the same subject.
+
+        Args:
+            directory (str): Directory containing syllabus files
+
+        Returns:
+            int: Number of syllabi loaded
+        """
+        if not os.path.isdir(directory):
+            logger.warning(f"Syllabus directory not found: {directory}")
+            return 0
+
+        loaded = 0
+        for filename in sorted(os.listdir(directory)):
+            if not filename.lower().endswith('.json'):
+                continue
+
+            path = os.path.join(directory, filename)
+            try:
+                with open(path, 'r') as f:
+                    data = json.load(f)
+                name = data['subject']
+                self.register(
+                    name,
+                    data.get('display_name', name.title()),
+                    data['syllabus'],
+                    aliases=data.get('aliases')
+                )
+                loaded += 1
+            except (OSError, ValueError, KeyError) as e:
+                logger.error(f"Failed to load syllabus file {path}: {str(e)}")
+
+        logger.info(f"Loaded {loaded} syllabi from {directory}")
+        return loaded
@@ -1,23 +1,18 @@
 // static/js/dashboard.js
 
 document.addEventListener('DOMContentLoaded', function() {
-    // Initial state checking - update buttons and status badges based on backend data
-    checkProcessingStatus();
-    
     // Toggle select all questions
     const selectAllToggle = document.getElementById('toggleSelectAll');
     const questionCheckboxes = document.querySelectorAll('.question-select');
     const processSelectedBtn = document.getElementById('processSelectedBtn');
     
-    if (selectAllToggle) {
-        selectAllToggle.addEventListener('change', function() {
-            const isChecked = this.checked;
-            questionCheckboxes.forEach(checkbox => {
-                checkbox.checked = isChecked;
-            });
-            updateSelectedButton();
+    selectAllToggle.addEventListener('change', function() {
+        const isChecked = this.checked;
+        questionCheckboxes.forEach(checkbox => {
+            checkbox.checked = isChecked;
         });
-    }
+        updateSelectedButton();
+    });
     
     questionCheckboxes.forEach(checkbox => {
         checkbox.addEventListener('change', updateSelectedButton);
@@ -44,51 +39,88 @@ document.addEventListener('DOMContentLoaded', function() {
     
     // Process all questions
     const processAllBtn = document.getElementById('processAllBtn');
-    if (processAllBtn) {
-        processAllBtn.addEventListener('click', function() {
-            const allFilenames = Array.from(document.querySelectorAll('tr[data-filename]'))
-                .map(row => row.getAttribute('data-filename'));
-            processBatch(allFilenames);
-        });
-    }
+    processAllBtn.addEventListener('click', function() {
+        const allFilenames = Array.from(document.querySelectorAll('tr[data-filename]'))
+            .map(row => row.getAttribute('data-filename'));
+        processBatch(allFilenames);
+    });
     
     // Process selected questions
-    if (processSelectedBtn) {
-        processSelectedBtn.addEventListener('click', function() {
-            const selectedFilenames = Array.from(document.querySelectorAll('.question-select:checked'))
-                .map(checkbox => checkbox.value);
-            processBatch(selectedFilenames);
+    processSelectedBtn.addEventListener('click', function() {
+        const selectedFilenames = Array.from(document.querySelectorAll('.question-select:checked'))
+            .map(checkbox => checkbox.value);
+        processBatch(selectedFilenames);
+    });
+    
+    // Mark as completed buttons
+    document.querySelectorAll('.mark-complete-btn').forEach(button => {
+        button.addEventListener('click', function() {
+            const filename = this.getAttribute('data-filename');
+            markReviewCompleted(filename, true);
+        });
+    });
+    
+    // Return to queue buttons
+    document.querySelectorAll('.unmark-complete-btn').forEach(button => {
+        button.addEventListener('click', function() {
+            const filename = this.getAttribute('data-filename');
+            markReviewCompleted(filename, false);
+        });
+    });
+    
+    // Function to mark review as completed or return to queue
+    function markReviewCompleted(filename, completed) {
+        fetch(`/review/toggle/${filename}`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({ completed: completed })
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                // Reload the page to update the lists
+                window.location.reload();
+            } else {
+                alert('Failed to update review status');
+            }
+        })
+        .catch(error => {
+            console.error('Error updating review status:', error);
+            alert('Network error while updating review status');
         });
     }
     
-    // Check the processing status of all questions
-    function checkProcessingStatus() {
-        // Get all questions that have already been processed
-        fetch('/images')
+    // Load processing status and completion dates for all items in one request
+    function loadImageStatus() {
+        fetch('/images/status')
             .then(response => response.json())
-            .then(images => {
-                images.forEach(filename => {
-                    fetch(`/ocr/result/${filename}`)
-                        .then(response => response.json())
-                        .then(data => {
-                            if (data.ocr_result.success) {
-                                updateQuestionStatus(filename, 'processed');
-                                enableReviewButton(filename);
-                            }
-                        })
-                        .catch(error => {
-                            console.log(`Image ${filename} not yet processed`);
-                        });
+            .then(data => {
+                data.images.forEach(image => {
+                    if (image.processed) {
+                        updateQuestionStatus(image.filename, 'processed');
+                        enableReviewButton(image.filename);
+                    }
+                    
+                    if (image.review_completed_at) {
+                        const dateSpan = document.querySelector(`tr[data-filename="${image.filename}"] .completed-date`);
+                        if (!dateSpan) return;
+                        
+                        // Format the date nicely
+                        const completedDate = new Date(image.review_completed_at);
+                        dateSpan.textContent = completedDate.toLocaleDateString() + ' ' + 
+                                              completedDate.toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' });
+                    }
                 });
-                
-                updateStatistics();
             })
             .catch(error => {
-                console.error('Error loading images:', error);
+                console.error('Error loading image status:', error);
             });
     }
     
-    // Process a single question with OCR
+    loadImageStatus();
+    
     function processQuestion(filename) {
         updateQuestionStatus(filename, 'processing');
         
@@ -109,7 +141,7 @@ document.addEventListener('DOMContentLoaded', function() {
             });
     }
     
-    // Process a batch of questions
+    // Process a batch of questions as a background job and poll for progress
     function processBatch(filenames) {
         if (filenames.length === 0) return;
         
@@ -121,7 +153,7 @@ document.addEventListener('DOMContentLoaded', function() {
         progressBar.style.width = '0%';
         batchStatus.textContent = `Processing 0/${filenames.length} questions...`;
         
-        let processed = 0;
+        filenames.forEach(filename => updateQuestionStatus(filename, 'processing'));
         
         fetch('/ocr/process', {
             method: 'POST',
@@ -133,23 +165,7 @@ document.addEventListener('DOMContentLoaded', function() {
         .then(response => response.json())
         .then(data => {
             if (data.success) {
-                data.results.forEach(result => {
-                    if (result.success) {
-                        updateQuestionStatus(result.filename, 'processed');
-                        enableReviewButton(result.filename);
-                    } else {
-                        updateQuestionStatus(result.filename, 'error', result.error);
-                    }
-                });
-                
-                batchStatus.textContent = `Processed ${data.processed} questions.`;
-                progressBar.style.width = '100%';
-                
-                setTimeout(() => {
-                    batchProgress.classList.add('d-none');
-                }, 3000);
-                
-                updateStatistics();
+                pollBatchJob(data.job_id, 0);
             } else {
                 batchStatus.textContent = 'Error processing batch: ' + data.error;
             }
@@ -158,14 +174,62 @@ document.addEventListener('DOMContentLoaded', function() {
             console.error('Error processing batch:', error);
             batchStatus.textContent = 'Network error processing batch.';
         });
+        
+        function pollBatchJob(jobId, offset) {
+            fetch(`/jobs/${jobId}?offset=${offset}`)
+                .then(response => response.json())
+                .then(job => {
+                    if (!job.success) {
+                        batchStatus.textContent = 'Error processing batch: ' + job.error;
+                        return;
+                    }
+                    
+                    // Only results we have not seen yet are returned
+                    job.results.forEach(result => {
+                        if (result.success) {
+                            updateQuestionStatus(result.filename, 'processed');
+                            enableReviewButton(result.filename);
+                        } else {
+                            updateQuestionStatus(result.filename, 'error', result.error);
+                        }
+                    });
+                    
+                    progressBar.style.width = `${Math.round(job.progress * 100)}%`;
+                    batchStatus.textContent = `Processing ${job.processed}/${job.total} questions...`;
+                    updateStatistics();
+                    
+                    if (job.status === 'queued' || job.status === 'running') {
+                        setTimeout(() => pollBatchJob(jobId, job.next_offset), 1000);
+                        return;
+                    }
+                    
+                    if (job.status === 'failed') {
+                        batchStatus.textContent = 'Error processing batch: ' + job.error;
+                        return;
+                    }
+                    
+                    batchStatus.textContent = job.status === 'cancelled' ?
+                        `Batch cancelled after ${job.processed} questions.` :
+                        `Processed ${job.processed} questions.`;
+                    progressBar.style.width = '100%';
+                    
+                    setTimeout(() => {
+                        batchProgress.classList.add('d-none');
+                    }, 3000);
+                })
+                .catch(error => {
+                    console.error('Error checking batch progress:', error);
+                    batchStatus.textContent = 'Network error checking batch progress.';
+                });
+        }
     }
     
-    // Update the display status of a question
     function updateQuestionStatus(filename, status, errorMsg = null) {
         const row = document.querySelector(`tr[data-filename="${filename}"]`);
         if (!row) return;
         
         const statusBadge = row.querySelector('.status-badge');
+        if (!statusBadge) return;
         
         statusBadge.classList.remove('bg-secondary', 'bg-warning', 'bg-success', 'bg-danger');
         
@@ -189,7 +253,6 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
     
-    // Enable the review button for a processed question
     function enableReviewButton(filename) {
         const row = document.querySelector(`tr[data-filename="${filename}"]`);
         if (!row) return;
@@ -197,22 +260,48 @@ document.addEventListener('DOMContentLoaded', function() {
         const processBtn = row.querySelector('.process-btn');
         const reviewBtn = row.querySelector('.review-btn');
         
-        processBtn.classList.add('btn-outline-secondary');
-        processBtn.classList.remove('btn-outline-primary');
-        reviewBtn.style.display = 'inline-block';
+        if (processBtn && reviewBtn) {
+            processBtn.classList.add('btn-outline-secondary');
+            processBtn.classList.remove('btn-outline-primary');
+            reviewBtn.style.display = 'inline-block';
+        }
     }
     
-    // Update statistics display
     function updateStatistics() {
-        const totalQuestions = document.querySelectorAll('tr[data-filename]').length;
-        const processedQuestions = document.querySelectorAll('.status-badge.bg-success').length;
-        const pendingQuestions = totalQuestions - processedQuestions;
+        // Count all questions from both tables
+        const pendingRows = document.querySelectorAll('#pending-questions-table tr[data-filename]').length;
+        const completedRows = document.querySelectorAll('#completed-questions-table tr[data-filename]').length;
+        const totalQuestions = pendingRows + completedRows;
         
         document.getElementById('totalQuestions').textContent = totalQuestions;
-        document.getElementById('processedQuestions').textContent = processedQuestions;
-        document.getElementById('pendingQuestions').textContent = pendingQuestions;
+        document.getElementById('pendingQuestions').textContent = pendingRows;
+        document.getElementById('completedQuestions').textContent = completedRows;
     }
     
     // Initialize statistics
     updateStatistics();
+    
+    // Image modal functionality
+    const imageModal = new bootstrap.Modal(document.getElementById('imageModal'));
+    const modalImage = document.getElementById('modalImage');
+    const modalFilename = document.getElementById('modalFilename');
+    const modalReviewLink = document.getElementById('modalReviewLink');
+    const modalMetadataLink = document.getElementById('modalMetadataLink');
+    
+    // Add click event to all question image previews
+    document.querySelectorAll('.question-image-preview').forEach(img => {
+        img.addEventListener('click', function() {
+            const filename = this.getAttribute('data-filename');
+            const imageSrc = `/images/${filename}`;
+            
+            // Set modal content
+            modalImage.src = imageSrc;
+            modalFilename.textContent = filename;
+            modalReviewLink.href = `/ocr/review/${filename}`;
+            modalMetadataLink.href = `/metadata/view/${filename}`;
+            
+            // Show modal
+            imageModal.show();
+        });
+    });
 });
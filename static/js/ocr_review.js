@@ -81,7 +81,7 @@ document.addEventListener('DOMContentLoaded', function() {
         
         const method = forceReprocess ? 'POST' : 'GET';
         const body = forceReprocess ? 
-            JSON.stringify({ filenames: [filename] }) : 
+            JSON.stringify({ filenames: [filename], force_reprocess: true, wait: true }) : 
             null;
         
         fetch(apiUrl, {
@@ -258,27 +258,11 @@ document.addEventListener('DOMContentLoaded', function() {
             payload.custom_prompt = customPrompt;
         }
         
-        // Call the LLM analysis API
-        fetch('/llm/analyze', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify(payload)
-        })
-        .then(response => response.json())
+        // Call the LLM analysis API; fields fill in while the response streams
+        streamAnalysis(payload)
         .then(data => {
-            if (data.success) {
-                enhancedMetadata = data.metadata;
-                displayMetadataPreview(enhancedMetadata);
-            } else {
-                let errorMessage = data.error || 'Unknown error during LLM analysis';
-                console.error('LLM Analysis Error:', errorMessage);
-                if (data.metadata && data.metadata.detailed_error) {
-                    console.error('Detailed error:', data.metadata.detailed_error);
-                }
-                throw new Error(errorMessage);
-            }
+            enhancedMetadata = data.metadata;
+            displayMetadataPreview(enhancedMetadata);
         })
         .catch(error => {
             console.error('Error during LLM analysis:', error);
@@ -296,6 +280,82 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
     
+    // Stream the LLM analysis as server-sent events so fields appear as they arrive
+    function streamAnalysis(payload) {
+        return fetch('/llm/analyze/stream', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify(payload)
+        })
+        .then(response => {
+            if (!response.ok || !response.body) {
+                return response.json().then(data => {
+                    throw new Error(data.error || 'Unknown error during LLM analysis');
+                });
+            }
+            
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            const partialMetadata = {};
+            let buffer = '';
+            let result = null;
+            
+            function handleEvent(block) {
+                let eventType = 'message';
+                let data = '';
+                block.split('\n').forEach(line => {
+                    if (line.startsWith('event:')) {
+                        eventType = line.slice(6).trim();
+                    } else if (line.startsWith('data:')) {
+                        data += line.slice(5).trim();
+                    }
+                });
+                if (!data) {
+                    return;
+                }
+                
+                const payload = JSON.parse(data);
+                if (eventType === 'field') {
+                    partialMetadata[payload.field] = payload.value;
+                    displayMetadataPreview(partialMetadata);
+                } else if (eventType === 'done') {
+                    result = payload;
+                } else if (eventType === 'error') {
+                    if (payload.detailed_error) {
+                        console.error('Detailed error:', payload.detailed_error);
+                    }
+                    throw new Error(payload.error || 'Unknown error during LLM analysis');
+                }
+            }
+            
+            function read() {
+                return reader.read().then(({ done, value }) => {
+                    if (value) {
+                        buffer += decoder.decode(value, { stream: true });
+                    }
+                    
+                    let boundary;
+                    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                        handleEvent(buffer.slice(0, boundary));
+                        buffer = buffer.slice(boundary + 2);
+                    }
+                    
+                    if (done) {
+                        if (!result) {
+                            throw new Error('LLM analysis stream ended unexpectedly');
+                        }
+                        return result;
+                    }
+                    return read();
+                });
+            }
+            
+            return read();
+        });
+    }
+    
     // Display metadata preview
     function displayMetadataPreview(metadata) {
         document.getElementById('llmAnalysisContainer').style.display = 'none';
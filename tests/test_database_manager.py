@@ -0,0 +1,133 @@
+# tests/test_database_manager.py
+import os
+import json
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from modules.database_manager import DatabaseManager
+
+def question(number, **fields):
+    metadata = {
+        'filename': f'question_{number}.png',
+        'created': '2024-01-01T00:00:00',
+        'last_updated': f'2024-01-01T00:00:{number:02d}',
+        'review_completed': True,
+        'subject': 'Physics',
+        'keywords': ['motion'],
+        'cleaned_text': f'Question {number}'
+    }
+    metadata.update(fields)
+    return metadata
+
+class DatabaseManagerTest(unittest.TestCase):
+    """
+    Schema migrations, keyset pagination and full-text search.
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_file = os.path.join(self.temp_dir, 'questions.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def open_database(self):
+        database = DatabaseManager(self.db_file, pool_size=2)
+        self.addCleanup(database.close)
+        return database
+
+    def test_migrates_original_schema(self):
+        # The schema before indexed columns, tag tables and user_version existed
+        conn = sqlite3.connect(self.db_file)
+        conn.execute('''
+            CREATE TABLE questions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                filename TEXT UNIQUE NOT NULL,
+                created TEXT NOT NULL,
+                last_updated TEXT NOT NULL,
+                review_completed INTEGER NOT NULL DEFAULT 0,
+                review_completed_at TEXT,
+                metadata_json TEXT NOT NULL
+            )
+        ''')
+        metadata = question(1, chapter='Kinematics', keywords=['velocity'], cleaned_text='A converging lens')
+        conn.execute(
+            'INSERT INTO questions (filename, created, last_updated, review_completed, metadata_json) '
+            'VALUES (?, ?, ?, 1, ?)',
+            (metadata['filename'], metadata['created'], metadata['last_updated'], json.dumps(metadata))
+        )
+        conn.commit()
+        conn.close()
+
+        database = self.open_database()
+        with database._connection() as conn:
+            self.assertEqual(conn.execute('PRAGMA user_version').fetchone()[0], DatabaseManager.SCHEMA_VERSION)
+
+        page = database.query_questions(filters={'chapter': 'Kinematics'}, fields=['filename', 'keywords'])
+        self.assertEqual(page['questions'], [{'filename': 'question_1.png', 'keywords': ['velocity']}])
+        self.assertEqual(database.count_questions(filters={'keyword': 'velocity'}), 1)
+        if database.search_enabled:
+            self.assertEqual([r['filename'] for r in database.search_questions('convergin')], ['question_1.png'])
+
+    def test_pages_cover_every_question_once(self):
+        database = self.open_database()
+        self.assertEqual(database.save_questions([question(number) for number in range(1, 8)], chunk_size=3), (7, 0))
+
+        filenames = []
+        cursor = None
+        while True:
+            page = database.query_questions(limit=3, cursor=cursor)
+            filenames.extend(q['filename'] for q in page['questions'])
+            cursor = page['next_cursor']
+            if cursor is None:
+                break
+
+        # Newest first, no duplicates or gaps
+        self.assertEqual(filenames, [f'question_{number}.png' for number in range(7, 0, -1)])
+
+    def test_invalid_cursor(self):
+        database = self.open_database()
+        with self.assertRaises(ValueError):
+            database.query_questions(cursor='not-a-cursor')
+
+    def test_prefix_search_matches_stemmed_words(self):
+        database = self.open_database()
+        if not database.search_enabled:
+            self.skipTest('SQLite build without FTS5')
+        database.save_questions([
+            question(1, cleaned_text='A converging series of numbers'),
+            question(2, cleaned_text='Integration by parts')
+        ])
+
+        for text in ('convergin', 'converging', 'series conv', 'numbers, "convergin'):
+            self.assertEqual([r['filename'] for r in database.search_questions(text)], ['question_1.png'], text)
+        self.assertEqual(database.search_questions('xyz'), [])
+
+    def test_search_follows_updates_and_deletes(self):
+        database = self.open_database()
+        if not database.search_enabled:
+            self.skipTest('SQLite build without FTS5')
+        database.save_question(question(1, cleaned_text='Projectile motion'))
+        database.save_question(question(1, cleaned_text='Circular motion'))
+
+        self.assertEqual(database.search_questions('projectile'), [])
+        self.assertEqual(len(database.search_questions('circular')), 1)
+        database.delete_question('question_1.png')
+        self.assertEqual(database.search_questions('circular'), [])
+
+    def test_only_malformed_raw_queries_are_rejected(self):
+        database = self.open_database()
+        if not database.search_enabled:
+            self.skipTest('SQLite build without FTS5')
+        database.save_question(question(1, cleaned_text='Projectile motion'))
+
+        for query in ('"unterminated', 'nosuchcolumn:motion', 'NEAR('):
+            with self.assertRaises(ValueError):
+                database.search_questions(query, raw=True)
+        # Plain text is always quoted, so operators typed by users are harmless
+        self.assertEqual(database.search_questions('"unterminated OR ('), [])
+
+if __name__ == '__main__':
+    unittest.main()
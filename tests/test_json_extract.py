@@ -0,0 +1,69 @@
+# tests/test_json_extract.py
+import unittest
+
+from modules.json_extract import extract_json
+
+class ExtractJsonTest(unittest.TestCase):
+    """
+    LLM output is often not clean JSON; extract_json must recover the
+    top-level value or fail, never return part of it.
+    """
+
+    def test_clean_object(self):
+        self.assertEqual(extract_json('{"a": 1}'), ({'a': 1}, []))
+
+    def test_fenced_object_is_not_reported_as_skipped_text(self):
+        value, repairs = extract_json('```json\n{"a": 1}\n```')
+        self.assertEqual(value, {'a': 1})
+        self.assertEqual(repairs, [])
+
+    def test_trailing_comma_and_python_literals(self):
+        value, repairs = extract_json('{"a": True, "b": None, "c": [1, 2,],}')
+        self.assertEqual(value, {'a': True, 'b': None, 'c': [1, 2]})
+        self.assertEqual(repairs, ['fixed syntax'])
+
+    def test_literals_inside_strings_are_kept(self):
+        value, _ = extract_json('{"text": "True, None,}", "n": 1,}')
+        self.assertEqual(value, {'text': 'True, None,}', 'n': 1})
+
+    def test_escaped_quote_in_string(self):
+        value, _ = extract_json('{"s": "a\\"}"}')
+        self.assertEqual(value, {'s': 'a"}'})
+
+    def test_placeholder_before_object_is_skipped(self):
+        value, repairs = extract_json('text {not json} then {"a": 1}')
+        self.assertEqual(value, {'a': 1})
+        self.assertEqual(repairs, ['skipped leading text'])
+
+    def test_nested_object_is_not_taken_for_a_malformed_outer_object(self):
+        text = ('{"chapter": "Kinematics", "topic": "x", "choices": [{"letter": "A", "text": "1"}], '
+                '"answer": A, "difficulty_level": "easy"}')
+        with self.assertRaises(ValueError):
+            extract_json(text)
+
+    def test_object_after_malformed_object(self):
+        value, _ = extract_json('{"inner": {"a": 1}, "bad": A} {"b": 2}')
+        self.assertEqual(value, {'b': 2})
+
+    def test_truncated_object_keeps_complete_members(self):
+        value, repairs = extract_json('Here: {"a": 1, "b": [1, 2], "c": "unfinish')
+        self.assertEqual(value, {'a': 1, 'b': [1, 2]})
+        self.assertEqual(repairs, ['skipped leading text', 'truncated'])
+
+    def test_truncated_object_never_returns_a_nested_value(self):
+        with self.assertRaises(ValueError):
+            extract_json('{"a": {"b": 1, "c": 2')
+
+    def test_array(self):
+        value, repairs = extract_json('Results: [x] and [1, 2,]', container='[')
+        self.assertEqual(value, [1, 2])
+        self.assertEqual(repairs, ['skipped leading text', 'fixed syntax'])
+
+    def test_no_object(self):
+        with self.assertRaises(ValueError):
+            extract_json('no json here')
+        with self.assertRaises(ValueError):
+            extract_json(None)
+
+if __name__ == '__main__':
+    unittest.main()
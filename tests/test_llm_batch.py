@@ -0,0 +1,156 @@
+# tests/test_llm_batch.py
+import json
+import shutil
+import tempfile
+import threading
+import unittest
+
+from modules.llm_batch import LLMBatchManager
+from modules.llm_processor import LLMProcessor
+
+class FakeResponse:
+    def __init__(self, status_code, body=None, text=None):
+        self.status_code = status_code
+        self._body = body
+        self.text = text if text is not None else json.dumps(body)
+
+    def json(self):
+        return self._body
+
+class FakeProvider:
+    """
+    Stand-in for the OpenAI batch API: one batch whose status and result
+    file are set by the test.
+    """
+
+    def __init__(self):
+        self.status = 'in_progress'
+        self.fail_download = False
+        self.downloads = 0
+        self.download_started = threading.Event()
+        self.release_download = threading.Event()
+        self.release_download.set()
+
+    def post(self, url, **kwargs):
+        if url.endswith('/files'):
+            return FakeResponse(200, {'id': 'file-input'})
+        return FakeResponse(200, {'id': 'provider-batch', 'status': 'validating'})
+
+    def get(self, url, **kwargs):
+        if url.endswith('/batches/provider-batch'):
+            finished = self.status == 'completed'
+            return FakeResponse(200, {'id': 'provider-batch', 'status': self.status,
+                                      'output_file_id': 'file-output' if finished else None,
+                                      'error_file_id': None})
+
+        self.downloads += 1
+        self.download_started.set()
+        self.release_download.wait(5)
+        if self.fail_download:
+            return FakeResponse(500, {'error': 'unavailable'})
+        lines = [json.dumps({
+            'custom_id': custom_id,
+            'response': {'status_code': 200, 'body': {
+                'choices': [{'message': {'content': json.dumps({'subject': 'Physics'})}}]
+            }}
+        }) for custom_id in ('q1', 'q2')]
+        return FakeResponse(200, text='\n'.join(lines))
+
+class FakeOCRProcessor:
+    def process_batch(self, filenames, cancel_event=None):
+        return [{'filename': filename, 'success': True, 'text': f'Text of {filename}'} for filename in filenames]
+
+class FakeMetadataManager:
+    def __init__(self):
+        self.saved = []
+
+    def get_metadata_for_image(self, filename):
+        return None
+
+    def update_batch_metadata(self, updates, create_missing=False):
+        self.saved.append([filename for filename, _ in updates])
+        return len(updates), 0
+
+class LLMBatchManagerTest(unittest.TestCase):
+    """
+    A finished batch is ingested exactly once, whoever ingests it, and
+    provider refreshes never undo an ingest.
+    """
+
+    def setUp(self):
+        self.batch_dir = tempfile.mkdtemp()
+        self.provider = FakeProvider()
+        processor = LLMProcessor('openai')
+        processor._session = self.provider
+        self.metadata_manager = FakeMetadataManager()
+        self.manager = LLMBatchManager(processor, self.metadata_manager, FakeOCRProcessor(), self.batch_dir,
+                                       base_url='http://stand-in')
+        self.batch_id = self.manager.run(['question_1.png', 'question_2.png'])['id']
+
+    def tearDown(self):
+        shutil.rmtree(self.batch_dir)
+
+    def status(self):
+        return self.manager.get(self.batch_id)['status']
+
+    def test_run_submits_without_waiting(self):
+        self.assertEqual(self.status(), 'validating')
+        self.assertEqual(self.manager.poll_pending(), [])
+        self.assertEqual(self.status(), 'in_progress')
+        with self.assertRaises(RuntimeError):
+            self.manager.ingest(self.batch_id)
+
+    def test_poller_ingests_finished_batch_once(self):
+        self.provider.status = 'completed'
+        ingested = self.manager.poll_pending()
+
+        self.assertEqual([summary['status'] for summary in ingested], ['ingested'])
+        self.assertEqual(self.metadata_manager.saved, [['question_1.png', 'question_2.png']])
+        self.assertEqual(self.manager.poll_pending(), [])
+        self.assertEqual(self.manager.ingest(self.batch_id)['status'], 'ingested')
+        self.assertEqual(len(self.metadata_manager.saved), 1)
+
+    def test_concurrent_ingest_is_rejected(self):
+        self.provider.status = 'completed'
+        self.provider.release_download.clear()
+        first = threading.Thread(target=self.manager.ingest, args=(self.batch_id,))
+        first.start()
+        self.assertTrue(self.provider.download_started.wait(5))
+
+        self.assertEqual(self.status(), 'ingesting')
+        with self.assertRaises(RuntimeError):
+            self.manager.ingest(self.batch_id)
+        # A provider refresh while ingesting leaves the claim alone
+        self.assertEqual(self.manager.refresh(self.batch_id)['status'], 'ingesting')
+
+        self.provider.release_download.set()
+        first.join(5)
+        self.assertEqual(self.status(), 'ingested')
+        self.assertEqual(len(self.metadata_manager.saved), 1)
+        self.assertEqual(self.manager.refresh(self.batch_id)['status'], 'ingested')
+
+    def test_failed_ingest_can_be_retried(self):
+        self.provider.status = 'completed'
+        self.provider.fail_download = True
+        with self.assertRaises(RuntimeError):
+            self.manager.ingest(self.batch_id)
+        self.assertEqual(self.status(), 'completed')
+
+        self.provider.fail_download = False
+        self.assertEqual(self.manager.ingest(self.batch_id)['status'], 'ingested')
+        self.assertEqual(len(self.metadata_manager.saved), 1)
+
+    def test_batch_left_ingesting_after_restart_is_ingested(self):
+        self.provider.status = 'completed'
+        self.manager.refresh(self.batch_id)
+        manifest = self.manager._load_manifest(self.batch_id)
+        manifest['provider_status'] = manifest['status']
+        manifest['status'] = 'ingesting'
+        self.manager._save_manifest(manifest)
+
+        ingested = self.manager.poll_pending()
+        self.assertEqual([summary['status'] for summary in ingested], ['ingested'])
+        self.assertEqual(len(self.metadata_manager.saved), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+# tests/test_llm_stream.py
+import json
+import unittest
+
+from modules.json_stream import IncrementalJSONParser
+from modules.llm_processor import LLMProcessor
+
+class FakeStreamResponse:
+    """
+    Stand-in for a streamed requests.Response carrying server-sent events.
+    """
+
+    status_code = 200
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.closed = False
+
+    def iter_lines(self, decode_unicode=False):
+        return iter(self.lines)
+
+    def close(self):
+        self.closed = True
+
+class FakeSession:
+    def __init__(self, response):
+        self.response = response
+
+    def post(self, url, **kwargs):
+        return self.response
+
+def sse_lines(events, done=False):
+    lines = []
+    for event in events:
+        lines.extend([f"data: {json.dumps(event)}", ''])
+    if done:
+        lines.extend(['data: [DONE]', ''])
+    return lines
+
+class IncrementalJSONParserTest(unittest.TestCase):
+    """
+    Fields must be reported as soon as their value is complete, however
+    the text is split into chunks.
+    """
+
+    TEXT = ('```json\n{"subject": "Physics", "keywords": ["a, b", "c]"], '
+            '"choices": [{"letter": "A", "text": "{1}"}], "note": "say \\"hi\\"", "marks": 2}\n```')
+
+    def feed_in_chunks(self, size):
+        parser = IncrementalJSONParser()
+        fields = []
+        for start in range(0, len(self.TEXT), size):
+            fields.extend(parser.feed(self.TEXT[start:start + size]))
+        return fields
+
+    def test_fields_match_whole_parse(self):
+        expected = list(json.loads(self.TEXT[len('```json\n'):-len('\n```')]).items())
+        for size in (1, 3, 7, len(self.TEXT)):
+            self.assertEqual(self.feed_in_chunks(size), expected, f"chunk size {size}")
+
+    def test_field_reported_when_complete(self):
+        parser = IncrementalJSONParser()
+        self.assertEqual(parser.feed('{"subject": "Phys'), [])
+        self.assertEqual(parser.feed('ics", "top'), [('subject', 'Physics')])
+        self.assertEqual(parser.feed('ic": "Waves"}'), [('topic', 'Waves')])
+        self.assertEqual(parser.feed(', "late": 1}'), [])
+
+class StreamLLMTest(unittest.TestCase):
+    """
+    Server-sent events from either provider must be turned into response
+    text and token usage.
+    """
+
+    def open_processor(self, api_type, lines):
+        processor = LLMProcessor(api_type)
+        response = FakeStreamResponse(lines)
+        processor._session = FakeSession(response)
+        return processor, response
+
+    def test_openai_events(self):
+        lines = [': keep-alive', ''] + sse_lines([
+            {'choices': [{'delta': {'role': 'assistant'}}]},
+            {'choices': [{'delta': {'content': '{"a": '}}]},
+            {'choices': [{'delta': {'content': '1}'}}]},
+            {'choices': [], 'usage': {'prompt_tokens': 10, 'completion_tokens': 4}}
+        ], done=True) + sse_lines([{'choices': [{'delta': {'content': 'after done'}}]}])
+        processor, response = self.open_processor('openai', lines)
+
+        self.assertEqual(''.join(processor._stream_llm('prompt')), '{"a": 1}')
+        self.assertTrue(response.closed)
+        self.assertEqual(processor._usage_totals['output_tokens'], 4)
+
+    def test_anthropic_events(self):
+        lines = []
+        for event in [
+            {'type': 'message_start', 'message': {'usage': {'input_tokens': 12, 'output_tokens': 1}}},
+            {'type': 'content_block_start', 'index': 0, 'content_block': {'type': 'text', 'text': ''}},
+            {'type': 'content_block_delta', 'delta': {'type': 'text_delta', 'text': '{"a": '}},
+            {'type': 'ping'},
+            {'type': 'content_block_delta', 'delta': {'type': 'text_delta', 'text': '1}'}},
+            {'type': 'message_delta', 'usage': {'output_tokens': 6}},
+            {'type': 'message_stop'}
+        ]:
+            lines.extend([f"event: {event['type']}", f"data: {json.dumps(event)}", ''])
+        processor, response = self.open_processor('anthropic', lines)
+
+        self.assertEqual(''.join(processor._stream_llm('prompt')), '{"a": 1}')
+        self.assertTrue(response.closed)
+        self.assertEqual(processor._usage_totals['input_tokens'], 12)
+        self.assertEqual(processor._usage_totals['output_tokens'], 6)
+
+    def test_anthropic_error_event(self):
+        lines = sse_lines([{'type': 'error', 'error': {'type': 'overloaded_error'}}])
+        processor, response = self.open_processor('anthropic', lines)
+
+        with self.assertRaises(Exception):
+            list(processor._stream_llm('prompt'))
+        self.assertTrue(response.closed)
+
+if __name__ == '__main__':
+    unittest.main()
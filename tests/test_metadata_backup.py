@@ -0,0 +1,55 @@
+# tests/test_metadata_backup.py
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from modules.metadata_manager import MetadataManager
+
+class MetadataBackupTest(unittest.TestCase):
+    """
+    Backups must hold the metadata as it was before a change was written.
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.metadata_file = os.path.join(self.temp_dir, 'metadata.json')
+        with open(self.metadata_file, 'w') as f:
+            json.dump([{'filename': 'question_1.png', 'answer': 'ORIGINAL'}], f)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def assert_restores_original(self, journal_enabled):
+        manager = MetadataManager(self.metadata_file, journal_enabled=journal_enabled)
+        self.assertTrue(manager.update_metadata('question_1.png', {'answer': 'CLOBBERED'}))
+        manager.close()
+
+        snapshots = manager.backup_manager.list_snapshots()
+        self.assertEqual(len(snapshots), 1)
+        restored = manager.backup_manager.restore(snapshots[0]['id'])
+        self.assertEqual(restored[0]['answer'], 'ORIGINAL')
+        self.assertEqual(manager.get_metadata_for_image('question_1.png')['answer'], 'CLOBBERED')
+
+    def test_backup_before_rewrite(self):
+        self.assert_restores_original(journal_enabled=False)
+
+    def test_backup_before_journal_compaction(self):
+        self.assert_restores_original(journal_enabled=True)
+
+    def test_no_file_read_while_backup_not_due(self):
+        manager = MetadataManager(self.metadata_file, journal_enabled=False)
+        self.assertTrue(manager.update_metadata('question_1.png', {'answer': 'FIRST'}))
+
+        # The first write took a snapshot; the next ones fall inside min_interval
+        with mock.patch.object(manager, '_load_from_disk', wraps=manager._load_from_disk) as load:
+            self.assertTrue(manager.update_metadata('question_1.png', {'answer': 'SECOND'}))
+            self.assertTrue(manager.update_metadata('question_1.png', {'answer': 'THIRD'}))
+        load.assert_not_called()
+        self.assertEqual(len(manager.backup_manager.list_snapshots()), 1)
+        manager.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+# tests/test_metadata_journal.py
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+from modules.metadata_manager import MetadataManager
+
+class MetadataJournalTest(unittest.TestCase):
+    """
+    Journaled changes must survive a restart, including one after a crash
+    that left a torn record in the journal.
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.metadata_file = os.path.join(self.temp_dir, 'metadata.json')
+        with open(self.metadata_file, 'w') as f:
+            json.dump([{'filename': 'question_1.png', 'answer': 'ORIGINAL'}], f)
+        self.journal_file = f"{self.metadata_file}.journal"
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def open_manager(self):
+        # No background compaction, so the journal is only folded in on open
+        manager = MetadataManager(self.metadata_file, compact_interval=3600)
+        self.addCleanup(self.cancel_compaction, manager)
+        return manager
+
+    @staticmethod
+    def cancel_compaction(manager):
+        if manager._compaction_timer is not None:
+            manager._compaction_timer.cancel()
+
+    def write_journal(self, text):
+        with open(self.journal_file, 'w') as f:
+            f.write(text)
+
+    def answer_after_restart(self, filename='question_1.png'):
+        metadata = self.open_manager().get_metadata_for_image(filename)
+        return metadata['answer'] if metadata else None
+
+    def test_journaled_change_is_replayed(self):
+        manager = self.open_manager()
+        self.assertTrue(manager.update_metadata('question_1.png', {'answer': 'JOURNALED'}))
+        self.assertTrue(os.path.getsize(self.journal_file) > 0)
+
+        self.assertEqual(self.answer_after_restart(), 'JOURNALED')
+
+    def test_replay_continues_past_torn_record(self):
+        good = {'filename': 'question_1.png', 'set': {'answer': 'AFTER'}, 'unset': []}
+        self.write_journal('{"filename": "question_1.png", "set": {"ans\n' + json.dumps(good) + '\n')
+
+        self.assertEqual(self.answer_after_restart(), 'AFTER')
+
+    def test_append_after_torn_tail_is_kept(self):
+        manager = self.open_manager()
+        # A crash mid-append leaves the last record without its newline
+        with open(self.journal_file, 'a') as f:
+            f.write('{"filename": "question_1.png", "set": {"ans')
+        self.assertTrue(manager.update_metadata('question_2.png', {'answer': 'ACKNOWLEDGED'}))
+
+        self.assertEqual(self.answer_after_restart('question_2.png'), 'ACKNOWLEDGED')
+
+    def test_journal_is_folded_into_file_on_open(self):
+        manager = self.open_manager()
+        self.assertTrue(manager.update_metadata('question_1.png', {'answer': 'COMPACTED'}))
+
+        self.open_manager()
+        self.assertEqual(os.path.getsize(self.journal_file), 0)
+        with open(self.metadata_file) as f:
+            self.assertEqual(json.load(f)[0]['answer'], 'COMPACTED')
+
+if __name__ == '__main__':
+    unittest.main()